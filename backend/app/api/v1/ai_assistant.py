@@ -9,7 +9,8 @@ from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 import logging
 
-from app.core.deps import get_db, get_current_user
+from app.core.database import get_db
+from app.core.deps import get_current_user
 from app.models.user import User
 from app.services.ai_assistant_service import AIAssistantService, RiskLevel, SafetyAction
 
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any
 
-from ...core.database import get_db
+from ...core.database import get_async_db
 from ...core.deps import get_current_active_user
 from ...schemas.auth import Token, UserCreate, UserResponse, LoginRequest
 from ...services.auth_service import AuthService
@@ -12,24 +12,24 @@ auth_router = APIRouter()
 
 
 @auth_router.post("/register", response_model=UserResponse)
-def register(
+async def register(
     user_create: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """Register a new user"""
     auth_service = AuthService(db)
-    user = auth_service.create_user(user_create)
+    user = await auth_service.create_user(user_create)
     return user
 
 
 @auth_router.post("/login", response_model=Token)
-def login(
+async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """Login user and return access token"""
     auth_service = AuthService(db)
-    user = auth_service.authenticate_user(login_data.username, login_data.password)
+    user = await auth_service.authenticate_user(login_data.username, login_data.password)
     
     if not user:
         raise HTTPException(
@@ -49,13 +49,13 @@ def login(
 
 
 @auth_router.post("/login/oauth", response_model=Token)
-def login_oauth(
+async def login_oauth(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """OAuth2 compatible login endpoint"""
     auth_service = AuthService(db)
-    user = auth_service.authenticate_user(form_data.username, form_data.password)
+    user = await auth_service.authenticate_user(form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
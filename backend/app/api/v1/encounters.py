@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Any, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 
-from ...core.database import get_db
+from ...core.database import get_async_db
 from ...core.deps import get_current_active_user, require_role
+from ...core.pagination import CURSOR_DESCRIPTION, OFFSET_DEPRECATION, page_links
 from ...models.user import UserRole
 from ...models.encounter import EncounterStatus, EncounterClass
 from ...schemas.encounter import (
@@ -12,41 +13,70 @@ from ...schemas.encounter import (
     EncounterUpdate,
     EncounterResponse,
     EncounterListResponse,
+    EncounterSearchResponse,
     EncounterSearchParams,
     VitalSignsUpdate,
-    SOAPNotesUpdate
+    SOAPNotesUpdate,
+    EarlyWarningResponse,
+    EncounterSave,
+    EncounterSaveResponse,
+    SOAPAutosave,
+    SOAPAutosaveResponse,
+    NoteRevisionSummary,
+    NoteRevisionResponse
 )
-from ...services.encounter_service import EncounterService
+from ...services import early_warning, soap_revisions
+from ...services.encounter_service import EncounterService, encounter_etag
 
 encounters_router = APIRouter()
 
+IF_MATCH_DESCRIPTION = "ETag from a previous read; the update fails with 409 if the encounter changed since"
+
+
+def _expected_version(if_match: Optional[str]) -> Optional[int]:
+    """The version named by an If-Match header (``"3"`` or ``W/"3"``); None when absent or ``*``"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid If-Match header"
+        )
+
 
 @encounters_router.post("/", response_model=EncounterResponse)
-def create_encounter(
+async def create_encounter(
     encounter_create: EncounterCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE]))
 ) -> Any:
     """Create a new encounter"""
-    encounter_service = EncounterService(db)
-    encounter = encounter_service.create_encounter(encounter_create)
+    encounter_service = EncounterService(db, user_id=current_user.id)
+    encounter = await encounter_service.create_encounter(encounter_create)
     return encounter
 
 
-@encounters_router.get("/", response_model=List[EncounterListResponse])
-def search_encounters(
+@encounters_router.get("/", response_model=EncounterSearchResponse)
+async def search_encounters(
+    request: Request,
     patient_id: Optional[int] = Query(None, description="Patient ID"),
     practitioner_id: Optional[int] = Query(None, description="Practitioner ID"),
     status: Optional[EncounterStatus] = Query(None, description="Encounter status"),
     encounter_class: Optional[EncounterClass] = Query(None, description="Encounter class"),
     start_date: Optional[str] = Query(None, description="Start date filter (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date filter (YYYY-MM-DD)"),
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    skip: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
     limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
-    """Search encounters with various criteria"""
+    """Search encounters with various criteria; returns one page plus the total match count"""
     # Parse dates if provided
     parsed_start_date = None
     parsed_end_date = None
@@ -76,24 +106,56 @@ def search_encounters(
         encounter_class=encounter_class,
         start_date=parsed_start_date,
         end_date=parsed_end_date,
-        skip=skip,
-        limit=limit
+        skip=0 if cursor else skip,
+        limit=limit,
+        cursor=cursor
     )
     
     encounter_service = EncounterService(db)
-    encounters = encounter_service.search_encounters(search_params)
-    return encounters
+    page, total = await encounter_service.search_encounters_page(search_params)
+    return {
+        "items": page.items,
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "has_more": page.has_more,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+        "links": page_links(request, page),
+    }
+
+
+@encounters_router.get("/early-warning", response_model=EarlyWarningResponse)
+async def get_early_warning_scores(
+    status: Optional[EncounterStatus] = Query(EncounterStatus.IN_PROGRESS, description="Encounter status"),
+    encounter_class: Optional[EncounterClass] = Query(None, description="Encounter class (e.g. inpatient)"),
+    min_score: int = Query(0, ge=0, le=20, description="Only return encounters scoring at least this"),
+    limit: int = Query(200, ge=1, le=5000, description="Number of highest-scoring encounters to return"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE]))
+) -> Any:
+    """NEWS2 early-warning scores for every matching encounter, highest first"""
+    batch = await early_warning.load_vitals(db, status=status, encounter_class=encounter_class)
+    scores = early_warning.score_vitals(batch)
+    rows = early_warning.rank(scores, min_score=min_score, limit=limit)
+    return {
+        "computed_at": datetime.now(timezone.utc),
+        "scored": len(batch),
+        "risk_counts": early_warning.risk_counts(scores),
+        "items": early_warning.score_rows(batch, scores, rows),
+    }
 
 
 @encounters_router.get("/{encounter_id}", response_model=EncounterResponse)
-def get_encounter(
+async def get_encounter(
     encounter_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
     """Get encounter by ID"""
     encounter_service = EncounterService(db)
-    encounter = encounter_service.get_encounter(encounter_id)
+    encounter = await encounter_service.get_encounter(encounter_id)
     
     if not encounter:
         raise HTTPException(
@@ -101,18 +163,20 @@ def get_encounter(
             detail="Encounter not found"
         )
     
+    response.headers["ETag"] = encounter_etag(encounter.version)
     return encounter
 
 
 @encounters_router.get("/by-encounter-id/{encounter_id}", response_model=EncounterResponse)
-def get_encounter_by_encounter_id(
+async def get_encounter_by_encounter_id(
     encounter_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
     """Get encounter by encounter ID"""
     encounter_service = EncounterService(db)
-    encounter = encounter_service.get_encounter_by_encounter_id(encounter_id)
+    encounter = await encounter_service.get_encounter_by_encounter_id(encounter_id)
     
     if not encounter:
         raise HTTPException(
@@ -120,19 +184,22 @@ def get_encounter_by_encounter_id(
             detail="Encounter not found"
         )
     
+    response.headers["ETag"] = encounter_etag(encounter.version)
     return encounter
 
 
 @encounters_router.put("/{encounter_id}", response_model=EncounterResponse)
-def update_encounter(
+async def update_encounter(
     encounter_id: int,
     encounter_update: EncounterUpdate,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_match: Optional[str] = Header(None, description=IF_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE]))
 ) -> Any:
     """Update encounter information"""
-    encounter_service = EncounterService(db)
-    encounter = encounter_service.update_encounter(encounter_id, encounter_update)
+    encounter_service = EncounterService(db, user_id=current_user.id)
+    encounter = await encounter_service.update_encounter(encounter_id, encounter_update, _expected_version(if_match))
     
     if not encounter:
         raise HTTPException(
@@ -140,19 +207,52 @@ def update_encounter(
             detail="Encounter not found"
         )
     
+    response.headers["ETag"] = encounter_etag(encounter.version)
     return encounter
 
 
+@encounters_router.patch("/{encounter_id}", response_model=EncounterSaveResponse)
+async def save_encounter(
+    encounter_id: int,
+    encounter_save: EncounterSave,
+    response: Response,
+    if_match: Optional[str] = Header(None, description=IF_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE]))
+) -> Any:
+    """Save SOAP notes, vital signs and status together; returns only what was written"""
+    encounter_service = EncounterService(db, user_id=current_user.id)
+    saved = await encounter_service.save_encounter(encounter_id, encounter_save, _expected_version(if_match))
+
+    if not saved:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Encounter not found"
+        )
+
+    encounter, changes = saved
+    response.headers["ETag"] = encounter_etag(encounter.version)
+    return {
+        "id": encounter.id,
+        "version": encounter.version,
+        "note_revision": encounter.note_revision,
+        "updated_at": encounter.updated_at,
+        "changes": changes,
+    }
+
+
 @encounters_router.patch("/{encounter_id}/vital-signs", response_model=EncounterResponse)
-def update_vital_signs(
+async def update_vital_signs(
     encounter_id: int,
     vital_signs: VitalSignsUpdate,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_match: Optional[str] = Header(None, description=IF_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE]))
 ) -> Any:
     """Update vital signs for an encounter"""
     encounter_service = EncounterService(db)
-    encounter = encounter_service.update_vital_signs(encounter_id, vital_signs)
+    encounter = await encounter_service.update_vital_signs(encounter_id, vital_signs, _expected_version(if_match))
     
     if not encounter:
         raise HTTPException(
@@ -160,19 +260,22 @@ def update_vital_signs(
             detail="Encounter not found"
         )
     
+    response.headers["ETag"] = encounter_etag(encounter.version)
     return encounter
 
 
 @encounters_router.patch("/{encounter_id}/soap-notes", response_model=EncounterResponse)
-def update_soap_notes(
+async def update_soap_notes(
     encounter_id: int,
     soap_notes: SOAPNotesUpdate,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_match: Optional[str] = Header(None, description=IF_MATCH_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE]))
 ) -> Any:
     """Update SOAP notes for an encounter"""
-    encounter_service = EncounterService(db)
-    encounter = encounter_service.update_soap_notes(encounter_id, soap_notes)
+    encounter_service = EncounterService(db, user_id=current_user.id)
+    encounter = await encounter_service.update_soap_notes(encounter_id, soap_notes, _expected_version(if_match))
     
     if not encounter:
         raise HTTPException(
@@ -180,44 +283,104 @@ def update_soap_notes(
             detail="Encounter not found"
         )
     
+    response.headers["ETag"] = encounter_etag(encounter.version)
     return encounter
 
 
+@encounters_router.post("/{encounter_id}/soap-notes/autosave", response_model=SOAPAutosaveResponse)
+async def autosave_soap_notes(
+    encounter_id: int,
+    autosave: SOAPAutosave,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE]))
+) -> Any:
+    """Apply SOAP note edits made since ``base_revision``; 409 if the notes changed meanwhile"""
+    encounter_service = EncounterService(db, user_id=current_user.id)
+    saved = await encounter_service.autosave_soap_notes(encounter_id, autosave)
+
+    if not saved:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Encounter not found"
+        )
+
+    response.headers["ETag"] = encounter_etag(saved["version"])
+    return saved
+
+
+@encounters_router.get("/{encounter_id}/soap-notes/revisions", response_model=List[NoteRevisionSummary])
+async def list_soap_note_revisions(
+    encounter_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_active_user)
+) -> Any:
+    """SOAP note revisions of an encounter, newest first"""
+    return await soap_revisions.list_note_revisions(db, encounter_id, limit)
+
+
+@encounters_router.get("/{encounter_id}/soap-notes/revisions/{revision}", response_model=NoteRevisionResponse)
+async def get_soap_note_revision(
+    encounter_id: int,
+    revision: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_active_user)
+) -> Any:
+    """SOAP notes as they were at a revision"""
+    found = await soap_revisions.get_note_revision(db, encounter_id, revision)
+
+    if not found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Revision not found"
+        )
+
+    stored, texts = found
+    return {
+        "encounter_id": encounter_id,
+        "revision": stored.revision,
+        "author_id": stored.author_id,
+        "created_at": stored.created_at,
+        **texts,
+    }
+
+
 @encounters_router.get("/patient/{patient_id}", response_model=List[EncounterListResponse])
-def get_patient_encounters(
+async def get_patient_encounters(
     patient_id: int,
     limit: int = Query(50, ge=1, le=500, description="Number of recent encounters to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
     """Get recent encounters for a specific patient"""
     encounter_service = EncounterService(db)
-    encounters = encounter_service.get_patient_encounters(patient_id, limit)
+    encounters = await encounter_service.get_patient_encounters(patient_id, limit)
     return encounters
 
 
 @encounters_router.get("/practitioner/{practitioner_id}", response_model=List[EncounterListResponse])
-def get_practitioner_encounters(
+async def get_practitioner_encounters(
     practitioner_id: int,
     limit: int = Query(50, ge=1, le=500, description="Number of recent encounters to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
     """Get recent encounters for a specific practitioner"""
     encounter_service = EncounterService(db)
-    encounters = encounter_service.get_practitioner_encounters(practitioner_id, limit)
+    encounters = await encounter_service.get_practitioner_encounters(practitioner_id, limit)
     return encounters
 
 
 @encounters_router.get("/search/count")
-def get_encounters_count(
+async def get_encounters_count(
     patient_id: Optional[int] = Query(None, description="Patient ID"),
     practitioner_id: Optional[int] = Query(None, description="Practitioner ID"),
     status: Optional[EncounterStatus] = Query(None, description="Encounter status"),
     encounter_class: Optional[EncounterClass] = Query(None, description="Encounter class"),
     start_date: Optional[str] = Query(None, description="Start date filter (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date filter (YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
     """Get count of encounters matching search criteria"""
@@ -255,5 +418,5 @@ def get_encounters_count(
     )
     
     encounter_service = EncounterService(db)
-    count = encounter_service.get_encounters_count(search_params)
+    count = await encounter_service.get_encounters_count(search_params)
     return {"count": count}
\ No newline at end of file
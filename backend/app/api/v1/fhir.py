@@ -4,25 +4,55 @@ Azure API for FHIR との統合
 """
 
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request
 from sqlalchemy.orm import Session, joinedload
 import json
 
-from app.core.deps import get_db, get_current_user
+from app.core.database import get_db
+from app.core.deps import get_current_user
+from app.core.pagination import (
+    CURSOR_DESCRIPTION, OFFSET_DEPRECATION, CursorPage, Keyset, decode_cursor, fetch_page_sync, page_links
+)
 from app.models.user import User
 from app.models.patient import Patient
 from app.models.encounter import Encounter
 from app.models.prescription import Prescription
 from app.services.fhir_service import FHIRService
+from app.services.prescription_service import prescription_load_options
 
 router = APIRouter()
 fhir_service = FHIRService()
 
+# searchset の並び順（最後の列で一意化）
+PATIENT_KEYSET = Keyset(Patient.id)
+PRACTITIONER_KEYSET = Keyset(User.id)
+ENCOUNTER_KEYSET = Keyset(Encounter.start_time, Encounter.id, descending=True)
+MEDICATION_REQUEST_KEYSET = Keyset(Prescription.prescription_date, Prescription.id, descending=True)
+
+
+def _fetch_searchset_page(query, keyset: Keyset, cursor: Optional[str], offset: int, limit: int):
+    """カーソル（または非推奨のオフセット）で1ページ分を取得"""
+    page_cursor = decode_cursor(keyset, cursor)
+    return fetch_page_sync(query, keyset, page_cursor, 0 if page_cursor else offset, limit)
+
+
+def _bundle_links(request: Request, page: CursorPage) -> Dict[str, str]:
+    """Bundle.link 用の self / next / previous URL"""
+    links = page_links(request, page)
+    bundle_links = {"self": str(request.url)}
+    if "next" in links:
+        bundle_links["next"] = links["next"]
+    if "prev" in links:
+        bundle_links["previous"] = links["prev"]
+    return bundle_links
+
 
 @router.get("/Patient", response_model=Dict[str, Any])
 def get_fhir_patients(
+    request: Request,
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     limit: int = Query(50, ge=1, le=100, description="取得件数"),
-    offset: int = Query(0, ge=0, description="オフセット"),
+    offset: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -30,13 +60,15 @@ def get_fhir_patients(
     FHIR形式で患者一覧を取得
     """
     # 患者データを取得
-    patients = db.query(Patient).offset(offset).limit(limit).all()
+    page, total = _fetch_searchset_page(db.query(Patient), PATIENT_KEYSET, cursor, offset, limit)
     
     # FHIR Patientリソースに変換
-    fhir_patients = [fhir_service.patient_to_fhir(p) for p in patients]
+    fhir_patients = [fhir_service.patient_to_fhir(p) for p in page.items]
     
     # FHIR Bundle形式で返却
-    bundle = fhir_service.create_bundle(fhir_patients, bundle_type="searchset")
+    bundle = fhir_service.create_bundle(
+        fhir_patients, bundle_type="searchset", links=_bundle_links(request, page), total=total
+    )
     
     return bundle
 
@@ -63,8 +95,10 @@ def get_fhir_patient(
 
 @router.get("/Practitioner", response_model=Dict[str, Any])
 def get_fhir_practitioners(
+    request: Request,
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     limit: int = Query(50, ge=1, le=100, description="取得件数"),
-    offset: int = Query(0, ge=0, description="オフセット"),
+    offset: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -72,22 +106,28 @@ def get_fhir_practitioners(
     FHIR形式で医療従事者一覧を取得
     """
     # ユーザー（医療従事者）データを取得
-    practitioners = db.query(User).filter(User.is_active == True).offset(offset).limit(limit).all()
+    page, total = _fetch_searchset_page(
+        db.query(User).filter(User.is_active == True), PRACTITIONER_KEYSET, cursor, offset, limit
+    )
     
     # FHIR Practitionerリソースに変換
-    fhir_practitioners = [fhir_service.practitioner_to_fhir(p) for p in practitioners]
+    fhir_practitioners = [fhir_service.practitioner_to_fhir(p) for p in page.items]
     
     # FHIR Bundle形式で返却
-    bundle = fhir_service.create_bundle(fhir_practitioners, bundle_type="searchset")
+    bundle = fhir_service.create_bundle(
+        fhir_practitioners, bundle_type="searchset", links=_bundle_links(request, page), total=total
+    )
     
     return bundle
 
 
 @router.get("/Encounter", response_model=Dict[str, Any])
 def get_fhir_encounters(
+    request: Request,
     patient_id: Optional[int] = Query(None, description="患者IDで絞り込み"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     limit: int = Query(50, ge=1, le=100, description="取得件数"),
-    offset: int = Query(0, ge=0, description="オフセット"),
+    offset: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -97,29 +137,33 @@ def get_fhir_encounters(
     # 診療記録データを取得
     query = db.query(Encounter).options(
         joinedload(Encounter.patient),
-        joinedload(Encounter.provider)
+        joinedload(Encounter.practitioner)
     )
     
     if patient_id:
         query = query.filter(Encounter.patient_id == patient_id)
     
-    encounters = query.offset(offset).limit(limit).all()
+    page, total = _fetch_searchset_page(query, ENCOUNTER_KEYSET, cursor, offset, limit)
     
     # FHIR Encounterリソースに変換
-    fhir_encounters = [fhir_service.encounter_to_fhir(e, db) for e in encounters]
+    fhir_encounters = [fhir_service.encounter_to_fhir(e, db) for e in page.items]
     
     # FHIR Bundle形式で返却
-    bundle = fhir_service.create_bundle(fhir_encounters, bundle_type="searchset")
+    bundle = fhir_service.create_bundle(
+        fhir_encounters, bundle_type="searchset", links=_bundle_links(request, page), total=total
+    )
     
     return bundle
 
 
 @router.get("/MedicationRequest", response_model=Dict[str, Any])
 def get_fhir_medication_requests(
+    request: Request,
     patient_id: Optional[int] = Query(None, description="患者IDで絞り込み"),
     encounter_id: Optional[int] = Query(None, description="診療記録IDで絞り込み"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     limit: int = Query(50, ge=1, le=100, description="取得件数"),
-    offset: int = Query(0, ge=0, description="オフセット"),
+    offset: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -127,11 +171,7 @@ def get_fhir_medication_requests(
     FHIR形式で処方箋一覧を取得
     """
     # 処方箋データを取得
-    query = db.query(Prescription).options(
-        joinedload(Prescription.patient),
-        joinedload(Prescription.prescriber),
-        joinedload(Prescription.prescription_items).joinedload(Prescription.prescription_items.medication)
-    )
+    query = db.query(Prescription).options(*prescription_load_options(patient=False))
     
     if patient_id:
         query = query.filter(Prescription.patient_id == patient_id)
@@ -139,16 +179,18 @@ def get_fhir_medication_requests(
     if encounter_id:
         query = query.filter(Prescription.encounter_id == encounter_id)
     
-    prescriptions = query.offset(offset).limit(limit).all()
+    page, _ = _fetch_searchset_page(query, MEDICATION_REQUEST_KEYSET, cursor, offset, limit)
     
-    # FHIR MedicationRequestリソースに変換
+    # FHIR MedicationRequestリソースに変換（ページは処方箋単位）
     all_medication_requests = []
-    for prescription in prescriptions:
+    for prescription in page.items:
         medication_requests = fhir_service.prescription_to_fhir(prescription, db)
         all_medication_requests.extend(medication_requests)
     
     # FHIR Bundle形式で返却
-    bundle = fhir_service.create_bundle(all_medication_requests, bundle_type="searchset")
+    bundle = fhir_service.create_bundle(
+        all_medication_requests, bundle_type="searchset", links=_bundle_links(request, page)
+    )
     
     return bundle
 
@@ -170,7 +212,7 @@ def get_patient_everything(
     # 関連するすべてのデータを取得
     encounters = db.query(Encounter).filter(Encounter.patient_id == patient_id).all()
     prescriptions = db.query(Prescription).options(
-        joinedload(Prescription.prescription_items).joinedload(Prescription.prescription_items.medication)
+        *prescription_load_options(patient=False)
     ).filter(Prescription.patient_id == patient_id).all()
     
     # FHIRリソースに変換
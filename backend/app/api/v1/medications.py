@@ -1,9 +1,11 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
 
-from app.core.deps import get_db, get_current_user
+from app.core.database import get_db
+from app.core.deps import get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, OFFSET_DEPRECATION, Keyset, decode_cursor, fetch_page_sync, page_links
 from app.models.user import User
 from app.models.medication import Medication, MedicationForm, MedicationCategory
 from app.schemas.medication import (
@@ -16,15 +18,36 @@ from app.schemas.medication import (
 
 router = APIRouter()
 
+# 一覧の並び順（薬剤名順、同名は ID で一意化）
+MEDICATION_KEYSET = Keyset(Medication.drug_name, Medication.id)
+
+
+def _medication_page(request: Request, db_query, cursor: Optional[str], offset: int, limit: int) -> MedicationListResponse:
+    """カーソル（または非推奨のオフセット）で1ページ分を取得"""
+    page_cursor = decode_cursor(MEDICATION_KEYSET, cursor)
+    page, total = fetch_page_sync(db_query, MEDICATION_KEYSET, page_cursor, 0 if page_cursor else offset, limit)
+    return MedicationListResponse(
+        items=page.items,
+        total=total,
+        limit=limit,
+        offset=offset,
+        has_more=page.has_more,
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+        links=page_links(request, page)
+    )
+
 @router.get("/search", response_model=MedicationListResponse)
 def search_medications(
+    request: Request,
     query: Optional[str] = Query(None, description="薬剤名、一般名、商品名で検索"),
     form: Optional[MedicationForm] = Query(None, description="剤形で絞り込み"),
     category: Optional[MedicationCategory] = Query(None, description="薬効分類で絞り込み"),
     is_prescription_required: Optional[bool] = Query(None, description="処方箋必要薬で絞り込み"),
     is_active: bool = Query(True, description="有効な薬剤のみ"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     limit: int = Query(50, ge=1, le=100, description="取得件数"),
-    offset: int = Query(0, ge=0, description="オフセット"),
+    offset: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -59,24 +82,15 @@ def search_medications(
     if is_prescription_required is not None:
         db_query = db_query.filter(Medication.is_prescription_required == is_prescription_required)
     
-    # 総数取得
-    total = db_query.count()
-    
-    # ページネーション
-    medications = db_query.order_by(Medication.drug_name).offset(offset).limit(limit).all()
-    
-    return MedicationListResponse(
-        items=medications,
-        total=total,
-        limit=limit,
-        offset=offset,
-        has_more=offset + len(medications) < total
-    )
+    # ページネーション（総数は同一クエリで取得）
+    return _medication_page(request, db_query, cursor, offset, limit)
 
 @router.get("/", response_model=MedicationListResponse)
 def get_medications(
+    request: Request,
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     limit: int = Query(50, ge=1, le=100, description="取得件数"),
-    offset: int = Query(0, ge=0, description="オフセット"),
+    offset: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
     is_active: bool = Query(True, description="有効な薬剤のみ"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -88,16 +102,7 @@ def get_medications(
     if is_active:
         db_query = db_query.filter(Medication.is_active == True)
     
-    total = db_query.count()
-    medications = db_query.order_by(Medication.drug_name).offset(offset).limit(limit).all()
-    
-    return MedicationListResponse(
-        items=medications,
-        total=total,
-        limit=limit,
-        offset=offset,
-        has_more=offset + len(medications) < total
-    )
+    return _medication_page(request, db_query, cursor, offset, limit)
 
 @router.get("/{medication_id}", response_model=MedicationResponse)
 def get_medication(
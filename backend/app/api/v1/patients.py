@@ -1,47 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Any
+import io
 
-from ...core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Any, Optional
+from datetime import datetime
+
+from ...core.database import get_async_db
 from ...core.deps import get_current_active_user, require_role
+from ...core.pagination import CURSOR_DESCRIPTION, OFFSET_DEPRECATION, page_links
 from ...models.user import UserRole
+from ...models.vital_observation import VITAL_METRICS
 from ...schemas.patient import (
     PatientCreate, 
     PatientUpdate, 
     PatientResponse, 
-    PatientListResponse,
-    PatientSearchParams
+    PatientSearchResponse,
+    PatientSearchParams,
+    PatientImportResult
 )
+from ...schemas.vitals import TrendMethod, VitalTrendResponse
+from ...services.patient_import import ImportFileError, ImportFormat, PatientImporter, spool_stream
 from ...services.patient_service import PatientService
+from ...services.vitals_service import get_vitals_trend
 
 patients_router = APIRouter()
 
 
 @patients_router.post("/", response_model=PatientResponse)
-def create_patient(
+async def create_patient(
     patient_create: PatientCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE, UserRole.RECEPTIONIST]))
 ) -> Any:
     """Create a new patient"""
     patient_service = PatientService(db)
-    patient = patient_service.create_patient(patient_create)
+    patient = await patient_service.create_patient(patient_create)
     return patient
 
 
-@patients_router.get("/", response_model=List[PatientListResponse])
-def search_patients(
+@patients_router.post("/import", response_model=PatientImportResult)
+async def import_patients(
+    request: Request,
+    format: Optional[ImportFormat] = Query(None, description="csv or ndjson (default: from Content-Type)"),
+    encoding: str = Query("utf-8-sig", description="Text encoding of the file, e.g. cp932"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(require_role([UserRole.ADMIN]))
+) -> Any:
+    """Bulk import patients from a CSV or NDJSON request body
+
+    Invalid rows are skipped and listed in the response with their line numbers.
+    """
+    content_type = request.headers.get("content-type", "")
+    file_format = format or (ImportFormat.NDJSON if "json" in content_type else ImportFormat.CSV)
+    try:
+        "".encode(encoding)
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown encoding: {encoding}"
+        )
+
+    spool = await spool_stream(request.stream())
+    with io.TextIOWrapper(spool, encoding=encoding, errors="replace", newline="") as stream:
+        try:
+            return await PatientImporter(db).import_file(stream, file_format)
+        except ImportFileError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+@patients_router.get("/", response_model=PatientSearchResponse)
+async def search_patients(
+    request: Request,
     patient_id: str = Query(None, description="Patient ID"),
     name: str = Query(None, description="Name search (partial match)"),
     kana: str = Query(None, description="Kana name search (partial match)"),
     phone: str = Query(None, description="Phone number"),
     date_of_birth: str = Query(None, description="Date of birth (YYYY-MM-DD)"),
-    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    skip: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
     limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
-    """Search patients with various criteria"""
+    """Search patients with various criteria; returns one page plus the total match count"""
     # Parse date_of_birth if provided
     parsed_dob = None
     if date_of_birth:
@@ -60,24 +101,34 @@ def search_patients(
         kana=kana,
         phone=phone,
         date_of_birth=parsed_dob,
-        skip=skip,
-        limit=limit
+        skip=0 if cursor else skip,
+        limit=limit,
+        cursor=cursor
     )
     
     patient_service = PatientService(db)
-    patients = patient_service.search_patients(search_params)
-    return patients
+    page, total = await patient_service.search_patients_page(search_params)
+    return {
+        "items": page.items,
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "has_more": page.has_more,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+        "links": page_links(request, page),
+    }
 
 
 @patients_router.get("/{patient_id}", response_model=PatientResponse)
-def get_patient(
+async def get_patient(
     patient_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
     """Get patient by ID"""
     patient_service = PatientService(db)
-    patient = patient_service.get_patient(patient_id)
+    patient = await patient_service.get_patient(patient_id)
     
     if not patient:
         raise HTTPException(
@@ -88,15 +139,53 @@ def get_patient(
     return patient
 
 
+@patients_router.get("/{patient_id}/vitals/trend", response_model=VitalTrendResponse)
+async def get_patient_vitals_trend(
+    patient_id: int,
+    metric: Optional[List[str]] = Query(None, description="Metrics to return (repeatable; default: all)"),
+    start: Optional[datetime] = Query(None, description="Observed at or after"),
+    end: Optional[datetime] = Query(None, description="Observed at or before"),
+    points: int = Query(500, ge=3, le=5000, description="Maximum points per metric"),
+    method: TrendMethod = Query(TrendMethod.LTTB, description="Downsampling method"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_active_user)
+) -> Any:
+    """Vital-sign trend for a patient: one downsampled array per metric"""
+    metrics = list(dict.fromkeys(metric or VITAL_METRICS))
+    unknown = [name for name in metrics if name not in VITAL_METRICS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown vital metric(s): {', '.join(unknown)}"
+        )
+
+    patient_service = PatientService(db)
+    if not await patient_service.get_patient(patient_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found"
+        )
+
+    series = await get_vitals_trend(db, patient_id, metrics, start, end, points, method)
+    return {
+        "patient_id": patient_id,
+        "start": start,
+        "end": end,
+        "method": method,
+        "points": points,
+        "series": series,
+    }
+
+
 @patients_router.get("/by-patient-id/{patient_id}", response_model=PatientResponse)
-def get_patient_by_patient_id(
+async def get_patient_by_patient_id(
     patient_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
     """Get patient by patient ID (medical record number)"""
     patient_service = PatientService(db)
-    patient = patient_service.get_patient_by_patient_id(patient_id)
+    patient = await patient_service.get_patient_by_patient_id(patient_id)
     
     if not patient:
         raise HTTPException(
@@ -108,15 +197,15 @@ def get_patient_by_patient_id(
 
 
 @patients_router.put("/{patient_id}", response_model=PatientResponse)
-def update_patient(
+async def update_patient(
     patient_id: int,
     patient_update: PatientUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_role([UserRole.ADMIN, UserRole.DOCTOR, UserRole.NURSE, UserRole.RECEPTIONIST]))
 ) -> Any:
     """Update patient information"""
     patient_service = PatientService(db)
-    patient = patient_service.update_patient(patient_id, patient_update)
+    patient = await patient_service.update_patient(patient_id, patient_update)
     
     if not patient:
         raise HTTPException(
@@ -128,14 +217,14 @@ def update_patient(
 
 
 @patients_router.delete("/{patient_id}")
-def delete_patient(
+async def delete_patient(
     patient_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_role([UserRole.ADMIN]))
 ) -> Any:
     """Delete patient (soft delete)"""
     patient_service = PatientService(db)
-    success = patient_service.delete_patient(patient_id)
+    success = await patient_service.delete_patient(patient_id)
     
     if not success:
         raise HTTPException(
@@ -147,13 +236,13 @@ def delete_patient(
 
 
 @patients_router.get("/search/count")
-def get_patients_count(
+async def get_patients_count(
     patient_id: str = Query(None, description="Patient ID"),
     name: str = Query(None, description="Name search (partial match)"),
     kana: str = Query(None, description="Kana name search (partial match)"),
     phone: str = Query(None, description="Phone number"),
     date_of_birth: str = Query(None, description="Date of birth (YYYY-MM-DD)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ) -> Any:
     """Get count of patients matching search criteria"""
@@ -180,5 +269,5 @@ def get_patients_count(
     )
     
     patient_service = PatientService(db)
-    count = patient_service.get_patients_count(search_params)
+    count = await patient_service.get_patients_count(search_params)
     return {"count": count}
\ No newline at end of file
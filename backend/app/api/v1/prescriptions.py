@@ -1,18 +1,21 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select
+from datetime import datetime
 
-from app.core.deps import get_db, get_current_user
+from app.core.deps import get_async_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, OFFSET_DEPRECATION, Keyset, decode_cursor, fetch_page, page_links
 from app.models.user import User
-from app.models.prescription import Prescription, PrescriptionItem, PrescriptionStatus
-from app.models.medication import Medication
+from app.models.prescription import Prescription, PrescriptionStatus
 from app.models.patient import Patient
-from app.models.encounter import Encounter
+from app.services.prescription_service import PrescriptionService, prescription_load_options
 from app.schemas.prescription import (
     PrescriptionResponse,
     PrescriptionCreate,
+    PrescriptionCreateResponse,
+    InteractionCheckRequest,
+    InteractionCheckResponse,
     PrescriptionUpdate,
     PrescriptionListResponse,
     PrescriptionSearch,
@@ -22,21 +25,26 @@ from app.schemas.prescription import (
 
 router = APIRouter()
 
-def generate_prescription_number(db: Session) -> str:
-    """処方箋番号を生成"""
-    today = datetime.now().strftime("%Y%m%d")
-    
-    # 今日の処方箋数を取得
-    count = db.query(Prescription).filter(
-        Prescription.prescription_number.like(f"{today}%")
-    ).count()
-    
-    return f"{today}-{count + 1:04d}"
+# レスポンスで参照するリレーション（非同期セッションでは遅延ロードできないため事前ロード）
+PRESCRIPTION_LOAD_OPTIONS = prescription_load_options()
 
-@router.post("/", response_model=PrescriptionResponse)
-def create_prescription(
+# 一覧の並び順（処方日の新しい順、同日時は ID で一意化）
+PRESCRIPTION_KEYSET = Keyset(Prescription.prescription_date, Prescription.id, descending=True)
+
+async def get_prescription_with_items(db: AsyncSession, prescription_id: int) -> Optional[Prescription]:
+    """明細・患者を含めて処方箋を取得"""
+    result = await db.execute(
+        select(Prescription)
+        .options(*PRESCRIPTION_LOAD_OPTIONS)
+        .where(Prescription.id == prescription_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.unique().scalars().first()
+
+@router.post("/", response_model=PrescriptionCreateResponse)
+async def create_prescription(
     prescription: PrescriptionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """処方箋作成"""
@@ -46,131 +54,91 @@ def create_prescription(
     if current_user.role.value not in ["doctor", "admin"]:
         raise HTTPException(status_code=403, detail="処方箋作成権限がありません")
     
-    # 患者存在確認
-    patient = db.query(Patient).filter(Patient.id == prescription.patient_id).first()
+    return await PrescriptionService(db).create_prescription(prescription, current_user.id)
+
+@router.post("/interaction-check", response_model=InteractionCheckResponse)
+async def check_prescription_interactions(
+    check: InteractionCheckRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """処方前の相互作用・禁忌・アレルギーチェック（服用中の薬剤を含む）"""
+    
+    patient = await db.get(Patient, check.patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="患者が見つかりません")
     
-    # 診療記録存在確認
-    encounter = db.query(Encounter).filter(Encounter.id == prescription.encounter_id).first()
-    if not encounter:
-        raise HTTPException(status_code=404, detail="診療記録が見つかりません")
-    
-    # 薬剤存在確認
-    medication_ids = [item.medication_id for item in prescription.prescription_items]
-    medications = db.query(Medication).filter(Medication.id.in_(medication_ids)).all()
-    if len(medications) != len(medication_ids):
-        raise HTTPException(status_code=404, detail="指定された薬剤が見つかりません")
-    
-    # 処方箋作成
-    prescription_data = prescription.dict(exclude={"prescription_items"})
-    prescription_data["prescriber_id"] = current_user.id
-    prescription_data["prescription_number"] = generate_prescription_number(db)
-    
-    # instructionsをdispensing_instructionsにマッピング
-    if "instructions" in prescription_data:
-        prescription_data["dispensing_instructions"] = prescription_data.pop("instructions")
-    
-    # 有効期限設定（処方日から4日後）
-    if not prescription_data.get("expiry_date"):
-        prescription_data["expiry_date"] = prescription.prescription_date + timedelta(days=4)
-    
-    db_prescription = Prescription(**prescription_data)
-    db.add(db_prescription)
-    db.flush()  # IDを取得するためフラッシュ
-    
-    # 処方明細作成
-    total_cost = 0
-    for item_data in prescription.prescription_items:
-        medication = next(m for m in medications if m.id == item_data.medication_id)
-        
-        # 費用計算
-        unit_cost = medication.unit_price or 0
-        item_total_cost = unit_cost * item_data.quantity
-        total_cost += item_total_cost
-        
-        prescription_item = PrescriptionItem(
-            prescription_id=db_prescription.id,
-            unit_cost=unit_cost,
-            total_cost=item_total_cost,
-            **item_data.dict()
-        )
-        db.add(prescription_item)
-    
-    # 処方箋総費用更新
-    db_prescription.total_cost = total_cost
-    db_prescription.patient_payment = total_cost * 0.3  # 仮の患者負担3割
-    db_prescription.insurance_coverage = total_cost * 0.7  # 保険適用7割
-    
-    db.commit()
-    db.refresh(db_prescription)
-    
-    return db_prescription
+    warnings = await PrescriptionService(db).check_interactions(
+        patient, check.medication_ids, datetime.now(), check.exclude_prescription_id
+    )
+    return InteractionCheckResponse(warnings=warnings)
 
 @router.get("/", response_model=PrescriptionListResponse)
-def get_prescriptions(
+async def get_prescriptions(
+    request: Request,
     patient_id: Optional[int] = Query(None, description="患者IDで絞り込み"),
     encounter_id: Optional[int] = Query(None, description="診療記録IDで絞り込み"),
     status: Optional[PrescriptionStatus] = Query(None, description="ステータスで絞り込み"),
     prescription_date_from: Optional[datetime] = Query(None, description="処方日範囲（開始）"),
     prescription_date_to: Optional[datetime] = Query(None, description="処方日範囲（終了）"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     limit: int = Query(50, ge=1, le=100, description="取得件数"),
-    offset: int = Query(0, ge=0, description="オフセット"),
-    db: Session = Depends(get_db),
+    offset: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """処方箋一覧取得"""
     
-    from sqlalchemy.orm import joinedload
-    
-    db_query = db.query(Prescription).options(
-        joinedload(Prescription.patient),
-        joinedload(Prescription.prescriber),
-        joinedload(Prescription.prescription_items).joinedload(PrescriptionItem.medication)
-    )
+    db_query = select(Prescription)
     
     # 患者IDフィルター
     if patient_id:
-        db_query = db_query.filter(Prescription.patient_id == patient_id)
+        db_query = db_query.where(Prescription.patient_id == patient_id)
     
     # 診療記録IDフィルター
     if encounter_id:
-        db_query = db_query.filter(Prescription.encounter_id == encounter_id)
+        db_query = db_query.where(Prescription.encounter_id == encounter_id)
     
     # ステータスフィルター
     if status:
-        db_query = db_query.filter(Prescription.status == status)
+        db_query = db_query.where(Prescription.status == status)
     
     # 処方日範囲フィルター
     if prescription_date_from:
-        db_query = db_query.filter(Prescription.prescription_date >= prescription_date_from)
+        db_query = db_query.where(Prescription.prescription_date >= prescription_date_from)
     if prescription_date_to:
-        db_query = db_query.filter(Prescription.prescription_date <= prescription_date_to)
+        db_query = db_query.where(Prescription.prescription_date <= prescription_date_to)
     
     # 医師の場合は自分の処方箋のみ表示（管理者は全て表示）
     if current_user.role.value == "doctor":
-        db_query = db_query.filter(Prescription.prescriber_id == current_user.id)
+        db_query = db_query.where(Prescription.prescriber_id == current_user.id)
     
-    total = db_query.count()
-    prescriptions = db_query.order_by(Prescription.prescription_date.desc()).offset(offset).limit(limit).all()
+    db_query = db_query.options(*PRESCRIPTION_LOAD_OPTIONS)
+    page_cursor = decode_cursor(PRESCRIPTION_KEYSET, cursor)
+    page, total = await fetch_page(
+        db, db_query, PRESCRIPTION_KEYSET, page_cursor, 0 if page_cursor else offset, limit
+    )
     
     return PrescriptionListResponse(
-        items=prescriptions,
+        items=page.items,
         total=total,
         limit=limit,
         offset=offset,
-        has_more=offset + len(prescriptions) < total
+        has_more=page.has_more,
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+        links=page_links(request, page)
     )
 
 @router.get("/{prescription_id}", response_model=PrescriptionResponse)
-def get_prescription(
+async def get_prescription(
     prescription_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """処方箋詳細取得"""
     
-    prescription = db.query(Prescription).filter(Prescription.id == prescription_id).first()
+    prescription = await get_prescription_with_items(db, prescription_id)
     if not prescription:
         raise HTTPException(status_code=404, detail="処方箋が見つかりません")
     
@@ -181,15 +149,15 @@ def get_prescription(
     return prescription
 
 @router.put("/{prescription_id}", response_model=PrescriptionResponse)
-def update_prescription(
+async def update_prescription(
     prescription_id: int,
     prescription_update: PrescriptionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """処方箋更新"""
     
-    prescription = db.query(Prescription).filter(Prescription.id == prescription_id).first()
+    prescription = await db.get(Prescription, prescription_id)
     if not prescription:
         raise HTTPException(status_code=404, detail="処方箋が見つかりません")
     
@@ -206,110 +174,82 @@ def update_prescription(
     for field, value in update_data.items():
         setattr(prescription, field, value)
     
-    db.commit()
-    db.refresh(prescription)
+    await db.commit()
     
-    return prescription
+    return await get_prescription_with_items(db, prescription_id)
 
 @router.post("/{prescription_id}/dispense")
-def dispense_prescription(
+async def dispense_prescription(
     prescription_id: int,
     dispensing_updates: List[DispensingUpdate],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """処方箋調剤処理"""
     
-    prescription = db.query(Prescription).filter(Prescription.id == prescription_id).first()
-    if not prescription:
-        raise HTTPException(status_code=404, detail="処方箋が見つかりません")
-    
     # 薬剤師・管理者のみ調剤可能
     if current_user.role.value not in ["pharmacist", "admin"]:
         raise HTTPException(status_code=403, detail="調剤権限がありません")
     
-    # 処方明細更新
-    for dispensing in dispensing_updates:
-        prescription_item = db.query(PrescriptionItem).filter(
-            and_(
-                PrescriptionItem.id == dispensing.prescription_item_id,
-                PrescriptionItem.prescription_id == prescription_id
-            )
-        ).first()
-        
-        if not prescription_item:
-            raise HTTPException(status_code=404, detail="処方明細が見つかりません")
-        
-        # 調剤量チェック
-        if dispensing.dispensed_quantity > prescription_item.quantity:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"調剤量が処方量を超えています: {prescription_item.medication.drug_name}"
-            )
-        
-        # 調剤情報更新
-        prescription_item.dispensed_quantity = dispensing.dispensed_quantity
-        prescription_item.dispensed_date = dispensing.dispensed_date or datetime.now()
-        prescription_item.is_dispensed = dispensing.dispensed_quantity >= prescription_item.quantity
-    
-    # 処方箋ステータス更新
-    all_dispensed = all(item.is_dispensed for item in prescription.prescription_items)
-    partially_dispensed = any(item.dispensed_quantity > 0 for item in prescription.prescription_items)
-    
-    if all_dispensed:
-        prescription.status = PrescriptionStatus.DISPENSED
-    elif partially_dispensed:
-        prescription.status = PrescriptionStatus.PARTIALLY_DISPENSED
-    
-    prescription.dispensing_date = datetime.now()
-    
     # 薬剤師名設定
-    if hasattr(dispensing_updates[0], 'pharmacist_name') and dispensing_updates[0].pharmacist_name:
-        prescription.pharmacist_name = dispensing_updates[0].pharmacist_name
-    else:
-        prescription.pharmacist_name = current_user.full_name
+    pharmacist_name = next(
+        (dispensing.pharmacist_name for dispensing in dispensing_updates[:1] if dispensing.pharmacist_name),
+        current_user.full_name
+    )
     
-    db.commit()
+    prescription = await PrescriptionService(db).dispense(prescription_id, dispensing_updates, pharmacist_name)
+    if not prescription:
+        raise HTTPException(status_code=404, detail="処方箋が見つかりません")
     
     return {"message": "調剤処理が完了しました", "status": prescription.status}
 
 @router.get("/patient/{patient_id}/history", response_model=PrescriptionListResponse)
-def get_patient_prescription_history(
+async def get_patient_prescription_history(
+    request: Request,
     patient_id: int,
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
     limit: int = Query(50, ge=1, le=100, description="取得件数"),
-    offset: int = Query(0, ge=0, description="オフセット"),
-    db: Session = Depends(get_db),
+    offset: int = Query(0, ge=0, deprecated=True, description=OFFSET_DEPRECATION),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """患者の処方履歴取得"""
     
     # 患者存在確認
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    patient = await db.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="患者が見つかりません")
     
-    db_query = db.query(Prescription).filter(Prescription.patient_id == patient_id)
-    
-    total = db_query.count()
-    prescriptions = db_query.order_by(Prescription.prescription_date.desc()).offset(offset).limit(limit).all()
+    db_query = (
+        select(Prescription)
+        .where(Prescription.patient_id == patient_id)
+        .options(*PRESCRIPTION_LOAD_OPTIONS)
+    )
+    page_cursor = decode_cursor(PRESCRIPTION_KEYSET, cursor)
+    page, total = await fetch_page(
+        db, db_query, PRESCRIPTION_KEYSET, page_cursor, 0 if page_cursor else offset, limit
+    )
     
     return PrescriptionListResponse(
-        items=prescriptions,
+        items=page.items,
         total=total,
         limit=limit,
         offset=offset,
-        has_more=offset + len(prescriptions) < total
+        has_more=page.has_more,
+        next_cursor=page.next_cursor,
+        prev_cursor=page.prev_cursor,
+        links=page_links(request, page)
     )
 
 @router.delete("/{prescription_id}")
-def cancel_prescription(
+async def cancel_prescription(
     prescription_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """処方箋中止"""
     
-    prescription = db.query(Prescription).filter(Prescription.id == prescription_id).first()
+    prescription = await db.get(Prescription, prescription_id)
     if not prescription:
         raise HTTPException(status_code=404, detail="処方箋が見つかりません")
     
@@ -322,6 +262,6 @@ def cancel_prescription(
         raise HTTPException(status_code=400, detail="調剤済みの処方箋は中止できません")
     
     prescription.status = PrescriptionStatus.CANCELLED
-    db.commit()
+    await db.commit()
     
     return {"message": "処方箋を中止しました"}
\ No newline at end of file
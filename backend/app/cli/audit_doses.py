@@ -0,0 +1,43 @@
+"""
+Nightly dose audit of prescription items
+
+Checks every item prescribed on a day (yesterday by default) against the
+medication's min/max daily dose, in one batch. Meant to run from cron
+after midnight:
+
+    python -m app.cli.audit_doses
+    python -m app.cli.audit_doses --date 2026-10-16 --days 7
+
+Prints the audit report as JSON and exits with status 1 if any dose is out
+of range.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import date, datetime, timedelta
+
+from ..core.database import AsyncSessionLocal
+from ..services.dose_validation import audit_doses
+
+
+async def run_audit(day: date, days: int) -> bool:
+    date_from = datetime.combine(day, datetime.min.time())
+    async with AsyncSessionLocal() as db:
+        report = await audit_doses(db, date_from, date_from + timedelta(days=days))
+    print(report.model_dump_json(indent=2))
+    return not report.warnings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today() - timedelta(days=1),
+                        help="first prescription date to audit (default: yesterday)")
+    parser.add_argument("--days", type=int, default=1)
+    args = parser.parse_args()
+
+    ok = asyncio.run(run_audit(args.date, args.days))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Bulk patient import from the command line
+
+    python -m app.cli.import_patients patients.csv
+    python -m app.cli.import_patients legacy.ndjson --format ndjson
+    python -m app.cli.import_patients export.csv --encoding cp932 --batch-size 5000
+
+Prints the import report as JSON and exits with status 1 if any row failed.
+"""
+import argparse
+import asyncio
+import sys
+
+from ..core.database import AsyncSessionLocal
+from ..services.patient_import import ImportFileError, ImportFormat, PatientImporter
+
+
+def _guess_format(path: str) -> ImportFormat:
+    return ImportFormat.NDJSON if path.lower().endswith((".ndjson", ".jsonl")) else ImportFormat.CSV
+
+
+async def import_patients(path: str, file_format: ImportFormat, encoding: str, batch_size: int) -> bool:
+    with open(path, encoding=encoding, errors="replace", newline="") as stream:
+        async with AsyncSessionLocal() as db:
+            result = await PatientImporter(db, batch_size=batch_size).import_file(stream, file_format)
+    print(result.model_dump_json(indent=2))
+    return result.failed == 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=[f.value for f in ImportFormat], help="default: from the file extension")
+    parser.add_argument("--encoding", default="utf-8-sig")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    file_format = ImportFormat(args.format) if args.format else _guess_format(args.path)
+    try:
+        ok = asyncio.run(import_patients(args.path, file_format, args.encoding, args.batch_size))
+    except ImportFileError as exc:
+        sys.exit(f"error: {exc}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
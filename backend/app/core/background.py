@@ -0,0 +1,56 @@
+"""
+Periodic background tasks
+
+Modules register coroutines with ``register_periodic_task`` and the
+application starts/stops them from its startup and shutdown events. Each
+task runs in every worker process.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_registered: Dict[str, Tuple[float, Callable[[], Awaitable[None]], bool]] = {}
+_running: List[asyncio.Task] = []
+
+
+def register_periodic_task(
+    name: str,
+    interval_seconds: float,
+    func: Callable[[], Awaitable[None]],
+    run_immediately: bool = True,
+) -> None:
+    """Register ``func`` to run every ``interval_seconds`` once the app starts"""
+    _registered[name] = (interval_seconds, func, run_immediately)
+
+
+async def _run_periodically(name: str, interval_seconds: float, func, run_immediately: bool) -> None:
+    if not run_immediately:
+        await asyncio.sleep(interval_seconds)
+    while True:
+        try:
+            await func()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background task %s failed", name)
+        await asyncio.sleep(interval_seconds)
+
+
+def start_background_tasks() -> None:
+    """Start every registered task on the running event loop"""
+    for name, (interval_seconds, func, run_immediately) in _registered.items():
+        task = asyncio.create_task(
+            _run_periodically(name, interval_seconds, func, run_immediately),
+            name=name,
+        )
+        _running.append(task)
+
+
+async def stop_background_tasks() -> None:
+    """Cancel running tasks and wait for them to finish"""
+    for task in _running:
+        task.cancel()
+    await asyncio.gather(*_running, return_exceptions=True)
+    _running.clear()
@@ -1,8 +1,36 @@
+import asyncio
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from .config import settings
+from .pool_metrics import InstrumentedQueuePool, InstrumentedAsyncAdaptedQueuePool, instrument_engine
+from .replicas import (
+    REPLICA_BIND_KEY,
+    SAFE_METHODS,
+    ReadAfterWriteTracker,
+    ReplicaSet,
+    RoutingSession,
+)
+
+# Async drivers used for each sync database URL scheme
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Convert a sync database URL into its async driver equivalent"""
+    url_obj = make_url(url)
+    backend = url_obj.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend: {backend}")
+    return url_obj.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
 
 # Database engine setup
 if settings.environment == "test":
@@ -12,30 +40,101 @@ if settings.environment == "test":
         poolclass=StaticPool,
         connect_args={"check_same_thread": False} if "sqlite" in settings.test_database_url else {}
     )
+    async_engine = create_async_engine(
+        to_async_url(settings.test_database_url),
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False} if "sqlite" in settings.test_database_url else {}
+    )
+    replica_engines = []
+    async_replica_engines = []
 else:
     # Use main database for development/production
+    pool_options = dict(
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
     engine = create_engine(
         settings.database_url,
-        pool_pre_ping=True,
-        pool_recycle=300,
-        pool_size=5,
-        max_overflow=10
+        poolclass=InstrumentedQueuePool,
+        **pool_options
     )
+    # Pool class is explicit because aiosqlite otherwise defaults to NullPool
+    async_engine = create_async_engine(
+        to_async_url(settings.database_url),
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        **pool_options
+    )
+    instrument_engine(engine, "primary")
+    instrument_engine(async_engine.sync_engine, "primary_async")
+
+    # Optional read replicas, one sync and one async engine per URL
+    replica_engines = []
+    async_replica_engines = []
+    for index, replica_url in enumerate(settings.database_replica_urls):
+        replica_engine = create_engine(replica_url, poolclass=InstrumentedQueuePool, **pool_options)
+        async_replica_engine = create_async_engine(
+            to_async_url(replica_url),
+            poolclass=InstrumentedAsyncAdaptedQueuePool,
+            **pool_options
+        )
+        instrument_engine(replica_engine, f"replica{index}")
+        instrument_engine(async_replica_engine.sync_engine, f"replica{index}_async")
+        replica_engines.append(replica_engine)
+        async_replica_engines.append(async_replica_engine)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+replica_set = ReplicaSet(replica_engines, async_replica_engines)
+read_after_write = ReadAfterWriteTracker(settings.replica_read_after_write_window)
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+# expire_on_commit=False: attributes must stay readable after commit because
+# async sessions cannot lazy-load them again during response serialization
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
 Base = declarative_base()
 
 
-def get_db():
+def _reads_from_replica(request: Request) -> bool:
+    """Safe-method requests from clients without a recent write may use a replica"""
+    if not replica_set or request.method not in SAFE_METHODS:
+        return False
+    client_key = read_after_write.client_key(request.headers.get("authorization"))
+    return not read_after_write.wrote_recently(client_key)
+
+
+def get_db(request: Request):
     """Database dependency for FastAPI"""
     db = SessionLocal()
+    if _reads_from_replica(request):
+        db.info[REPLICA_BIND_KEY] = replica_set.pick_sync()
     try:
         yield db
     finally:
         db.close()
 
 
+async def get_async_db(request: Request):
+    """Async database dependency for FastAPI"""
+    async with AsyncSessionLocal() as db:
+        if _reads_from_replica(request):
+            db.info[REPLICA_BIND_KEY] = replica_set.pick_async()
+        yield db
+
+
+async def check_replica_health():
+    """Periodic replica health check (runs the blocking pings in a thread)"""
+    await asyncio.to_thread(replica_set.check_health)
+
+
 def create_tables():
     """Create all tables"""
     Base.metadata.create_all(bind=engine)
@@ -43,4 +142,4 @@ def create_tables():
 
 def drop_tables():
     """Drop all tables"""
-    Base.metadata.drop_all(bind=engine)
\ No newline at end of file
+    Base.metadata.drop_all(bind=engine)
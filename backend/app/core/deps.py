@@ -1,62 +1,159 @@
-from typing import Generator, Optional
+from dataclasses import dataclass
+from typing import Any, Dict, Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 
-from .database import get_db
+from .database import get_async_db
 from .config import settings
-from ..models.user import User
+from .principal_cache import cache_principal, get_cached_principal
+from .revocation import revocations
+from ..models.user import User, UserRole
 
 
 security = HTTPBearer()
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> User:
-    """Get current authenticated user"""
-    credentials_exception = HTTPException(
+@dataclass
+class TokenPrincipal:
+    """The authenticated user as described by verified token claims"""
+    id: int
+    username: str
+    role: UserRole
+    full_name: str
+    is_active: bool
+    token_version: int
+
+
+def principal_claims(user: User) -> Dict[str, Any]:
+    """Claims that let require_role authorize without loading the user"""
+    return {
+        "uid": user.id,
+        "role": user.role.value,
+        "name": user.full_name,
+        "act": bool(user.is_active),
+        "ver": user.token_version or 0,
+    }
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _revoked_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token has been revoked",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _decode_token(credentials: HTTPAuthorizationCredentials) -> Dict[str, Any]:
     try:
         payload = jwt.decode(
-            credentials.credentials, 
-            settings.secret_key, 
+            credentials.credentials,
+            settings.secret_key,
             algorithms=[settings.algorithm]
         )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == username).first()
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+
+async def _load_user(db: AsyncSession, payload: Dict[str, Any]) -> User:
+    username: str = payload["sub"]
+    version = payload.get("ver")
+    # Revoked per the table this worker keeps current, whatever the cache holds
+    if version is not None and revocations.loaded and revocations.reason(username, version):
+        raise _revoked_exception()
+
+    # Most requests are served from the principal cache without a query
+    user = await get_cached_principal(username)
+    if user is not None and version is not None and version > (user.token_version or 0):
+        # The token was issued after a change the cached entry predates
+        user = None
     if user is None:
-        raise credentials_exception
+        result = await db.execute(select(User).where(User.username == username))
+        user = result.scalars().first()
+        if user is None:
+            raise _credentials_exception()
+        await cache_principal(user)
+
+    # Tokens issued before the last role/active/password change are revoked
+    if version is not None and version < (user.token_version or 0):
+        raise _revoked_exception()
     return user
 
 
-def get_current_active_user(
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> User:
+    """Get current authenticated user"""
+    return await _load_user(db, _decode_token(credentials))
+
+
+async def get_current_active_user(
     current_user: User = Depends(get_current_user),
-) -> User:  
+) -> User:
     """Get current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
+def _principal_from_claims(payload: Dict[str, Any]) -> Optional[TokenPrincipal]:
+    """The principal in a token carrying principal_claims, else None"""
+    try:
+        return TokenPrincipal(
+            id=int(payload["uid"]),
+            username=payload["sub"],
+            role=UserRole(payload["role"]),
+            full_name=payload["name"],
+            is_active=bool(payload["act"]),
+            token_version=int(payload["ver"]),
+        )
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
 def require_role(allowed_roles: list):
-    """Decorator factory to require specific roles"""
-    def role_checker(current_user: User = Depends(get_current_active_user)):
-        if current_user.role not in allowed_roles:
+    """Decorator factory to require specific roles
+
+    Authorizes from the signed token claims checked against the revocation
+    table, without a database round trip. Tokens without the claims (issued
+    before they existed), or a table not loaded yet, fall back to loading the
+    user.
+    """
+    async def role_checker(
+        db: AsyncSession = Depends(get_async_db),
+        credentials: HTTPAuthorizationCredentials = Depends(security),
+    ):
+        payload = _decode_token(credentials)
+        principal = _principal_from_claims(payload) if revocations.loaded else None
+        if principal is not None:
+            reason = revocations.reason(principal.username, principal.token_version)
+            if reason == "revoked":
+                raise _revoked_exception()
+            is_active = principal.is_active and reason != "inactive"
+        else:
+            principal = await _load_user(db, payload)
+            is_active = principal.is_active
+
+        if not is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
+        if principal.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions"
             )
-        return current_user
-    return role_checker
\ No newline at end of file
+        return principal
+    return role_checker
@@ -0,0 +1,162 @@
+"""
+In-process metrics registry
+
+Minimal counters, gauges and histograms rendered in the Prometheus text
+exposition format for the internal metrics endpoint. Values are per worker
+process; scrape every worker to get the full picture.
+"""
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames: Iterable[str], values: LabelValues, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ""
+    inner = ",".join(f'{name}="{value}"' for name, value in pairs)
+    return "{" + inner + "}"
+
+
+class _Metric(ABC):
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Sample lines in the text exposition format"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    metric_type = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set explicitly or read from a callback at scrape time"""
+    metric_type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Iterable[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self._collect:
+            values.update(self._collect())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed histogram"""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, {"le": str(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': '+Inf'})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics exposed by the internal metrics endpoint"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Re-registering returns the existing metric so module reloads stay safe
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
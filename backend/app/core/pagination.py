@@ -0,0 +1,221 @@
+"""
+List pagination helpers
+
+Lists are paged with opaque keyset cursors: a token holds the sort-key
+values of the row at the page boundary, and the next page is read with
+``WHERE (sort keys) > (values) ORDER BY sort keys LIMIT n``, which costs the
+same on page 500 as on page 1 and does not shift when rows are inserted.
+``offset``/``skip`` remain as a deprecated fallback.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import Select
+
+NEXT = "n"
+PREV = "p"
+
+CURSOR_DESCRIPTION = "Opaque cursor from next_cursor/prev_cursor (replaces offset)"
+OFFSET_DEPRECATION = "Deprecated: use cursor"
+
+
+@dataclass
+class Cursor:
+    values: List[Any]
+    direction: str = NEXT
+
+
+@dataclass
+class CursorPage:
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    links: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+class Keyset:
+    """Sort order of a keyset-paginated list
+
+    All columns sort in the same direction and the last one must be unique
+    (normally the primary key) so every row has a distinct position.
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def encode(self, item: Any, direction: str) -> str:
+        values = [getattr(item, column.key) for column in self.columns]
+        payload = {"k": [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values], "d": direction}
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, token: str) -> Cursor:
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            payload = json.loads(raw)
+            values, direction = payload["k"], payload["d"]
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise _invalid_cursor()
+        if direction not in (NEXT, PREV) or not isinstance(values, list) or len(values) != len(self.columns):
+            raise _invalid_cursor()
+        try:
+            loaded = [self._load(column, value) for column, value in zip(self.columns, values)]
+        except (TypeError, ValueError):
+            raise _invalid_cursor()
+        return Cursor(loaded, direction)
+
+    @staticmethod
+    def _load(column, value: Any) -> Any:
+        python_type = column.type.python_type
+        if python_type in (datetime, date):
+            return python_type.fromisoformat(value)
+        return python_type(value)
+
+    def order(self, query, reverse: bool = False):
+        """ORDER BY the sort keys (``reverse`` flips the direction)"""
+        descending = self.descending != reverse
+        return query.order_by(*(column.desc() if descending else column.asc() for column in self.columns))
+
+    def apply(self, query, cursor: Optional[Cursor], limit: int):
+        """Restrict ``query`` to the page after/before ``cursor`` (fetching one extra row)"""
+        backwards = cursor is not None and cursor.direction == PREV
+        if cursor is not None:
+            keys = tuple_(*self.columns)
+            bound = tuple_(*cursor.values)
+            # Moving forward through a DESC list means smaller keys, and vice versa
+            query = query.where(keys < bound if self.descending != backwards else keys > bound)
+        return self.order(query, reverse=backwards).limit(limit + 1)
+
+    def page(self, rows: Sequence[Any], cursor: Optional[Cursor], limit: int) -> CursorPage:
+        """Trim the look-ahead row and build the neighbouring cursors"""
+        rows = list(rows)
+        more = len(rows) > limit
+        rows = rows[:limit]
+        backwards = cursor is not None and cursor.direction == PREV
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return CursorPage(items=[])
+
+        # Walking backwards, the page we came from is always ahead
+        has_next = True if backwards else more
+        has_prev = more if backwards else cursor is not None
+        page = CursorPage(items=rows)
+        if has_next:
+            page.next_cursor = self.encode(rows[-1], NEXT)
+        if has_prev:
+            page.prev_cursor = self.encode(rows[0], PREV)
+        return page
+
+    def offset_page(self, items: List[Any], skip: int, total: int) -> CursorPage:
+        """Cursors for a page read by offset, so clients can switch to cursors"""
+        page = CursorPage(items=items)
+        if items:
+            if skip + len(items) < total:
+                page.next_cursor = self.encode(items[-1], NEXT)
+            if skip > 0:
+                page.prev_cursor = self.encode(items[0], PREV)
+        return page
+
+
+def decode_cursor(keyset: Keyset, token: Optional[str]) -> Optional[Cursor]:
+    return keyset.decode(token) if token else None
+
+
+def _with_total(query):
+    return query.add_columns(func.count().over().label("total"))
+
+
+def _split_total(rows: Sequence[Any]) -> Tuple[List[Any], int]:
+    return [row[0] for row in rows], (rows[0].total if rows else 0)
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query: Select,
+    keyset: Keyset,
+    cursor: Optional[Cursor],
+    skip: int,
+    limit: int,
+) -> Tuple[CursorPage, Optional[int]]:
+    """Read one page of ``query`` (a single-entity SELECT) with an AsyncSession
+
+    Returns the page and the total match count. The total is computed with
+    ``count(*) OVER ()`` on the first page and on offset pages; cursor pages
+    skip it (``None``) so that they never touch rows outside the page.
+    """
+    if cursor is not None:
+        result = await db.execute(keyset.apply(query, cursor, limit))
+        return keyset.page(result.unique().scalars().all(), cursor, limit), None
+    if skip:
+        items, total = await fetch_page_with_total(db, keyset.order(query), skip, limit)
+        return keyset.offset_page(items, skip, total), total
+    rows = (await db.execute(keyset.apply(_with_total(query), None, limit))).unique().all()
+    items, total = _split_total(rows)
+    return keyset.page(items, None, limit), total
+
+
+def fetch_page_sync(
+    query: Query,
+    keyset: Keyset,
+    cursor: Optional[Cursor],
+    skip: int,
+    limit: int,
+) -> Tuple[CursorPage, Optional[int]]:
+    """``fetch_page`` for a legacy ``Session.query``"""
+    if cursor is not None:
+        return keyset.page(keyset.apply(query, cursor, limit).all(), cursor, limit), None
+    if skip:
+        items, total = _split_total(_with_total(keyset.order(query)).offset(skip).limit(limit).all())
+        if not items:
+            total = query.order_by(None).count()
+        return keyset.offset_page(items, skip, total), total
+    items, total = _split_total(keyset.apply(_with_total(query), None, limit).all())
+    return keyset.page(items, None, limit), total
+
+
+def page_links(request: Request, page: CursorPage) -> Dict[str, str]:
+    """Absolute next/prev URLs: the current URL with ``cursor`` swapped and offsets dropped"""
+    base = request.url.remove_query_params(("cursor", "offset", "skip"))
+    links = {}
+    if page.next_cursor:
+        links["next"] = str(base.include_query_params(cursor=page.next_cursor))
+    if page.prev_cursor:
+        links["prev"] = str(base.include_query_params(cursor=page.prev_cursor))
+    page.links = links
+    return links
+
+
+async def fetch_page_with_total(db: AsyncSession, query: Select, skip: int, limit: int) -> Tuple[List[Any], int]:
+    """Run ``query`` for one page and the total match count in a single round trip
+
+    ``query`` selects a single entity; the total rides along on every row as
+    ``count(*) OVER ()``. Only a page past the end, which has no row to carry
+    the total, costs a second COUNT query.
+    """
+    windowed = query.add_columns(func.count().over().label("total")).offset(skip).limit(limit)
+    rows = (await db.execute(windowed)).all()
+    if rows:
+        return [row[0] for row in rows], rows[0].total
+    if skip == 0:
+        return [], 0
+
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    return [], (await db.execute(count_query)).scalar()
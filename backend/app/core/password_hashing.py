@@ -0,0 +1,70 @@
+"""
+Password hashing off the request path
+
+bcrypt is deliberately slow CPU work. Run inline it occupies an API
+worker for the whole hash, so a burst of logins (a shift change) stalls
+every other request. Hashes are computed in a dedicated pool of
+``password_hash_workers`` processes instead; the event loop only awaits
+the result, and the pool size bounds how much CPU logins can take.
+``password_hash_workers = 0`` hashes in a thread (development, tests).
+
+The pool starts on first use and is shut down with the application.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, Tuple, TypeVar
+
+from .config import settings
+from .security import get_password_hash, verify_and_update_password
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> Optional[Executor]:
+    global _pool
+    if settings.password_hash_workers <= 0:
+        return None
+    if _pool is None:
+        # spawn: forking a process that runs threads and an event loop is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def _run(func: Callable[..., T], *args) -> T:
+    pool = _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(func, *args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start a fresh pool and retry once
+        logger.warning("Password hashing pool broken; restarting it")
+        shutdown_password_pool()
+        return await loop.run_in_executor(_get_pool(), func, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """``(valid, new_hash)``; ``new_hash`` is set when the stored hash needs a rehash"""
+    return await _run(verify_and_update_password, plain_password, hashed_password)
+
+
+def shutdown_password_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,124 @@
+"""
+Connection pool instrumentation
+
+Checkout wait time and timeouts are measured by the instrumented pool
+classes, which time ``_do_get`` (the part of a checkout that blocks when the
+pool is exhausted). In-use connections are tracked with pool events, and
+pool size / overflow are read from each registered pool at scrape time.
+"""
+import time
+import weakref
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from .metrics import Counter, Gauge, Histogram, registry
+
+CHECKOUT_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Pools registered for scrape-time gauges, keyed by pool label
+_pools: "weakref.WeakValueDictionary[str, Pool]" = weakref.WeakValueDictionary()
+
+
+def _collect(reader) -> Dict[tuple, float]:
+    values = {}
+    for name, pool in list(_pools.items()):
+        value = reader(pool)
+        if value is not None:
+            values[(name,)] = value
+    return values
+
+
+def _queue_pool_attr(pool: Pool, attr: str):
+    return getattr(pool, attr)() if isinstance(pool, QueuePool) else None
+
+
+pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    labelnames=("pool",),
+    buckets=CHECKOUT_WAIT_BUCKETS,
+))
+pool_checkout_timeouts = registry.register(Counter(
+    "db_pool_checkout_timeouts_total",
+    "Checkouts that gave up after pool_timeout seconds",
+    labelnames=("pool",),
+))
+pool_checkouts = registry.register(Counter(
+    "db_pool_checkouts_total",
+    "Connections checked out from the pool",
+    labelnames=("pool",),
+))
+pool_in_use = registry.register(Gauge(
+    "db_pool_connections_in_use",
+    "Connections currently checked out",
+    labelnames=("pool",),
+))
+pool_size = registry.register(Gauge(
+    "db_pool_size",
+    "Configured pool size",
+    labelnames=("pool",),
+    collect=lambda: _collect(lambda pool: _queue_pool_attr(pool, "size")),
+))
+pool_overflow = registry.register(Gauge(
+    "db_pool_overflow",
+    "Connections open beyond pool_size (negative while the pool is still filling)",
+    labelnames=("pool",),
+    collect=lambda: _collect(lambda pool: _queue_pool_attr(pool, "overflow")),
+))
+pool_idle = registry.register(Gauge(
+    "db_pool_connections_idle",
+    "Connections sitting idle in the pool",
+    labelnames=("pool",),
+    collect=lambda: _collect(lambda pool: _queue_pool_attr(pool, "checkedin")),
+))
+
+
+class _TimedCheckoutMixin:
+    """Times the blocking part of a checkout and counts pool timeouts"""
+
+    metrics_label = "unlabelled"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_checkout_timeouts.inc(pool=self.metrics_label)
+            raise
+        pool_checkout_wait.observe(time.perf_counter() - started, pool=self.metrics_label)
+        return connection
+
+    def recreate(self):
+        # dispose() / invalidation recreate the pool; keep the label on the new one
+        new_pool = super().recreate()
+        new_pool.metrics_label = self.metrics_label
+        _pools[self.metrics_label] = new_pool
+        return new_pool
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    """QueuePool with checkout wait-time instrumentation"""
+
+
+class InstrumentedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout wait-time instrumentation"""
+
+
+def instrument_engine(engine: Engine, label: str) -> None:
+    """Register an engine's pool under ``label`` and attach checkout/checkin events"""
+    pool = engine.pool
+    pool.metrics_label = label
+    _pools[label] = pool
+
+    # Listening on the engine keeps the events attached across pool recreation
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_checkouts.inc(pool=label)
+        pool_in_use.inc(pool=label)
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        pool_in_use.dec(pool=label)
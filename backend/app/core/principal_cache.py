@@ -0,0 +1,279 @@
+"""
+Cache of authenticated principals
+
+``get_current_user`` looks the token subject up here before querying the
+``users`` table. Entries live in a per-process LRU for
+``principal_cache_ttl`` seconds and, with ``principal_cache_redis``
+enabled, in Redis (``redis_url``) so a worker that has not seen a user yet
+still skips the database.
+
+Every ORM update or delete of a ``User`` drops its entry: locally at flush
+and again after commit, and in Redis plus a pub/sub message that makes the
+other workers drop their local copy. The ORM events run synchronously (on
+the event loop thread under ``AsyncSession``), so the Redis part is queued
+and sent by the async client from a task, or by the next
+``drain_invalidations`` run when no loop is running. Bulk ``update(User)``
+statements bypass the ORM events and must call ``invalidate_principal``
+themselves.
+
+Entries hold the user's columns except the password hash; each request gets
+its own detached ``User`` built from them.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from .config import settings
+from ..models.user import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "ehr:principal-invalidations"
+REDIS_KEY_PREFIX = "ehr:principal:"
+
+# Never cached, not even in process memory
+EXCLUDED_COLUMNS = {"hashed_password"}
+CACHED_COLUMNS = [column.key for column in User.__table__.columns if column.key not in EXCLUDED_COLUMNS]
+
+_PENDING_KEY = "principal_invalidations"
+
+# Bound every Redis call so a slow or unreachable server degrades to cache misses
+REDIS_TIMEOUT_SECONDS = 0.5
+
+
+class LocalPrincipalCache:
+    """Thread-safe LRU with per-entry expiry"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at <= time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return values
+
+    def set(self, username: str, values: Dict[str, Any]) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl_seconds, values)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _to_json(values: Dict[str, Any]) -> str:
+    encoded = dict(values)
+    encoded["role"] = values["role"].name if values["role"] is not None else None
+    for key in ("created_at", "updated_at"):
+        if values[key] is not None:
+            encoded[key] = values[key].isoformat()
+    return json.dumps(encoded)
+
+
+def _from_json(raw: bytes) -> Dict[str, Any]:
+    values = json.loads(raw)
+    values["role"] = UserRole[values["role"]] if values["role"] is not None else None
+    for key in ("created_at", "updated_at"):
+        if values[key] is not None:
+            values[key] = datetime.fromisoformat(values[key])
+    return values
+
+
+class RedisPrincipalTier:
+    """Shared tier: entries with a TTL plus invalidation broadcasts
+
+    Redis errors are logged and treated as a miss, so an outage only costs
+    the database lookups the cache would have saved.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis
+        import redis.asyncio as aioredis
+
+        self._errors = (redis.RedisError, OSError, asyncio.TimeoutError)
+        self.ttl_seconds = ttl_seconds
+        self._client = aioredis.from_url(
+            url, socket_timeout=REDIS_TIMEOUT_SECONDS, socket_connect_timeout=REDIS_TIMEOUT_SECONDS
+        )
+        self._pubsub = None
+        # Usernames waiting to be deleted and broadcast
+        self._pending: Set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._flush_tasks: Set[asyncio.Task] = set()
+
+    async def get(self, username: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self._client.get(REDIS_KEY_PREFIX + username)
+        except self._errors as exc:
+            logger.warning("Principal cache read from Redis failed: %s", exc)
+            return None
+        return _from_json(raw) if raw is not None else None
+
+    async def set(self, username: str, values: Dict[str, Any]) -> None:
+        try:
+            await self._client.set(REDIS_KEY_PREFIX + username, _to_json(values), ex=self.ttl_seconds)
+        except self._errors as exc:
+            logger.warning("Principal cache write to Redis failed: %s", exc)
+
+    def invalidate(self, username: str) -> None:
+        """Queue ``username`` for deletion and broadcast without blocking the caller"""
+        with self._pending_lock:
+            self._pending.add(username)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Synchronous session outside the loop: the periodic drain sends it
+            return
+        task = loop.create_task(self.flush_invalidations())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush_invalidations(self) -> None:
+        """Delete and broadcast queued usernames; failed ones are retried by the next flush"""
+        with self._pending_lock:
+            usernames, self._pending = self._pending, set()
+        if not usernames:
+            return
+        try:
+            pipeline = self._client.pipeline()
+            for username in usernames:
+                pipeline.delete(REDIS_KEY_PREFIX + username)
+                pipeline.publish(INVALIDATION_CHANNEL, username)
+            await pipeline.execute()
+        except self._errors as exc:
+            logger.warning("Principal cache invalidation in Redis failed: %s", exc)
+            with self._pending_lock:
+                self._pending |= usernames
+
+    async def drain_invalidations(self, local: LocalPrincipalCache) -> None:
+        """Send queued invalidations and apply those broadcast by other workers (periodic task)"""
+        await self.flush_invalidations()
+        try:
+            if self._pubsub is None:
+                self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                await self._pubsub.subscribe(INVALIDATION_CHANNEL)
+            while True:
+                message = await self._pubsub.get_message(timeout=0)
+                if message is None:
+                    return
+                username = message["data"].decode()
+                local.discard(username)
+                _notify_listeners(username)
+        except self._errors as exc:
+            # Messages sent while disconnected are lost; drop everything
+            logger.warning("Principal cache subscription failed: %s", exc)
+            self._pubsub = None
+            local.clear()
+
+
+_listeners: List[Callable[[str], None]] = []
+
+
+def add_invalidation_listener(listener: Callable[[str], None]) -> None:
+    """Call ``listener(username)`` for every local or broadcast invalidation"""
+    _listeners.append(listener)
+
+
+def _notify_listeners(username: str) -> None:
+    for listener in _listeners:
+        listener(username)
+
+
+local_cache = LocalPrincipalCache(settings.principal_cache_ttl, settings.principal_cache_max_entries)
+redis_tier = RedisPrincipalTier(settings.redis_url, settings.principal_cache_ttl) if settings.principal_cache_redis else None
+
+
+def _snapshot(user: User) -> Dict[str, Any]:
+    return {key: getattr(user, key) for key in CACHED_COLUMNS}
+
+
+def _build_user(values: Dict[str, Any]) -> User:
+    user = User(**values)
+    # Persistent identity without a session, like a user loaded by an ended session
+    make_transient_to_detached(user)
+    return user
+
+
+async def get_cached_principal(username: str) -> Optional[User]:
+    values = local_cache.get(username)
+    if values is None and redis_tier is not None:
+        values = await redis_tier.get(username)
+        if values is not None:
+            local_cache.set(username, values)
+    return _build_user(values) if values is not None else None
+
+
+async def cache_principal(user: User) -> None:
+    values = _snapshot(user)
+    local_cache.set(user.username, values)
+    if redis_tier is not None:
+        await redis_tier.set(user.username, values)
+
+
+def invalidate_principal(username: str) -> None:
+    local_cache.discard(username)
+    _notify_listeners(username)
+    if redis_tier is not None:
+        redis_tier.invalidate(username)
+
+
+async def drain_invalidations() -> None:
+    if redis_tier is not None:
+        await redis_tier.drain_invalidations(local_cache)
+
+
+def _usernames(target: User) -> Set[str]:
+    history = inspect(target).attrs.username.history
+    # A rename leaves an entry under the old name
+    return {name for name in (target.username, *history.deleted) if name}
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_flush(mapper, connection, target: User) -> None:
+    usernames = _usernames(target)
+    for username in usernames:
+        local_cache.discard(username)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).update(usernames)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    # Again after commit: a concurrent request may have cached the old row
+    # between the flush and the commit
+    for username in session.info.pop(_PENDING_KEY, ()):
+        invalidate_principal(username)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
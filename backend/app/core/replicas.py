@@ -0,0 +1,158 @@
+"""
+Read-replica routing
+
+Requests with a safe HTTP method get a session whose SELECTs go to a healthy
+replica, chosen round-robin. Flushes, DML and ``SELECT ... FOR UPDATE``
+always use the primary, and once a session has written it stays on the
+primary for the rest of the request. Clients that wrote recently (keyed by
+their Authorization header) are kept on the primary for a short window so
+they read their own writes despite replication lag.
+"""
+import hashlib
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Session.info key holding the replica bind chosen for the session
+REPLICA_BIND_KEY = "replica_bind"
+
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs to the replica stored in ``info``"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get(REPLICA_BIND_KEY)
+        if replica is not None:
+            if (
+                not self._flushing
+                and isinstance(clause, Select)
+                and clause._for_update_arg is None
+            ):
+                return replica
+            # First write pins the rest of the session to the primary
+            self.info.pop(REPLICA_BIND_KEY, None)
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+class ReplicaSet:
+    """Round-robin selection over healthy replicas"""
+
+    def __init__(self, engines: List[Engine], async_engines: List[AsyncEngine]):
+        self.engines = engines
+        self.async_engines = async_engines
+        self._healthy = [True] * len(engines)
+        self._counter = itertools.count()
+        for index, replica_engine in enumerate(engines):
+            self._watch_errors(replica_engine, index)
+        for index, replica_engine in enumerate(async_engines):
+            self._watch_errors(replica_engine.sync_engine, index)
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def _watch_errors(self, replica_engine: Engine, index: int) -> None:
+        @event.listens_for(replica_engine, "handle_error")
+        def _on_error(context):
+            if context.is_disconnect:
+                self.mark_unhealthy(index)
+
+    def mark_unhealthy(self, index: int) -> None:
+        if self._healthy[index]:
+            logger.warning("Read replica %d marked unhealthy", index)
+        self._healthy[index] = False
+
+    def _pick_index(self) -> Optional[int]:
+        healthy = [index for index, ok in enumerate(self._healthy) if ok]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def pick_sync(self) -> Optional[Engine]:
+        index = self._pick_index()
+        return None if index is None else self.engines[index]
+
+    def pick_async(self) -> Optional[Engine]:
+        """Sync facade of an async replica engine (what AsyncSession binds resolve to)"""
+        index = self._pick_index()
+        return None if index is None else self.async_engines[index].sync_engine
+
+    def check_health(self) -> None:
+        """Ping every replica and update its health flag (blocking)"""
+        for index, replica_engine in enumerate(self.engines):
+            try:
+                with replica_engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+            except Exception as e:
+                self.mark_unhealthy(index)
+                logger.debug("Replica %d health check failed: %s", index, e)
+            else:
+                if not self._healthy[index]:
+                    logger.info("Read replica %d healthy again", index)
+                self._healthy[index] = True
+
+
+class ReadAfterWriteTracker:
+    """Remembers which clients wrote recently so their reads stay on the primary"""
+
+    def __init__(self, window_seconds: float, max_entries: int = 10000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._writes: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def client_key(authorization: Optional[str]) -> Optional[str]:
+        if not authorization:
+            return None
+        return hashlib.sha1(authorization.encode()).hexdigest()
+
+    def mark_write(self, key: Optional[str]) -> None:
+        if key is None or self.window_seconds <= 0:
+            return
+        with self._lock:
+            self._writes[key] = time.monotonic()
+            self._writes.move_to_end(key)
+            while len(self._writes) > self.max_entries:
+                self._writes.popitem(last=False)
+
+    def wrote_recently(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        written_at = self._writes.get(key)
+        return written_at is not None and time.monotonic() - written_at < self.window_seconds
+
+
+class ReadAfterWriteMiddleware:
+    """ASGI middleware recording successful non-safe requests per client"""
+
+    def __init__(self, app, tracker: ReadAfterWriteTracker):
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                authorization = dict(scope["headers"]).get(b"authorization")
+                self.tracker.mark_write(
+                    self.tracker.client_key(authorization.decode() if authorization else None)
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,153 @@
+"""
+Access token revocation table
+
+Tokens carry the user's role, active flag and ``token_version`` as signed
+claims, so ``require_role`` authorizes without loading the user. What the
+claims cannot express is a later change; this module keeps, per process, the
+current version and active flag of every user that has ever been changed
+(version > 0) or is inactive. A token whose version is older than the
+table's, or whose user is inactive, is rejected. Users never changed are
+absent and their version-0 tokens stay valid, so the table stays small.
+
+``token_version`` is bumped by an ORM event whenever a user's role, active
+flag or password changes. The process that commits the change applies it
+immediately; other workers reload the table when notified through the
+principal cache invalidations (Redis) and at the latest every
+``token_revocation_sync_interval`` seconds. A reload also drops the local
+principal cache entries of users whose entry changed, so a worker that did
+not see the commit stops serving their old role or active flag.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, false, inspect, or_, select
+from sqlalchemy.orm import Session, object_session
+
+from .config import settings
+from .database import AsyncSessionLocal
+from .principal_cache import add_invalidation_listener, local_cache
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Changing any of these revokes the user's existing tokens
+REVOKING_ATTRIBUTES = ("role", "is_active", "hashed_password")
+
+_PENDING_KEY = "token_revocations"
+_REHASH_KEY = "password_rehash"
+
+
+class RevocationTable:
+    """username -> (current token version, active)"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[int, bool]] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.stale = False
+        self.loaded_at = 0.0
+
+    def reason(self, username: str, version: int) -> Optional[str]:
+        """Why a token of ``username`` issued for ``version`` is no longer valid"""
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        current_version, active = entry
+        if not active:
+            return "inactive"
+        if version < current_version:
+            return "revoked"
+        return None
+
+    def apply(self, username: str, version: int, active: bool) -> None:
+        with self._lock:
+            if version > 0 or not active:
+                self._entries[username] = (version, active)
+            else:
+                self._entries.pop(username, None)
+
+    def replace(self, entries: Dict[str, Tuple[int, bool]]) -> Set[str]:
+        """Swap in a full reload and return the usernames whose entry changed"""
+        with self._lock:
+            previous = self._entries
+            self._entries = entries
+            self.loaded = True
+            self.stale = False
+            self.loaded_at = time.monotonic()
+        return {username for username in previous.keys() | entries.keys() if previous.get(username) != entries.get(username)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+revocations = RevocationTable()
+
+
+async def sync_revocations() -> None:
+    """Reload the table when notified of a change or when it is due (periodic task)"""
+    due = time.monotonic() - revocations.loaded_at >= settings.token_revocation_sync_interval
+    if revocations.loaded and not revocations.stale and not due:
+        return
+    query = select(User.username, User.token_version, User.is_active).where(
+        or_(User.token_version > 0, User.is_active == false())
+    )
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(query)).all()
+    changed = revocations.replace({username: (version, bool(active)) for username, version, active in rows})
+    for username in changed:
+        local_cache.discard(username)
+    logger.debug("Loaded %d token revocation entries", len(rows))
+
+
+def _mark_stale(username: str) -> None:
+    revocations.stale = True
+
+
+add_invalidation_listener(_mark_stale)
+
+
+def _changed(target: User, attribute: str) -> bool:
+    return inspect(target).attrs[attribute].history.has_changes()
+
+
+def set_rehashed_password(user: User, hashed_password: str) -> None:
+    """Store a new hash of the same password (cost change) without revoking tokens"""
+    user.hashed_password = hashed_password
+    inspect(user).info[_REHASH_KEY] = True
+
+
+@event.listens_for(User, "before_update")
+def _bump_token_version(mapper, connection, target: User) -> None:
+    changed = [attribute for attribute in REVOKING_ATTRIBUTES if _changed(target, attribute)]
+    rehash_only = inspect(target).info.pop(_REHASH_KEY, False) and changed == ["hashed_password"]
+    if changed and not rehash_only:
+        target.token_version = (target.token_version or 0) + 1
+
+
+@event.listens_for(User, "after_update")
+def _remember_change(mapper, connection, target: User) -> None:
+    session = object_session(target)
+    if session is not None:
+        pending: Set[tuple] = session.info.setdefault(_PENDING_KEY, set())
+        pending.add((target.username, target.token_version or 0, bool(target.is_active)))
+
+
+@event.listens_for(User, "after_delete")
+def _revoke_deleted(mapper, connection, target: User) -> None:
+    session = object_session(target)
+    if session is not None:
+        # Other workers only drop a deleted user's tokens at expiry; deactivate first
+        session.info.setdefault(_PENDING_KEY, set()).add((target.username, (target.token_version or 0) + 1, False))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session: Session) -> None:
+    for username, version, active in session.info.pop(_PENDING_KEY, ()):
+        revocations.apply(username, version, active)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,16 +1,26 @@
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, Dict, Tuple, Union, Optional
 from jose import jwt
 from passlib.context import CryptContext
 from .config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.password_bcrypt_rounds,
+    # Hashes of any other cost need an update (rehashed at the next login)
+    bcrypt__min_rounds=settings.password_bcrypt_rounds,
+    bcrypt__max_rounds=settings.password_bcrypt_rounds,
+)
 
 
 def create_access_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any], expires_delta: timedelta = None, claims: Optional[Dict[str, Any]] = None
 ) -> str:
-    """Create JWT access token"""
+    """Create JWT access token
+
+    ``claims`` are signed into the token next to ``exp`` and ``sub``.
+    """
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -18,7 +28,7 @@ def create_access_token(
             minutes=settings.access_token_expire_minutes
         )
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(
         to_encode, settings.secret_key, algorithm=settings.algorithm
     )
@@ -35,6 +45,11 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify password; also return a new hash when the stored one uses another cost"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def verify_token(token: str) -> Optional[str]:
     """Verify JWT token and return subject"""
     try:
@@ -1,11 +1,23 @@
-from fastapi import FastAPI, Depends, HTTPException
+import secrets
+from typing import Optional
+
+from fastapi import FastAPI, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.security import HTTPBearer
 import uvicorn
 
 from .core.config import settings
-from .core.database import create_tables
+from .core.background import register_periodic_task, start_background_tasks, stop_background_tasks
+from .core.database import create_tables, replica_set, read_after_write, check_replica_health
+from .core.password_hashing import shutdown_password_pool
+from .core.principal_cache import drain_invalidations
+from .core.revocation import sync_revocations
+from .core.replicas import ReadAfterWriteMiddleware
+from .core.metrics import registry as metrics_registry
 from .api.v1.router import api_router
+from .services.drug_interactions import sync_interaction_index
+from .services.prescription_expiry import sweep_expired_prescriptions
 
 # Create FastAPI application
 app = FastAPI(
@@ -22,8 +34,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Encounter versions for If-Match
+    expose_headers=["ETag"],
 )
 
+# Keep clients that just wrote on the primary while replicas catch up
+if replica_set:
+    app.add_middleware(ReadAfterWriteMiddleware, tracker=read_after_write)
+    register_periodic_task("replica-health-check", settings.replica_health_check_interval, check_replica_health)
+
+# Drop principals other workers invalidated through Redis
+if settings.principal_cache_redis:
+    register_periodic_task("principal-cache-invalidations", 1, drain_invalidations)
+
+# Keep the token revocation table current (reloads on notification or when due)
+register_periodic_task("token-revocation-sync", 1, sync_revocations)
+
+# Compile the medication catalog into the interaction index, then pick up changes
+register_periodic_task("drug-interaction-index-sync", settings.drug_interaction_sync_interval, sync_interaction_index)
+
+# Move prescriptions past their expiry date to expired
+register_periodic_task("prescription-expiry-sweep", settings.prescription_expiry_sweep_interval, sweep_expired_prescriptions)
+
 # Include API router
 app.include_router(api_router, prefix=settings.api_v1_str)
 
@@ -35,6 +67,14 @@ security = HTTPBearer()
 async def startup_event():
     """Create database tables on startup"""
     create_tables()
+    start_background_tasks()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and the password hashing pool"""
+    await stop_background_tasks()
+    shutdown_password_pool()
 
 
 @app.get("/")
@@ -55,6 +95,19 @@ async def health_check():
     return {"status": "healthy", "version": settings.version}
 
 
+@app.get("/internal/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def internal_metrics(authorization: Optional[str] = Header(None)):
+    """Internal metrics (Prometheus text format) for this worker process"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Without a token the endpoint is only safe behind a network that keeps the public out
+    if settings.metrics_token and not secrets.compare_digest(
+        authorization or "", f"Bearer {settings.metrics_token}"
+    ):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return metrics_registry.render()
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
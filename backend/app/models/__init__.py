@@ -5,5 +5,8 @@ from .encounter import Encounter
 from .practitioner import Practitioner
 from .medication import Medication
 from .prescription import Prescription, PrescriptionItem
+from .id_sequence import IdSequence
+from .vital_observation import VitalObservation
+from .encounter_note_revision import EncounterNoteRevision
 
-__all__ = ["User", "Patient", "Encounter", "Practitioner", "Medication", "Prescription", "PrescriptionItem"]
\ No newline at end of file
+__all__ = ["User", "Patient", "Encounter", "Practitioner", "Medication", "Prescription", "PrescriptionItem", "IdSequence", "VitalObservation", "EncounterNoteRevision"]
\ No newline at end of file
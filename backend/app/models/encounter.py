@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -66,6 +66,8 @@ class Encounter(Base):
     notes = Column(Text, nullable=True)
     
     # Audit fields
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # bumped by every update; the ETag
+    note_revision = Column(Integer, nullable=False, default=0, server_default="0")  # latest EncounterNoteRevision; 0 = none
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -83,4 +85,12 @@ class Encounter(Base):
         if self.height and self.weight and self.height > 0:
             height_m = self.height / 100  # Convert cm to meters
             return round(self.weight / (height_m ** 2), 2)
-        return None
\ No newline at end of file
+        return None
+
+
+# Composite indexes for the list queries: filter column first, then the
+# ENCOUNTER_KEYSET order (start_time DESC, id DESC) so pages are read in
+# index order without a sort
+Index("ix_encounters_patient_id_start_time", Encounter.patient_id, Encounter.start_time.desc(), Encounter.id.desc())
+Index("ix_encounters_practitioner_id_start_time", Encounter.practitioner_id, Encounter.start_time.desc(), Encounter.id.desc())
+Index("ix_encounters_status_start_time", Encounter.status, Encounter.start_time, Encounter.id)
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from ..core.database import Base
+
+
+class EncounterNoteRevision(Base):
+    """One revision of an encounter's SOAP notes (see services.soap_revisions)
+
+    A snapshot holds the full text of the four SOAP fields; a delta holds
+    only the splices that turned the previous revision into this one.
+    Every ``soap_snapshot_interval``-th revision, and every full-text save,
+    is a snapshot, so any revision is rebuilt from the nearest snapshot at
+    or below it plus a bounded number of deltas.
+    """
+    __tablename__ = "encounter_note_revisions"
+    __table_args__ = (
+        UniqueConstraint("encounter_id", "revision", name="uq_encounter_note_revisions_revision"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    encounter_id = Column(Integer, ForeignKey("encounters.id", ondelete="CASCADE"), nullable=False)
+    revision = Column(Integer, nullable=False)  # matches Encounter.note_revision after the write
+
+    kind = Column(String(8), nullable=False)  # "snapshot" or "delta"
+    # JSON. Snapshot: {field: text or null} for all four fields.
+    # Delta: {field: [[start, end, text], ...]} for the changed fields only.
+    content = Column(Text, nullable=False)
+
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    encounter = relationship("Encounter")
+
+    def __repr__(self):
+        return f"<EncounterNoteRevision(encounter_id={self.encounter_id}, revision={self.revision}, kind='{self.kind}')>"
@@ -0,0 +1,13 @@
+from sqlalchemy import BigInteger, Column, String
+from ..core.database import Base
+
+
+class IdSequence(Base):
+    """Named counter backing the human-readable identifiers (see services.id_allocator)"""
+    __tablename__ = "id_sequences"
+
+    name = Column(String(50), primary_key=True)  # e.g. "patient_id", "prescription_number:20260101"
+    next_value = Column(BigInteger, nullable=False)  # first value not yet handed to any worker
+
+    def __repr__(self):
+        return f"<IdSequence(name='{self.name}', next_value={self.next_value})>"
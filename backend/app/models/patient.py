@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Enum, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, Enum, Text, Index, DDL, event
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -12,8 +12,26 @@ class Gender(enum.Enum):
     UNKNOWN = "unknown"
 
 
+# Columns covered by the partial-match search indexes
+SEARCH_COLUMNS = ("first_name", "last_name", "first_name_kana", "last_name_kana", "phone")
+
+# Normalized kana search keys compare byte-wise (C collation on PostgreSQL,
+# BINARY on SQLite) so prefix ranges are answered from a plain B-tree index
+SearchKey = String(200).with_variant(String(200, collation="C"), "postgresql")
+
+
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = tuple(
+        # pg_trgm GIN indexes make ILIKE '%term%' index-backed on PostgreSQL
+        Index(
+            f"ix_patients_{column}_trgm",
+            column,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql")
+        for column in SEARCH_COLUMNS
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(String(20), unique=True, index=True, nullable=False)  # Medical record number
@@ -23,6 +41,13 @@ class Patient(Base):
     last_name = Column(String(100), nullable=False)
     first_name_kana = Column(String(100), nullable=True)  # Japanese reading
     last_name_kana = Column(String(100), nullable=True)   # Japanese reading
+
+    # Normalized kana search keys (see services.kana_normalizer)
+    name_kana_key = Column(SearchKey, nullable=True, index=True)          # last + first, folded hiragana
+    first_name_kana_key = Column(SearchKey, nullable=True, index=True)
+    name_romaji_key = Column(SearchKey, nullable=True, index=True)        # last + first, Hepburn
+    first_name_romaji_key = Column(SearchKey, nullable=True, index=True)
+
     date_of_birth = Column(Date, nullable=False)
     gender = Column(Enum(Gender), nullable=False)
     
@@ -73,4 +98,35 @@ class Patient(Base):
     def full_name_kana(self):
         if self.last_name_kana and self.first_name_kana:
             return f"{self.last_name_kana} {self.first_name_kana}"
-        return None
\ No newline at end of file
+        return None
+
+
+# SQLite: FTS5 trigram shadow table over the search columns, kept in sync by triggers
+_fts_columns = ", ".join(SEARCH_COLUMNS)
+_fts_new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+_fts_old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+
+SQLITE_SEARCH_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5("
+    f"{_fts_columns}, content='patients', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN "
+    f"INSERT INTO patients_fts(rowid, {_fts_columns}) VALUES (new.id, {_fts_new_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN "
+    f"INSERT INTO patients_fts(patients_fts, rowid, {_fts_columns}) VALUES ('delete', old.id, {_fts_old_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE ON patients BEGIN "
+    f"INSERT INTO patients_fts(patients_fts, rowid, {_fts_columns}) VALUES ('delete', old.id, {_fts_old_values}); "
+    f"INSERT INTO patients_fts(rowid, {_fts_columns}) VALUES (new.id, {_fts_new_values}); END",
+]
+
+event.listen(
+    Patient.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Patient.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Patient.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS patients_fts").execute_if(dialect="sqlite"),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -15,6 +15,9 @@ class PrescriptionStatus(str, enum.Enum):
     CANCELLED = "cancelled"   # 中止
     EXPIRED = "expired"       # 期限切れ
 
+# 有効期限を過ぎたら期限切れにする（調剤前の）ステータス
+OPEN_STATUSES = (PrescriptionStatus.DRAFT, PrescriptionStatus.PRESCRIBED)
+
 class Prescription(Base):
     """処方箋テーブル"""
     __tablename__ = "prescriptions"
@@ -87,6 +90,19 @@ class Prescription(Base):
             return (self.expiry_date - datetime.now()).days
         return None
 
+# 一覧・履歴クエリ用の複合インデックス（絞り込み列 + 処方日の新しい順、同日時は ID 順）
+Index("ix_prescriptions_patient_id_prescription_date", Prescription.patient_id, Prescription.prescription_date.desc(), Prescription.id.desc())
+Index("ix_prescriptions_prescriber_id_prescription_date", Prescription.prescriber_id, Prescription.prescription_date.desc(), Prescription.id.desc())
+# 絞り込みのない一覧と、処方日の範囲で読む用量監査用
+Index("ix_prescriptions_prescription_date", Prescription.prescription_date.desc(), Prescription.id.desc())
+# 期限切れの一括更新用（調剤前の処方箋だけの部分インデックス）
+Index(
+    "ix_prescriptions_open_expiry_date",
+    Prescription.expiry_date,
+    sqlite_where=Prescription.status.in_(OPEN_STATUSES),
+    postgresql_where=Prescription.status.in_(OPEN_STATUSES),
+)
+
 class PrescriptionItem(Base):
     """処方薬剤明細テーブル"""
     __tablename__ = "prescription_items"
@@ -94,7 +110,7 @@ class PrescriptionItem(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # 関連エンティティ
-    prescription_id = Column(Integer, ForeignKey("prescriptions.id"), nullable=False, comment="処方箋ID")
+    prescription_id = Column(Integer, ForeignKey("prescriptions.id"), nullable=False, index=True, comment="処方箋ID")
     medication_id = Column(Integer, ForeignKey("medications.id"), nullable=False, comment="薬剤ID")
     
     # 処方詳細
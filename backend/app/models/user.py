@@ -23,6 +23,8 @@ class User(Base):
     role = Column(Enum(UserRole), nullable=False, default=UserRole.RECEPTIONIST)
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
+    # Bumped when role, active flag or password change; older tokens are rejected
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # License information for medical staff
     license_number = Column(String(50), nullable=True)
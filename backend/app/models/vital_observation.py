@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Index
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from ..core.database import Base
+
+
+# Metric name (the Encounter column it mirrors) -> unit
+VITAL_METRICS = {
+    "temperature": "Cel",
+    "blood_pressure_systolic": "mm[Hg]",
+    "blood_pressure_diastolic": "mm[Hg]",
+    "heart_rate": "/min",
+    "respiratory_rate": "/min",
+    "oxygen_saturation": "%",
+    "height": "cm",
+    "weight": "kg",
+}
+
+
+class VitalObservation(Base):
+    """One measured vital sign value (append-only; see services.vitals_service)
+
+    The Encounter vitals columns keep the latest values; this table keeps
+    every value recorded, so a patient's trend is read without loading
+    encounters.
+    """
+    __tablename__ = "vital_observations"
+    __table_args__ = (
+        # Trend reads: one patient, one metric, a time range
+        Index("ix_vital_observations_patient_metric_time", "patient_id", "metric", "observed_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=False)
+    encounter_id = Column(Integer, ForeignKey("encounters.id"), nullable=True, index=True)
+
+    metric = Column(String(32), nullable=False)  # key of VITAL_METRICS
+    value = Column(Float, nullable=False)
+    observed_at = Column(DateTime(timezone=True), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    encounter = relationship("Encounter")
+
+    def __repr__(self):
+        return f"<VitalObservation(patient_id={self.patient_id}, metric='{self.metric}', value={self.value})>"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
 from ..models.encounter import EncounterStatus, EncounterClass
 
@@ -76,6 +76,8 @@ class EncounterResponse(EncounterBase):
     id: int
     encounter_id: str
     bmi: Optional[float] = None
+    version: Optional[int] = None
+    note_revision: Optional[int] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
@@ -84,6 +86,11 @@ class EncounterResponse(EncounterBase):
 
 
 class EncounterListResponse(BaseModel):
+    """Encounter row in list views: times, status, chief complaint, assessment and vitals
+
+    The other free-text notes (subjective, objective, plan, history,
+    examination) are only returned by the detail route.
+    """
     id: int
     encounter_id: str
     patient_id: int
@@ -94,12 +101,36 @@ class EncounterListResponse(BaseModel):
     end_time: Optional[datetime]
     chief_complaint: Optional[str]
     assessment: Optional[str]
+    temperature: Optional[float] = None
+    blood_pressure_systolic: Optional[int] = None
+    blood_pressure_diastolic: Optional[int] = None
+    heart_rate: Optional[int] = None
+    respiratory_rate: Optional[int] = None
+    oxygen_saturation: Optional[float] = None
+    height: Optional[float] = None
+    weight: Optional[float] = None
+    bmi: Optional[float] = None
     created_at: Optional[datetime]
     
     class Config:
         from_attributes = True
 
 
+class EncounterSearchResponse(BaseModel):
+    """One page of encounter search results
+
+    ``total`` is only counted for the first (or an offset) page.
+    """
+    items: List[EncounterListResponse]
+    total: Optional[int] = None
+    skip: int
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    links: Dict[str, str] = {}
+
+
 class EncounterSearchParams(BaseModel):
     patient_id: Optional[int] = Field(None, description="Patient ID")
     practitioner_id: Optional[int] = Field(None, description="Practitioner ID")
@@ -107,8 +138,27 @@ class EncounterSearchParams(BaseModel):
     encounter_class: Optional[EncounterClass] = Field(None, description="Encounter class")
     start_date: Optional[datetime] = Field(None, description="Start date filter")
     end_date: Optional[datetime] = Field(None, description="End date filter")
-    skip: int = Field(0, ge=0, description="Number of records to skip")
+    skip: int = Field(0, ge=0, description="Number of records to skip (deprecated: use cursor)")
     limit: int = Field(100, ge=1, le=1000, description="Number of records to return")
+    cursor: Optional[str] = Field(None, description="Opaque pagination cursor")
+
+
+class EarlyWarningScore(BaseModel):
+    """NEWS2 score of one encounter (``id`` is the encounter's primary key)"""
+    id: int
+    patient_id: int
+    total: int
+    risk: str
+    components: Dict[str, int]
+    missing: List[str] = Field(default_factory=list, description="Parameters without a recorded value (scored 0)")
+    vitals: Dict[str, Optional[float]]
+
+
+class EarlyWarningResponse(BaseModel):
+    computed_at: datetime
+    scored: int = Field(..., description="Encounters scored")
+    risk_counts: Dict[str, int]
+    items: List[EarlyWarningScore]
 
 
 class VitalSignsUpdate(BaseModel):
@@ -120,10 +170,84 @@ class VitalSignsUpdate(BaseModel):
     oxygen_saturation: Optional[float] = Field(None, ge=70.0, le=100.0)
     height: Optional[float] = Field(None, ge=50.0, le=250.0)
     weight: Optional[float] = Field(None, ge=20.0, le=300.0)
+    observed_at: Optional[datetime] = Field(None, description="When the values were measured (default: now)")
 
 
 class SOAPNotesUpdate(BaseModel):
     subjective: Optional[str] = None
     objective: Optional[str] = None
     assessment: Optional[str] = None
-    plan: Optional[str] = None
\ No newline at end of file
+    plan: Optional[str] = None
+
+
+class EncounterSave(VitalSignsUpdate, SOAPNotesUpdate):
+    """Combined chart save: SOAP notes, vitals and status; only fields sent are written"""
+    status: Optional[EncounterStatus] = None
+
+    @validator('status')
+    def validate_status(cls, v):
+        if v is None:
+            raise ValueError('Status cannot be null')
+        return v
+
+
+class EncounterSaveResponse(BaseModel):
+    """The new version and the stored values of the fields that were written"""
+    id: int
+    version: int
+    note_revision: int
+    updated_at: Optional[datetime] = None
+    changes: Dict[str, Any]
+
+SOAPField = Literal["subjective", "objective", "assessment", "plan"]
+
+
+class TextSplice(BaseModel):
+    """Replace ``text[start:end]`` with ``text``; offsets in UTF-16 code units, as in a browser textarea"""
+    start: int = Field(..., ge=0)
+    end: int = Field(..., ge=0)
+    text: str = ""
+
+    @validator('end')
+    def validate_end(cls, v, values):
+        if 'start' in values and v < values['start']:
+            raise ValueError('end must not be before start')
+        return v
+
+
+class SOAPAutosave(BaseModel):
+    """Edits made since ``base_revision``; splices of a field apply in order, each to the result of the last"""
+    base_revision: int = Field(..., ge=0, description="note_revision the client's text is based on")
+    changes: Dict[SOAPField, List[TextSplice]]
+
+
+class SOAPAutosaveResponse(BaseModel):
+    """The new revision; ``lengths`` (UTF-16 code units) lets the client check its copy of the changed fields"""
+    id: int
+    note_revision: int
+    version: int
+    updated_at: Optional[datetime] = None
+    lengths: Dict[str, int]
+
+
+class NoteRevisionSummary(BaseModel):
+    revision: int
+    kind: str
+    size: int = Field(..., description="Stored characters")
+    author_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class NoteRevisionResponse(BaseModel):
+    """SOAP notes as they were at ``revision``"""
+    encounter_id: int
+    revision: int
+    author_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    subjective: Optional[str] = None
+    objective: Optional[str] = None
+    assessment: Optional[str] = None
+    plan: Optional[str] = None
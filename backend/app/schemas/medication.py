@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, validator
 from datetime import datetime
 from app.models.medication import MedicationForm, MedicationCategory
@@ -82,7 +82,10 @@ class MedicationSearch(BaseModel):
 class MedicationListResponse(BaseModel):
     """薬剤一覧レスポンススキーマ"""
     items: List[MedicationResponse]
-    total: int
+    total: Optional[int] = None  # カーソル指定時は集計しない
     limit: int
-    offset: int
-    has_more: bool
\ No newline at end of file
+    offset: int  # 非推奨（cursor を使用）
+    has_more: bool
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    links: Dict[str, str] = {}
\ No newline at end of file
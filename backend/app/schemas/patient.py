@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import date, datetime
 from ..models.patient import Gender
 
@@ -95,11 +95,45 @@ class PatientListResponse(BaseModel):
         from_attributes = True
 
 
+class PatientSearchResponse(BaseModel):
+    """One page of patient search results
+
+    ``total`` is only counted for the first (or an offset) page.
+    """
+    items: List[PatientListResponse]
+    total: Optional[int] = None
+    skip: int
+    limit: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    links: Dict[str, str] = {}
+
+
 class PatientSearchParams(BaseModel):
     patient_id: Optional[str] = Field(None, description="Patient ID")
     name: Optional[str] = Field(None, description="Name search (partial match)")
     kana: Optional[str] = Field(None, description="Kana name search (partial match)")
     phone: Optional[str] = Field(None, description="Phone number")
     date_of_birth: Optional[date] = Field(None, description="Date of birth")
-    skip: int = Field(0, ge=0, description="Number of records to skip")
-    limit: int = Field(100, ge=1, le=1000, description="Number of records to return")
\ No newline at end of file
+    skip: int = Field(0, ge=0, description="Number of records to skip (deprecated: use cursor)")
+    limit: int = Field(100, ge=1, le=1000, description="Number of records to return")
+    cursor: Optional[str] = Field(None, description="Opaque pagination cursor")
+
+class PatientImportRowError(BaseModel):
+    line: int
+    errors: List[str]
+
+
+class PatientImportResult(BaseModel):
+    """Outcome of a bulk import
+
+    Rows that fail validation or insertion are skipped and reported; the
+    rest are imported. Only the first ``patient_import_max_errors`` errors
+    are listed (``errors_truncated``), the counts cover every row.
+    """
+    processed: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: List[PatientImportRowError] = []
+    errors_truncated: bool = False
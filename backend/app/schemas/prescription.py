@@ -1,6 +1,7 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, validator
 from datetime import datetime
+import enum
 from app.models.prescription import PrescriptionStatus
 from app.schemas.medication import MedicationResponse
 from app.schemas.patient import PatientResponse
@@ -105,13 +106,82 @@ class PrescriptionResponse(PrescriptionBase):
     class Config:
         from_attributes = True
 
+class InteractionSeverity(str, enum.Enum):
+    """相互作用警告の重大度"""
+    CONTRAINDICATED = "contraindicated"  # 併用禁忌
+    ALLERGY = "allergy"                  # アレルギー
+    CAUTION = "caution"                  # 併用注意
+
+class InteractionWarning(BaseModel):
+    """相互作用・禁忌・アレルギーの警告"""
+    severity: InteractionSeverity
+    medication_id: int
+    medication_name: str
+    other_medication_id: Optional[int] = None  # アレルギーの場合は None
+    other_medication_name: Optional[str] = None
+    other_is_active: bool = False  # 相手が服用中の薬剤（既存の処方）
+    matched: str  # 一致した記載（相互作用・禁忌の対象、またはアレルギー）
+    note: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class DoseIssue(str, enum.Enum):
+    """1日用量チェックの結果"""
+    ABOVE_MAX = "above_max"  # 1日最大用量超過
+    BELOW_MIN = "below_min"  # 1日最小用量未満
+
+class DoseWarning(BaseModel):
+    """1日用量の警告（同じ処方箋の同じ薬剤の明細は合算）"""
+    issue: DoseIssue
+    prescription_id: Optional[int] = None
+    prescription_item_ids: List[int] = []
+    medication_id: int
+    medication_name: str
+    daily_dose: float
+    min_daily_dose: Optional[float] = None
+    max_daily_dose: Optional[float] = None
+
+class DoseAuditReport(BaseModel):
+    """処方日の範囲を対象にした用量監査の結果"""
+    date_from: datetime
+    date_to: datetime
+    prescriptions: int
+    items: int
+    unchecked_items: int  # 上下限のある薬剤で1日量を求められなかった明細
+    warnings: List[DoseWarning]
+
+class PrescriptionCreateResponse(PrescriptionResponse):
+    """処方箋作成レスポンススキーマ（相互作用・用量の警告付き）"""
+    interaction_warnings: List[InteractionWarning] = []
+    dose_warnings: List[DoseWarning] = []
+
+class InteractionCheckRequest(BaseModel):
+    """相互作用チェックスキーマ"""
+    patient_id: int
+    medication_ids: List[int]
+    exclude_prescription_id: Optional[int] = None  # 変更中の処方箋は服用中の薬剤から除く
+
+    @validator('medication_ids')
+    def validate_medication_ids(cls, v):
+        if not v:
+            raise ValueError('薬剤は少なくとも1つ必要です')
+        return v
+
+class InteractionCheckResponse(BaseModel):
+    """相互作用チェック結果スキーマ"""
+    warnings: List[InteractionWarning]
+
 class PrescriptionListResponse(BaseModel):
     """処方箋一覧レスポンススキーマ"""
     items: List[PrescriptionResponse]
-    total: int
+    total: Optional[int] = None  # カーソル指定時は集計しない
     limit: int
-    offset: int
+    offset: int  # 非推奨（cursor を使用）
     has_more: bool
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    links: Dict[str, str] = {}
 
 class PrescriptionSearch(BaseModel):
     """処方箋検索スキーマ"""
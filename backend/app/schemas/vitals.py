@@ -0,0 +1,34 @@
+from enum import Enum
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+
+class TrendMethod(str, Enum):
+    LTTB = "lttb"      # Largest-Triangle-Three-Buckets: keeps the visual shape
+    BUCKET = "bucket"  # Equal time buckets with min/max/mean
+
+
+class VitalTrendSeries(BaseModel):
+    """One metric as parallel arrays, oldest first
+
+    ``t`` holds epoch milliseconds (UTC). With the bucket method ``value``
+    is the bucket mean, ``t`` the mean time of its observations, and
+    ``min``/``max`` the bucket extremes.
+    """
+    metric: str
+    unit: str
+    count: int = Field(..., description="Observations in the range before downsampling")
+    t: List[int]
+    value: List[float]
+    min: Optional[List[float]] = None
+    max: Optional[List[float]] = None
+
+
+class VitalTrendResponse(BaseModel):
+    patient_id: int
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    method: TrendMethod
+    points: int
+    series: List[VitalTrendSeries]
@@ -1,42 +1,54 @@
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
-from ..core.security import verify_password, get_password_hash, create_access_token
+from ..core.deps import principal_claims
+from ..core.password_hashing import check_password, hash_password
+from ..core.revocation import set_rehashed_password
+from ..core.security import create_access_token
 from ..models.user import User
 from ..schemas.auth import UserCreate
 
 
 class AuthService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def authenticate_user(self, username: str, password: str) -> Optional[User]:
+    async def authenticate_user(self, username: str, password: str) -> Optional[User]:
         """Authenticate user by username and password"""
-        user = self.db.query(User).filter(User.username == username).first()
+        user = await self.get_user_by_username(username)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        # End the read transaction so the pooled connection is not held while
+        # the hash is computed (the session does not expire attributes on commit)
+        await self.db.commit()
+        valid, new_hash = await check_password(password, user.hashed_password)
+        if not valid:
             return None
+        if new_hash:
+            # Stored with another bcrypt cost: upgrade it while we have the password
+            set_rehashed_password(user, new_hash)
+            await self.db.commit()
         return user
 
-    def create_user(self, user_create: UserCreate) -> User:
+    async def create_user(self, user_create: UserCreate) -> User:
         """Create a new user"""
         # Check if username already exists
-        if self.db.query(User).filter(User.username == user_create.username).first():
+        if await self.get_user_by_username(user_create.username):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already registered"
             )
-        
+
         # Check if email already exists
-        if self.db.query(User).filter(User.email == user_create.email).first():
+        if await self.get_user_by_email(user_create.email):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
-        
+
         # Create new user
-        hashed_password = get_password_hash(user_create.password)
+        hashed_password = await hash_password(user_create.password)
         db_user = User(
             username=user_create.username,
             email=user_create.email,
@@ -48,20 +60,22 @@ class AuthService:
             is_active=True,
             is_verified=False
         )
-        
+
         self.db.add(db_user)
-        self.db.commit()
-        self.db.refresh(db_user)
+        await self.db.commit()
+        await self.db.refresh(db_user)
         return db_user
 
-    def get_user_by_username(self, username: str) -> Optional[User]:
+    async def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
-        return self.db.query(User).filter(User.username == username).first()
+        result = await self.db.execute(select(User).where(User.username == username))
+        return result.scalars().first()
 
-    def get_user_by_email(self, email: str) -> Optional[User]:
+    async def get_user_by_email(self, email: str) -> Optional[User]:
         """Get user by email"""
-        return self.db.query(User).filter(User.email == email).first()
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
 
     def create_access_token_for_user(self, user: User) -> str:
-        """Create access token for user"""
-        return create_access_token(subject=user.username)
\ No newline at end of file
+        """Create access token for user, with the claims require_role authorizes from"""
+        return create_access_token(subject=user.username, claims=principal_claims(user))
@@ -0,0 +1,103 @@
+"""
+用法・用量の文字列の解析
+
+処方明細の用量（dosage）・服薬頻度（frequency）・服薬タイミング（timing）の
+日本語の記載から、1 回量・1 日の服用回数・1 日量を読み取る。
+
+    「1回2錠」「1日3回毎食後」          → 1 回 2、1 日 3 回（1 日量 6）
+    「1日3錠 分3 毎食後」                → 1 日量 3
+    「1錠」「1日1回 14日分」             → 1 回 1、1 日 1 回（日数は読まない）
+    「朝夕食後」「毎食後・就寝前」       → 1 日 2 回、4 回
+    「隔日」「週1回」「2日1回」          → 1 日 0.5 回、1/7 回、0.5 回
+    「疼痛時 頓服」「頓用 1日3回まで」   → 頓服（回数の記載があれば上限として使う）
+
+数字は全角・漢数字も読む。同じ記載は何度も現れるため、結果は文字列ごとにキャッシュする。
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# 用量の単位（数の後にあれば量とみなす）
+_UNITS = r"(?:錠|カプセル|cap|包|袋|枚|滴|本|個|瓶|単位|ml|mL|g|mg|μg|mcg|噴霧|吸入|パフ)"
+_NUMBER = r"(\d+(?:\.\d+)?)"
+
+_KANJI_DIGITS = str.maketrans("〇一二三四五六七八九", "0123456789")
+_KANJI_TEN = re.compile(r"([一二三四五六七八九]?)十([一二三四五六七八九]?)")
+
+# 「1日1回 14日分」の日数を 1 回量と読まないよう、日が続く数は除く
+_PER_DOSE = re.compile(r"1回" + _NUMBER + r"(?![\d.]|日)")
+_DAILY_AMOUNT = re.compile(r"1日" + _NUMBER + _UNITS)
+_DIVIDED = re.compile(r"分" + _NUMBER)
+_TIMES_PER_DAYS = re.compile(r"(\d+)日" + _NUMBER + r"回")
+_TIMES_PER_WEEK = re.compile(r"週" + _NUMBER + r"回")
+_AMOUNT = re.compile(_NUMBER + _UNITS)
+_AS_NEEDED = re.compile(r"頓服|頓用|必要時|適宜|(?:疼痛|発熱|不眠|便秘|発作|不安|嘔気|咳嗽|頭痛)時")
+
+# 服用時点（毎食は朝・昼・夕）
+_MEALS = ("朝", "昼", "夕")
+_BEDTIME = ("就寝前", "寝る前", "眠前")
+
+
+class ParsedDosage(NamedTuple):
+    per_dose: Optional[float]  # 1 回量
+    doses_per_day: Optional[float]  # 1 日の服用回数（頓服は上限）
+    daily_amount: Optional[float]  # 「1日3錠」のように 1 日量が書かれている場合
+    as_needed: bool  # 頓服
+
+    @property
+    def daily_dose(self) -> Optional[float]:
+        """1 日量（書かれていなければ 1 回量 × 回数、どちらかがなければ None）"""
+        if self.daily_amount is not None:
+            return self.daily_amount
+        if self.per_dose is not None and self.doses_per_day is not None:
+            return self.per_dose * self.doses_per_day
+        return None
+
+
+def _kanji_number(match: "re.Match") -> str:
+    tens, ones = match.group(1), match.group(2)
+    return str(int(tens.translate(_KANJI_DIGITS) or 1) * 10 + int(ones.translate(_KANJI_DIGITS) or 0))
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    text = _KANJI_TEN.sub(_kanji_number, text).translate(_KANJI_DIGITS)
+    return re.sub(r"\s+", "", text)
+
+
+def _doses_per_day(text: str) -> Optional[float]:
+    match = _TIMES_PER_DAYS.search(text)
+    if match:
+        return float(match.group(2)) / int(match.group(1))
+    match = _TIMES_PER_WEEK.search(text)
+    if match:
+        return float(match.group(1)) / 7
+    if "隔日" in text:
+        return 0.5
+    match = _DIVIDED.search(text)
+    if match:
+        return float(match.group(1))
+    slots = set(_MEALS) if "毎食" in text else {meal for meal in _MEALS if meal in text}
+    if any(word in text for word in _BEDTIME):
+        slots.add("眠前")
+    return float(len(slots)) if slots else None
+
+
+@lru_cache(maxsize=4096)
+def parse_dosage(dosage: Optional[str], frequency: Optional[str] = None, timing: Optional[str] = None) -> ParsedDosage:
+    """用量・服薬頻度・服薬タイミングの記載をまとめて解析する"""
+    text = _normalize("/".join(part for part in (dosage, frequency, timing) if part))
+
+    daily = _DAILY_AMOUNT.search(text)
+    per_dose = _PER_DOSE.search(text)
+    if per_dose is None and daily is None:
+        # 「2錠」のように回の指定がない量は 1 回量
+        per_dose = _AMOUNT.search(text)
+
+    return ParsedDosage(
+        per_dose=float(per_dose.group(1)) if per_dose else None,
+        doses_per_day=_doses_per_day(text),
+        daily_amount=float(daily.group(1)) if daily else None,
+        as_needed=bool(_AS_NEEDED.search(text)),
+    )
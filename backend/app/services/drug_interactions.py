@@ -0,0 +1,412 @@
+"""
+処方時の相互作用・禁忌・アレルギーチェック
+
+薬剤マスタの相互作用（interactions）と禁忌（contraindications）は自由記載のため、
+次の書式の記載を規則として読む。
+
+- 1 行（またはセミコロン区切り）に 1 項目。項目は「対象、対象：説明」または「対象（説明）」
+- 対象は一般名・成分名・薬剤名・商品名か ATC コード（前方一致。例：B01AC は抗血小板薬すべて）
+- 禁忌に書かれた対象との併用は併用禁忌、相互作用に書かれた対象との併用は併用注意
+
+薬剤マスタはプロセスごとに索引にまとめる。薬剤ごとの照合キー（名前・成分名と ATC コードの
+各階層）と、照合キーごとの規則（その対象を挙げている薬剤）の辞書で、チェックは処方薬と
+服用中の薬剤の照合キーを引くだけで済み、DB にはアクセスしない。患者のアレルギー
+（Patient.allergies、同じ区切り）は、照合キーとの一致か、名前・成分名・過敏症の禁忌
+（「ペニシリン系抗生物質に対する過敏症」など）への部分一致で判定する。
+
+索引は最初のチェックか定期タスクで全件を読み込む。同じプロセスでコミットされた薬剤の
+追加・更新は次のチェックの前にその薬剤だけ読み直し、他のワーカーでの変更は
+drug_interaction_sync_interval 秒ごとに更新日時の新しい薬剤だけを読み直して反映する。
+"""
+import logging
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from ..core.database import AsyncSessionLocal
+from ..models.medication import Medication
+from ..models.prescription import Prescription, PrescriptionItem, PrescriptionStatus
+from ..schemas.prescription import InteractionSeverity
+from .kana_normalizer import fold_kana
+
+logger = logging.getLogger(__name__)
+
+# 索引に読み込む薬剤マスタの列
+INDEX_COLUMNS = (
+    Medication.id,
+    Medication.drug_name,
+    Medication.generic_name,
+    Medication.brand_name,
+    Medication.atc_code,
+    Medication.interactions,
+    Medication.contraindications,
+)
+
+# 服用中とみなさない処方箋のステータス（作成直後の下書きは服用予定として含める）と、遡る日数
+INACTIVE_STATUSES = (PrescriptionStatus.CANCELLED, PrescriptionStatus.EXPIRED)
+ACTIVE_LOOKBACK_DAYS = 90
+
+# 投薬日数のない明細を服用中とみなす日数
+DEFAULT_COURSE_DAYS = 7
+
+# コミットが遅れた他のワーカーの更新を取りこぼさないよう、この秒数だけ遡って読み直す
+SYNC_OVERLAP_SECONDS = 60
+
+_SEVERITY_RANK = {
+    InteractionSeverity.CONTRAINDICATED: 0,
+    InteractionSeverity.ALLERGY: 1,
+    InteractionSeverity.CAUTION: 2,
+}
+
+_LINE_SEPARATORS = re.compile(r"[\n\r;；]+")
+_TARGET_SEPARATORS = re.compile(r"[、，,]+")
+_NOTE_START = re.compile(r"[:：(（]")
+_INGREDIENT_SEPARATORS = re.compile(r"[・･/／+＋]")
+_ATC_CODE = re.compile(r"^[A-Z]\d{2}(?:[A-Z](?:[A-Z](?:\d{2})?)?)?$")
+_ATC_LEVELS = (3, 4, 5)
+
+# アレルギーの記載から除く語尾と、アレルギーなしを表す記載
+_ALLERGY_SUFFIXES = ("アレルギー", "過敏症", "系薬剤", "系薬", "系", "製剤")
+_NO_ALLERGY = {"なし", "無し", "特になし", "特記なし", "none", "nka", "nkda"}
+
+# アレルギーと部分一致させる禁忌の対象（「ペニシリン系抗生物質に対する過敏症」など）
+_HYPERSENSITIVITY = ("過敏", "アレルギー")
+
+_PENDING_KEY = "drug_interaction_changes"
+
+
+@dataclass(frozen=True)
+class _Rule:
+    source_id: int  # この対象を挙げている薬剤
+    severity: InteractionSeverity
+    target: str  # 記載どおりの対象
+    note: Optional[str]
+
+
+@dataclass(frozen=True)
+class _CompiledMedication:
+    id: int
+    name: str
+    keys: FrozenSet[str]
+    # アレルギーの部分一致用（名前・成分名・過敏症の禁忌を \0 で連結）
+    haystack: str
+    rules: Tuple[Tuple[str, _Rule], ...]
+
+
+@dataclass(frozen=True)
+class InteractionAlert:
+    """チェック結果 1 件（schemas.prescription.InteractionWarning の元）"""
+    severity: InteractionSeverity
+    medication_id: int
+    medication_name: str
+    other_medication_id: Optional[int]
+    other_medication_name: Optional[str]
+    other_is_active: bool
+    matched: str
+    note: Optional[str]
+
+
+def _atc_code(text: Optional[str]) -> Optional[str]:
+    code = unicodedata.normalize("NFKC", text or "").strip().upper()
+    return code if _ATC_CODE.match(code) else None
+
+
+def _target_key(target: str) -> Optional[str]:
+    return _atc_code(target) or fold_kana(target)
+
+
+def _parse_rules(text: Optional[str], severity: InteractionSeverity, source_id: int) -> List[Tuple[str, _Rule]]:
+    """相互作用・禁忌の記載を (照合キー, 規則) の一覧にする"""
+    rules = []
+    for line in _LINE_SEPARATORS.split(text or ""):
+        line = line.strip()
+        if not line:
+            continue
+        head, note = line, None
+        match = _NOTE_START.search(line)
+        if match:
+            head, note = line[:match.start()], line[match.end():].rstrip(")）").strip() or None
+        for target in _TARGET_SEPARATORS.split(head):
+            target = target.strip()
+            key = _target_key(target)
+            if key:
+                rules.append((key, _Rule(source_id, severity, target, note)))
+    return rules
+
+
+def compile_medication(medication) -> _CompiledMedication:
+    """薬剤（ORM オブジェクトか INDEX_COLUMNS の行）を照合用に変換する"""
+    names: Set[str] = set()
+    for name in (medication.drug_name, medication.generic_name, medication.brand_name):
+        if name:
+            names.add(fold_kana(name))
+            names.update(fold_kana(part) for part in _INGREDIENT_SEPARATORS.split(name))
+    names.discard(None)
+
+    keys = set(names)
+    code = _atc_code(medication.atc_code)
+    if code:
+        keys.add(code)
+        keys.update(code[:level] for level in _ATC_LEVELS if len(code) > level)
+
+    rules = (
+        _parse_rules(medication.contraindications, InteractionSeverity.CONTRAINDICATED, medication.id)
+        + _parse_rules(medication.interactions, InteractionSeverity.CAUTION, medication.id)
+    )
+    hypersensitivity = {
+        key for key, rule in rules
+        if rule.severity == InteractionSeverity.CONTRAINDICATED and any(word in rule.target for word in _HYPERSENSITIVITY)
+    }
+    return _CompiledMedication(
+        id=medication.id,
+        name=medication.drug_name,
+        keys=frozenset(keys),
+        haystack="\0".join(sorted(names | hypersensitivity)),
+        rules=tuple(rules),
+    )
+
+
+@lru_cache(maxsize=1024)
+def allergy_tokens(allergies: Optional[str]) -> Tuple[Tuple[str, str, bool], ...]:
+    """アレルギーの記載を (記載, 照合キー, ATC コードか) の一覧にする"""
+    tokens = []
+    for line in _LINE_SEPARATORS.split(allergies or ""):
+        for raw in _TARGET_SEPARATORS.split(_NOTE_START.split(line, 1)[0]):
+            raw = raw.strip()
+            code = _atc_code(raw)
+            if code:
+                tokens.append((raw, code, True))
+                continue
+            substance = unicodedata.normalize("NFKC", raw)
+            for suffix in _ALLERGY_SUFFIXES:
+                if substance.endswith(suffix):
+                    substance = substance[:-len(suffix)]
+                    break
+            key = fold_kana(substance)
+            if key and len(key) >= 2 and key not in _NO_ALLERGY:
+                tokens.append((raw, key, False))
+    return tuple(tokens)
+
+
+class InteractionIndex:
+    """薬剤 ID → 照合情報と、照合キー → 規則の索引
+
+    書き込みはロックの中で行い、読み込み側は辞書を引くだけなので
+    ロックを取らない（規則の一覧は差し替えるだけで変更しない）。
+    """
+
+    def __init__(self):
+        self._medications: Dict[int, _CompiledMedication] = {}
+        self._rules: Dict[str, Tuple[_Rule, ...]] = {}
+        self._stale: Set[int] = set()
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.synced_through: Optional[datetime] = None
+
+    def replace_all(self, medications: Iterable[_CompiledMedication]) -> None:
+        compiled = {medication.id: medication for medication in medications}
+        rules: Dict[str, List[_Rule]] = {}
+        for medication in compiled.values():
+            for key, rule in medication.rules:
+                rules.setdefault(key, []).append(rule)
+        with self._lock:
+            self._medications = compiled
+            self._rules = {key: tuple(key_rules) for key, key_rules in rules.items()}
+            self.loaded = True
+
+    def update(self, medications: Iterable[_CompiledMedication]) -> None:
+        """薬剤ごとに照合情報と規則を置き換える"""
+        with self._lock:
+            for medication in medications:
+                previous = self._medications.get(medication.id)
+                if previous is not None:
+                    for key in {key for key, _ in previous.rules}:
+                        remaining = tuple(rule for rule in self._rules.get(key, ()) if rule.source_id != medication.id)
+                        if remaining:
+                            self._rules[key] = remaining
+                        else:
+                            self._rules.pop(key, None)
+                for key, rule in medication.rules:
+                    self._rules[key] = self._rules.get(key, ()) + (rule,)
+                self._medications[medication.id] = medication
+
+    def mark_stale(self, medication_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._stale.update(medication_ids)
+
+    def take_stale(self) -> Set[int]:
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        return stale
+
+    def missing(self, medication_ids: Iterable[int]) -> List[int]:
+        return [medication_id for medication_id in medication_ids if medication_id not in self._medications]
+
+    def check(
+        self,
+        medication_ids: Sequence[int],
+        active_medication_ids: Sequence[int] = (),
+        allergies: Optional[str] = None,
+    ) -> List[InteractionAlert]:
+        """処方する薬剤どうし・服用中の薬剤との相互作用と、患者のアレルギーを確認する
+
+        服用中の薬剤どうしの組み合わせは確認済みとして除く。同じ組み合わせは
+        重大度の最も高い 1 件にまとめる。
+        """
+        medications, rules = self._medications, self._rules
+        # 薬剤 ID → 服用中か（処方する薬剤が優先）
+        involved: Dict[int, bool] = dict.fromkeys(medication_ids, False)
+        for medication_id in active_medication_ids:
+            involved.setdefault(medication_id, True)
+
+        pairs: Dict[Tuple[int, int], InteractionAlert] = {}
+        for target_id, target_active in involved.items():
+            target = medications.get(target_id)
+            if target is None:
+                continue
+            for key in target.keys:
+                for rule in rules.get(key, ()):
+                    source_active = involved.get(rule.source_id)
+                    if source_active is None or rule.source_id == target_id or (source_active and target_active):
+                        continue
+                    pair = (min(rule.source_id, target_id), max(rule.source_id, target_id))
+                    current = pairs.get(pair)
+                    if current is not None and _SEVERITY_RANK[current.severity] <= _SEVERITY_RANK[rule.severity]:
+                        continue
+                    source = medications[rule.source_id]
+                    # 処方する薬剤を主、服用中の薬剤を相手にする
+                    primary, other = (target, source) if source_active else (source, target)
+                    pairs[pair] = InteractionAlert(
+                        severity=rule.severity,
+                        medication_id=primary.id,
+                        medication_name=primary.name,
+                        other_medication_id=other.id,
+                        other_medication_name=other.name,
+                        other_is_active=involved[other.id],
+                        matched=rule.target,
+                        note=rule.note,
+                    )
+        alerts = list(pairs.values())
+
+        for raw, token, is_code in allergy_tokens(allergies):
+            for medication_id, active in involved.items():
+                medication = medications.get(medication_id)
+                if active or medication is None:
+                    continue
+                if token in medication.keys or (not is_code and token in medication.haystack):
+                    alerts.append(InteractionAlert(
+                        severity=InteractionSeverity.ALLERGY,
+                        medication_id=medication.id,
+                        medication_name=medication.name,
+                        other_medication_id=None,
+                        other_medication_name=None,
+                        other_is_active=False,
+                        matched=raw,
+                        note=None,
+                    ))
+
+        order = {medication_id: position for position, medication_id in enumerate(involved)}
+        alerts.sort(key=lambda alert: (
+            _SEVERITY_RANK[alert.severity], order[alert.medication_id], order.get(alert.other_medication_id, -1)
+        ))
+        return alerts
+
+    def __len__(self) -> int:
+        return len(self._medications)
+
+
+interaction_index = InteractionIndex()
+
+
+async def _load(db: AsyncSession, incremental: bool) -> None:
+    changed_at = func.coalesce(Medication.updated_at, Medication.created_at)
+    query = select(*INDEX_COLUMNS, changed_at.label("changed_at"))
+    if incremental:
+        query = query.where(changed_at >= interaction_index.synced_through - timedelta(seconds=SYNC_OVERLAP_SECONDS))
+    rows = (await db.execute(query)).all()
+    latest = max((row.changed_at for row in rows if row.changed_at is not None), default=None)
+    if incremental:
+        interaction_index.update(map(compile_medication, rows))
+    else:
+        interaction_index.replace_all(map(compile_medication, rows))
+    if latest is not None:
+        interaction_index.synced_through = latest
+    logger.debug("Loaded %d medications into the interaction index", len(rows))
+
+
+async def sync_interaction_index() -> None:
+    """初回は全件、以降は更新日時の新しい薬剤を読み込む（定期タスク）"""
+    async with AsyncSessionLocal() as db:
+        await _load(db, incremental=interaction_index.loaded and interaction_index.synced_through is not None)
+
+
+async def ensure_interaction_index(db: AsyncSession, medication_ids: Sequence[int] = ()) -> None:
+    """チェックの前に、未読み込みなら全件、変更された薬剤と索引にない薬剤はその分を読み込む"""
+    if not interaction_index.loaded:
+        await _load(db, incremental=False)
+        interaction_index.take_stale()
+        return
+    medication_ids = interaction_index.take_stale() | set(interaction_index.missing(medication_ids))
+    if medication_ids:
+        rows = (await db.execute(select(*INDEX_COLUMNS).where(Medication.id.in_(medication_ids)))).all()
+        interaction_index.update(map(compile_medication, rows))
+
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+async def active_medication_ids(
+    db: AsyncSession, patient_id: int, as_of: datetime, exclude_prescription_id: Optional[int] = None
+) -> List[int]:
+    """服用中の薬剤（有効な処方で、as_of に投薬期間中の明細）の ID"""
+    as_of = _naive(as_of)
+    # 薬剤・投薬日数ごとに最新の処方日だけを返す（同じ薬剤の繰り返し処方で行が増えない）
+    latest = func.max(Prescription.prescription_date).label("prescription_date")
+    query = (
+        select(PrescriptionItem.medication_id, PrescriptionItem.duration_days, latest)
+        .join(Prescription, Prescription.id == PrescriptionItem.prescription_id)
+        .where(
+            Prescription.patient_id == patient_id,
+            Prescription.status.notin_(INACTIVE_STATUSES),
+            Prescription.prescription_date >= as_of - timedelta(days=ACTIVE_LOOKBACK_DAYS),
+            Prescription.prescription_date <= as_of,
+        )
+        .group_by(PrescriptionItem.medication_id, PrescriptionItem.duration_days)
+    )
+    if exclude_prescription_id is not None:
+        query = query.where(Prescription.id != exclude_prescription_id)
+    rows = (await db.execute(query)).all()
+    return list(dict.fromkeys(
+        row.medication_id
+        for row in rows
+        if _naive(row.prescription_date) + timedelta(days=row.duration_days or DEFAULT_COURSE_DAYS) >= as_of
+    ))
+
+
+@event.listens_for(Medication, "after_insert")
+@event.listens_for(Medication, "after_update")
+def _remember_change(mapper, connection, target: Medication) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_stale_on_commit(session: Session) -> None:
+    changed = session.info.pop(_PENDING_KEY, None)
+    if changed:
+        interaction_index.mark_stale(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
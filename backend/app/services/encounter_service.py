@@ -1,8 +1,11 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, desc, select, func, update
+from sqlalchemy.orm import load_only
+from sqlalchemy.sql import Select
 from fastapi import HTTPException, status
-from datetime import datetime
+from datetime import datetime, timezone
+from ..core.pagination import CursorPage, Keyset, decode_cursor, fetch_page
 from ..models.encounter import Encounter
 from ..models.patient import Patient
 from ..models.user import User
@@ -11,67 +14,88 @@ from ..schemas.encounter import (
     EncounterUpdate, 
     EncounterSearchParams,
     VitalSignsUpdate,
-    SOAPNotesUpdate
+    SOAPNotesUpdate,
+    EncounterSave,
+    SOAPAutosave
 )
+from .id_allocator import next_encounter_id
+from .vitals_service import record_vitals
+from .soap_revisions import (
+    DELTA,
+    SNAPSHOT,
+    SOAP_FIELDS,
+    apply_splices,
+    diff_splice,
+    is_snapshot_revision,
+    record_revision,
+    revision_conflict,
+    utf16_length,
+)
+
+# Most recent first; id breaks ties between identical start times
+ENCOUNTER_KEYSET = Keyset(Encounter.start_time, Encounter.id, descending=True)
+
+# Columns list views show (EncounterListResponse). Apart from the assessment
+# the page lists, the SOAP, history, examination and note texts are left out; touching one on a summary row
+# raises instead of lazy loading, and they load with the detail route.
+ENCOUNTER_SUMMARY_COLUMNS = (
+    Encounter.id,
+    Encounter.encounter_id,
+    Encounter.patient_id,
+    Encounter.practitioner_id,
+    Encounter.status,
+    Encounter.encounter_class,
+    Encounter.start_time,
+    Encounter.end_time,
+    Encounter.chief_complaint,
+    Encounter.assessment,
+    Encounter.temperature,
+    Encounter.blood_pressure_systolic,
+    Encounter.blood_pressure_diastolic,
+    Encounter.heart_rate,
+    Encounter.respiratory_rate,
+    Encounter.oxygen_saturation,
+    Encounter.height,
+    Encounter.weight,
+    Encounter.created_at,
+)
+
+
+def _summary_select() -> Select:
+    return select(Encounter).options(load_only(*ENCOUNTER_SUMMARY_COLUMNS, raiseload=True))
+
+
+def _version_conflict(current_version: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Encounter was modified by another user (current version {current_version})",
+        headers={"ETag": encounter_etag(current_version)},
+    )
+
+
+def encounter_etag(version: int) -> str:
+    return f'"{version}"'
 
 
 class EncounterService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, user_id: Optional[int] = None):
         self.db = db
+        self.user_id = user_id  # recorded as the author of SOAP note revisions
 
-    def generate_encounter_id(self) -> str:
-        """Generate unique encounter ID with robust format handling"""
-        import uuid
-        
-        # Try multiple times to generate a unique ID
-        for attempt in range(10):
-            # Get all existing encounter IDs that start with 'E'
-            last_encounter = (
-                self.db.query(Encounter)
-                .filter(Encounter.encounter_id.like("E%"))
-                .order_by(Encounter.id.desc())
-                .first()
-            )
-            
-            if last_encounter and last_encounter.encounter_id:
-                try:
-                    # Extract numeric part from various formats: E000001, E001-001, etc.
-                    encounter_id_str = last_encounter.encounter_id
-                    if encounter_id_str.startswith("E"):
-                        # Get all digits from the string (handles both E000001 and E001-001)
-                        numeric_part = ''.join(filter(str.isdigit, encounter_id_str[1:]))
-                        if numeric_part:
-                            new_number = int(numeric_part) + 1
-                        else:
-                            new_number = 1
-                    else:
-                        new_number = 1
-                except (ValueError, IndexError):
-                    new_number = 1
-            else:
-                new_number = 1
-            
-            # Generate new encounter ID
-            new_encounter_id = f"E{new_number:06d}"
-            
-            # Check if this ID already exists (double-check for uniqueness)
-            existing = self.db.query(Encounter).filter(
-                Encounter.encounter_id == new_encounter_id
-            ).first()
-            
-            if not existing:
-                return new_encounter_id
-        
-        # If we still can't generate a unique ID after 10 attempts, use UUID fallback
-        return f"E{uuid.uuid4().hex[:6].upper()}"
+    async def generate_encounter_id(self) -> str:
+        """Generate unique encounter ID from the shared allocator (no query per call)"""
+        return await next_encounter_id()
 
-    def create_encounter(self, encounter_create: EncounterCreate) -> Encounter:
-        """Create a new encounter with retry logic for ID conflicts"""
+    async def create_encounter(self, encounter_create: EncounterCreate) -> Encounter:
+        """Create a new encounter with its vitals and first note revision"""
         # Verify patient exists
-        patient = self.db.query(Patient).filter(
-            Patient.id == encounter_create.patient_id,
-            Patient.is_active == "1"
-        ).first()
+        result = await self.db.execute(
+            select(Patient.id).where(
+                Patient.id == encounter_create.patient_id,
+                Patient.is_active == "1"
+            )
+        )
+        patient = result.first()
         if not patient:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -79,195 +103,314 @@ class EncounterService:
             )
         
         # Verify practitioner exists
-        practitioner = self.db.query(User).filter(
-            User.id == encounter_create.practitioner_id,
-            User.is_active == True
-        ).first()
+        result = await self.db.execute(
+            select(User.id).where(
+                User.id == encounter_create.practitioner_id,
+                User.is_active == True
+            )
+        )
+        practitioner = result.first()
         if not practitioner:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Practitioner not found"
             )
         
-        # Retry logic for handling potential ID conflicts
-        max_retries = 3
-        for retry in range(max_retries):
-            try:
-                # Generate unique encounter ID
-                encounter_id = self.generate_encounter_id()
-                
-                # Create encounter record
-                db_encounter = Encounter(
-                    encounter_id=encounter_id,
-                    patient_id=encounter_create.patient_id,
-                    practitioner_id=encounter_create.practitioner_id,
-                    status=encounter_create.status,
-                    encounter_class=encounter_create.encounter_class,
-                    start_time=encounter_create.start_time,
-                    end_time=encounter_create.end_time,
-                    subjective=encounter_create.subjective,
-                    objective=encounter_create.objective,
-                    assessment=encounter_create.assessment,
-                    plan=encounter_create.plan,
-                    temperature=encounter_create.temperature,
-                    blood_pressure_systolic=encounter_create.blood_pressure_systolic,
-                    blood_pressure_diastolic=encounter_create.blood_pressure_diastolic,
-                    heart_rate=encounter_create.heart_rate,
-                    respiratory_rate=encounter_create.respiratory_rate,
-                    oxygen_saturation=encounter_create.oxygen_saturation,
-                    height=encounter_create.height,
-                    weight=encounter_create.weight,
-                    chief_complaint=encounter_create.chief_complaint,
-                    history_present_illness=encounter_create.history_present_illness,
-                    physical_examination=encounter_create.physical_examination,
-                    diagnosis_codes=encounter_create.diagnosis_codes,
-                    notes=encounter_create.notes
-                )
-                
-                self.db.add(db_encounter)
-                self.db.commit()
-                self.db.refresh(db_encounter)
-                return db_encounter
-                
-            except Exception as e:
-                self.db.rollback()
-                if "UNIQUE constraint failed" in str(e) and retry < max_retries - 1:
-                    # Retry with a new ID if unique constraint failed
-                    continue
-                else:
-                    # If it's not a unique constraint error or we've exhausted retries
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail=f"Failed to create encounter: {str(e)}"
-                    )
-
-    def get_encounter(self, encounter_id: int) -> Optional[Encounter]:
+        notes = {field: getattr(encounter_create, field) for field in SOAP_FIELDS}
+        has_notes = any(text is not None for text in notes.values())
+
+        # Encounter IDs come from the block allocator and never collide
+        encounter_id = await self.generate_encounter_id()
+        
+        # Create encounter record
+        db_encounter = Encounter(
+            encounter_id=encounter_id,
+            patient_id=encounter_create.patient_id,
+            practitioner_id=encounter_create.practitioner_id,
+            status=encounter_create.status,
+            encounter_class=encounter_create.encounter_class,
+            start_time=encounter_create.start_time,
+            end_time=encounter_create.end_time,
+            subjective=encounter_create.subjective,
+            objective=encounter_create.objective,
+            assessment=encounter_create.assessment,
+            plan=encounter_create.plan,
+            temperature=encounter_create.temperature,
+            blood_pressure_systolic=encounter_create.blood_pressure_systolic,
+            blood_pressure_diastolic=encounter_create.blood_pressure_diastolic,
+            heart_rate=encounter_create.heart_rate,
+            respiratory_rate=encounter_create.respiratory_rate,
+            oxygen_saturation=encounter_create.oxygen_saturation,
+            height=encounter_create.height,
+            weight=encounter_create.weight,
+            chief_complaint=encounter_create.chief_complaint,
+            history_present_illness=encounter_create.history_present_illness,
+            physical_examination=encounter_create.physical_examination,
+            diagnosis_codes=encounter_create.diagnosis_codes,
+            notes=encounter_create.notes,
+            note_revision=1 if has_notes else 0
+        )
+        
+        self.db.add(db_encounter)
+        await self.db.flush()
+        await record_vitals(self.db, db_encounter, encounter_create.dict(), encounter_create.start_time)
+        if has_notes:
+            await record_revision(self.db, db_encounter.id, 1, SNAPSHOT, notes, self.user_id)
+        await self.db.commit()
+        await self.db.refresh(db_encounter)
+        return db_encounter
+
+    async def get_encounter(self, encounter_id: int) -> Optional[Encounter]:
         """Get encounter by ID"""
-        return self.db.query(Encounter).filter(Encounter.id == encounter_id).first()
+        result = await self.db.execute(select(Encounter).where(Encounter.id == encounter_id))
+        return result.scalars().first()
 
-    def get_encounter_by_encounter_id(self, encounter_id: str) -> Optional[Encounter]:
+    async def get_encounter_by_encounter_id(self, encounter_id: str) -> Optional[Encounter]:
         """Get encounter by encounter ID"""
-        return self.db.query(Encounter).filter(Encounter.encounter_id == encounter_id).first()
+        result = await self.db.execute(select(Encounter).where(Encounter.encounter_id == encounter_id))
+        return result.scalars().first()
+
+    async def _update_fields(self, encounter_id: int, values: Dict[str, Any], expected_version: Optional[int]) -> Optional[Encounter]:
+        """Write ``values`` and bump the version with one UPDATE ... RETURNING
+
+        ``expected_version`` (from If-Match) makes the write conditional: a
+        row changed since the client read it raises 409. Returns None when
+        the encounter does not exist. Writing any SOAP field also records a
+        snapshot revision of the notes. The caller commits.
+        """
+        if not values:
+            encounter = await self.get_encounter(encounter_id)
+            if encounter is not None and expected_version is not None and encounter.version != expected_version:
+                raise _version_conflict(encounter.version)
+            return encounter
+
+        writes_notes = not values.keys().isdisjoint(SOAP_FIELDS)
+        revision = {"note_revision": Encounter.note_revision + 1} if writes_notes else {}
+        statement = (
+            update(Encounter)
+            .where(Encounter.id == encounter_id)
+            .values(**values, **revision, version=Encounter.version + 1)
+        )
+        if expected_version is not None:
+            statement = statement.where(Encounter.version == expected_version)
+
+        if self.db.bind.dialect.update_returning:
+            encounter = (await self.db.execute(statement.returning(Encounter))).scalars().first()
+        else:
+            result = await self.db.execute(statement.execution_options(synchronize_session=False))
+            encounter = await self._reload(encounter_id) if result.rowcount else None
+        if encounter is not None:
+            if writes_notes:
+                notes = {field: getattr(encounter, field) for field in SOAP_FIELDS}
+                await record_revision(self.db, encounter.id, encounter.note_revision, SNAPSHOT, notes, self.user_id)
+            return encounter
+
+        # Nothing updated: tell a missing encounter from a stale version
+        current_version = await self.db.scalar(select(Encounter.version).where(Encounter.id == encounter_id))
+        if current_version is None:
+            return None
+        raise _version_conflict(current_version)
 
-    def update_encounter(self, encounter_id: int, encounter_update: EncounterUpdate) -> Optional[Encounter]:
+    async def _reload(self, encounter_id: int) -> Optional[Encounter]:
+        result = await self.db.execute(
+            select(Encounter).where(Encounter.id == encounter_id).execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    async def update_encounter(
+        self, encounter_id: int, encounter_update: EncounterUpdate, expected_version: Optional[int] = None
+    ) -> Optional[Encounter]:
         """Update encounter information"""
-        db_encounter = self.get_encounter(encounter_id)
+        update_data = encounter_update.dict(exclude_unset=True)
+        db_encounter = await self._update_fields(encounter_id, update_data, expected_version)
         if not db_encounter:
             return None
-        
-        # Update fields
-        update_data = encounter_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_encounter, field, value)
-        
-        self.db.commit()
-        self.db.refresh(db_encounter)
+        await record_vitals(self.db, db_encounter, update_data, datetime.now(timezone.utc))
+
+        await self.db.commit()
         return db_encounter
 
-    def update_vital_signs(self, encounter_id: int, vital_signs: VitalSignsUpdate) -> Optional[Encounter]:
+    async def update_vital_signs(
+        self, encounter_id: int, vital_signs: VitalSignsUpdate, expected_version: Optional[int] = None
+    ) -> Optional[Encounter]:
         """Update vital signs for an encounter"""
-        db_encounter = self.get_encounter(encounter_id)
+        update_data = vital_signs.dict(exclude_unset=True, exclude={"observed_at"})
+        db_encounter = await self._update_fields(encounter_id, update_data, expected_version)
         if not db_encounter:
             return None
-        
-        # Update vital signs fields
-        update_data = vital_signs.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_encounter, field, value)
-        
-        self.db.commit()
-        self.db.refresh(db_encounter)
+        # Also appended to the patient's vitals history
+        await record_vitals(self.db, db_encounter, update_data, vital_signs.observed_at or datetime.now(timezone.utc))
+
+        await self.db.commit()
         return db_encounter
 
-    def update_soap_notes(self, encounter_id: int, soap_notes: SOAPNotesUpdate) -> Optional[Encounter]:
+    async def update_soap_notes(
+        self, encounter_id: int, soap_notes: SOAPNotesUpdate, expected_version: Optional[int] = None
+    ) -> Optional[Encounter]:
         """Update SOAP notes for an encounter"""
-        db_encounter = self.get_encounter(encounter_id)
+        update_data = soap_notes.dict(exclude_unset=True)
+        db_encounter = await self._update_fields(encounter_id, update_data, expected_version)
         if not db_encounter:
             return None
-        
-        # Update SOAP notes fields
-        update_data = soap_notes.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(db_encounter, field, value)
-        
-        self.db.commit()
-        self.db.refresh(db_encounter)
+
+        await self.db.commit()
         return db_encounter
 
-    def search_encounters(self, search_params: EncounterSearchParams) -> List[Encounter]:
-        """Search encounters with various criteria"""
-        query = self.db.query(Encounter)
-        
-        # Apply filters
+    async def save_encounter(
+        self, encounter_id: int, encounter_save: EncounterSave, expected_version: Optional[int] = None
+    ) -> Optional[Tuple[Encounter, Dict[str, Any]]]:
+        """Write SOAP notes, vitals and status in one transaction
+
+        Returns the encounter and the stored values of the written fields.
+        """
+        update_data = encounter_save.dict(exclude_unset=True, exclude={"observed_at"})
+        db_encounter = await self._update_fields(encounter_id, update_data, expected_version)
+        if not db_encounter:
+            return None
+        await record_vitals(self.db, db_encounter, update_data, encounter_save.observed_at or datetime.now(timezone.utc))
+
+        await self.db.commit()
+        return db_encounter, {field: getattr(db_encounter, field) for field in update_data}
+
+    async def autosave_soap_notes(self, encounter_id: int, autosave: SOAPAutosave) -> Optional[Dict[str, Any]]:
+        """Apply text splices made against ``base_revision`` and store them as the next revision
+
+        Raises 409 when the notes have moved past ``base_revision`` (the
+        client reloads them) and 422 when a splice does not fit the text.
+        Returns None when the encounter does not exist.
+        """
+        current = (await self.db.execute(
+            select(
+                Encounter.note_revision, Encounter.version, Encounter.updated_at,
+                *(getattr(Encounter, field) for field in SOAP_FIELDS),
+            ).where(Encounter.id == encounter_id)
+        )).first()
+        if current is None:
+            return None
+        if current.note_revision != autosave.base_revision:
+            raise revision_conflict(current.note_revision)
+
+        texts = {field: getattr(current, field) for field in SOAP_FIELDS}
+        try:
+            updated = {
+                field: apply_splices(texts[field], [(splice.start, splice.end, splice.text) for splice in splices])
+                for field, splices in autosave.changes.items()
+            }
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Cannot apply changes: {e}"
+            )
+        updated = {field: text for field, text in updated.items() if text != (texts[field] or "")}
+        if not updated:
+            return {
+                "id": encounter_id,
+                "note_revision": current.note_revision,
+                "version": current.version,
+                "updated_at": current.updated_at,
+                "lengths": {},
+            }
+
+        revision = autosave.base_revision + 1
+        statement = (
+            update(Encounter)
+            .where(Encounter.id == encounter_id, Encounter.note_revision == autosave.base_revision)
+            .values(**updated, note_revision=revision, version=Encounter.version + 1)
+        )
+        if self.db.bind.dialect.update_returning:
+            written = (await self.db.execute(statement.returning(Encounter.version, Encounter.updated_at))).first()
+        else:
+            result = await self.db.execute(statement.execution_options(synchronize_session=False))
+            written = (await self.db.execute(
+                select(Encounter.version, Encounter.updated_at).where(Encounter.id == encounter_id)
+            )).first() if result.rowcount else None
+        if written is None:
+            # Another write landed between the read and the update
+            current_revision = await self.db.scalar(select(Encounter.note_revision).where(Encounter.id == encounter_id))
+            raise revision_conflict(current_revision)
+
+        if is_snapshot_revision(revision):
+            await record_revision(self.db, encounter_id, revision, SNAPSHOT, {**texts, **updated}, self.user_id)
+        else:
+            delta = {field: [diff_splice(texts[field], text)] for field, text in updated.items()}
+            await record_revision(self.db, encounter_id, revision, DELTA, delta, self.user_id)
+
+        await self.db.commit()
+        return {
+            "id": encounter_id,
+            "note_revision": revision,
+            "version": written.version,
+            "updated_at": written.updated_at,
+            "lengths": {field: utf16_length(text) for field, text in updated.items()},
+        }
+
+    def _apply_filters(self, query: Select, search_params: EncounterSearchParams) -> Select:
+        """Apply the search criteria shared by the list and count queries"""
         if search_params.patient_id:
-            query = query.filter(Encounter.patient_id == search_params.patient_id)
+            query = query.where(Encounter.patient_id == search_params.patient_id)
         
         if search_params.practitioner_id:
-            query = query.filter(Encounter.practitioner_id == search_params.practitioner_id)
+            query = query.where(Encounter.practitioner_id == search_params.practitioner_id)
         
         if search_params.status:
-            query = query.filter(Encounter.status == search_params.status)
+            query = query.where(Encounter.status == search_params.status)
         
         if search_params.encounter_class:
-            query = query.filter(Encounter.encounter_class == search_params.encounter_class)
+            query = query.where(Encounter.encounter_class == search_params.encounter_class)
         
         if search_params.start_date:
-            query = query.filter(Encounter.start_time >= search_params.start_date)
+            query = query.where(Encounter.start_time >= search_params.start_date)
         
         if search_params.end_date:
-            query = query.filter(Encounter.start_time <= search_params.end_date)
+            query = query.where(Encounter.start_time <= search_params.end_date)
+
+        return query
+
+    async def search_encounters(self, search_params: EncounterSearchParams) -> List[Encounter]:
+        """Search encounters with various criteria (summary columns only)"""
+        query = self._apply_filters(_summary_select(), search_params)
         
         # Order by most recent first
-        query = query.order_by(desc(Encounter.start_time))
+        query = ENCOUNTER_KEYSET.order(query)
         
         # Apply pagination
-        return (
+        result = await self.db.execute(
             query.offset(search_params.skip)
             .limit(search_params.limit)
-            .all()
         )
+        return result.scalars().all()
+
+    async def search_encounters_page(self, search_params: EncounterSearchParams) -> Tuple[CursorPage, Optional[int]]:
+        """Search encounters by cursor (or deprecated skip); the total is counted in the same query
+
+        Rows carry the summary columns only.
+        """
+        query = self._apply_filters(_summary_select(), search_params)
+        cursor = decode_cursor(ENCOUNTER_KEYSET, search_params.cursor)
+        return await fetch_page(self.db, query, ENCOUNTER_KEYSET, cursor, search_params.skip, search_params.limit)
 
-    def get_encounters_count(self, search_params: EncounterSearchParams) -> int:
+    async def get_encounters_count(self, search_params: EncounterSearchParams) -> int:
         """Get total count of encounters matching search criteria"""
-        query = self.db.query(Encounter)
-        
-        # Apply same filters as search_encounters
-        if search_params.patient_id:
-            query = query.filter(Encounter.patient_id == search_params.patient_id)
-        
-        if search_params.practitioner_id:
-            query = query.filter(Encounter.practitioner_id == search_params.practitioner_id)
-        
-        if search_params.status:
-            query = query.filter(Encounter.status == search_params.status)
-        
-        if search_params.encounter_class:
-            query = query.filter(Encounter.encounter_class == search_params.encounter_class)
-        
-        if search_params.start_date:
-            query = query.filter(Encounter.start_time >= search_params.start_date)
-        
-        if search_params.end_date:
-            query = query.filter(Encounter.start_time <= search_params.end_date)
-        
-        return query.count()
+        query = self._apply_filters(select(func.count(Encounter.id)), search_params)
+        result = await self.db.execute(query)
+        return result.scalar()
 
-    def get_patient_encounters(self, patient_id: int, limit: int = 50) -> List[Encounter]:
-        """Get recent encounters for a specific patient"""
-        return (
-            self.db.query(Encounter)
-            .filter(Encounter.patient_id == patient_id)
+    async def get_patient_encounters(self, patient_id: int, limit: int = 50) -> List[Encounter]:
+        """Get recent encounters for a specific patient (summary columns only)"""
+        result = await self.db.execute(
+            _summary_select()
+            .where(Encounter.patient_id == patient_id)
             .order_by(desc(Encounter.start_time))
             .limit(limit)
-            .all()
         )
+        return result.scalars().all()
 
-    def get_practitioner_encounters(self, practitioner_id: int, limit: int = 50) -> List[Encounter]:
-        """Get recent encounters for a specific practitioner"""
-        return (
-            self.db.query(Encounter)
-            .filter(Encounter.practitioner_id == practitioner_id)
+    async def get_practitioner_encounters(self, practitioner_id: int, limit: int = 50) -> List[Encounter]:
+        """Get recent encounters for a specific practitioner (summary columns only)"""
+        result = await self.db.execute(
+            _summary_select()
+            .where(Encounter.practitioner_id == practitioner_id)
             .order_by(desc(Encounter.start_time))
             .limit(limit)
-            .all()
-        )
\ No newline at end of file
+        )
+        return result.scalars().all()
\ No newline at end of file
@@ -218,9 +218,18 @@ class FHIRService:
         
         return medication_requests
     
-    def create_bundle(self, resources: List[Dict[str, Any]], bundle_type: str = "collection") -> Dict[str, Any]:
+    def create_bundle(
+        self,
+        resources: List[Dict[str, Any]],
+        bundle_type: str = "collection",
+        links: Optional[Dict[str, str]] = None,
+        total: Optional[int] = None
+    ) -> Dict[str, Any]:
         """
         複数のFHIRリソースをBundleにまとめる
+
+        links: Bundle.link に載せる {relation: url}（self / next / previous）
+        total: 検索条件に一致する総件数（不明な場合は含めたリソース数）
         """
         entries = []
         for resource in resources:
@@ -234,9 +243,11 @@ class FHIRService:
             "resourceType": "Bundle",
             "type": bundle_type,
             "timestamp": datetime.now().isoformat(),
-            "total": len(entries),
+            "total": len(entries) if total is None else total,
             "entry": entries
         }
+        if links:
+            bundle["link"] = [{"relation": relation, "url": url} for relation, url in links.items()]
         
         return bundle
     
@@ -0,0 +1,180 @@
+"""
+Identifier allocation for patient, encounter and prescription numbers
+
+Numbers come from named counters in the ``id_sequences`` table. A worker
+reserves a block of ``id_allocation_block_size`` values with one atomic
+``UPDATE ... RETURNING`` in its own short transaction (hi/lo allocation) and
+hands them out from memory, so creating a record normally costs no extra
+query and two workers can never receive the same number. Values of a block
+that is still unused when a worker exits are skipped, and numbers from
+different workers interleave, so identifiers are unique but not gap-free or
+strictly ordered by creation time.
+
+A counter row is created on first use, seeded past the highest number
+already stored, so databases that predate the allocator continue their
+existing numbering.
+"""
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+from ..core.config import settings
+from ..core.database import engine
+from ..models.encounter import Encounter
+from ..models.id_sequence import IdSequence
+from ..models.patient import Patient
+from ..models.prescription import Prescription
+
+logger = logging.getLogger(__name__)
+
+SeedFunc = Callable[[Connection], int]
+
+id_sequences = IdSequence.__table__
+
+
+@contextmanager
+def _counter_transaction() -> Iterator[Connection]:
+    """Short write transaction on the primary, independent of any request session
+
+    SQLite takes the write lock up front (BEGIN IMMEDIATE); with a deferred
+    BEGIN two reservations can each hold a read lock while waiting to write,
+    and SQLite fails one of them immediately instead of queueing it.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == "sqlite":
+            # The driver sees the explicit BEGIN and skips its own deferred one
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        yield connection
+
+
+class IdAllocator:
+    """Hands out values of one named counter, reserving them a block at a time"""
+
+    def __init__(self, name: str, seed: SeedFunc, block_size: Optional[int] = None):
+        self.name = name
+        self.seed = seed
+        self.block_size = block_size or settings.id_allocation_block_size
+        # Reserved [start, stop) ranges not yet handed out
+        self._blocks: Deque[Tuple[int, int]] = deque()
+
+    def _take(self) -> Optional[int]:
+        # No await between check and update, so this is atomic on the event loop
+        while self._blocks:
+            start, stop = self._blocks[0]
+            if start < stop:
+                self._blocks[0] = (start + 1, stop)
+                return start
+            self._blocks.popleft()
+        return None
+
+    async def next_value(self) -> int:
+        value = self._take()
+        while value is None:
+            # Concurrent callers may each reserve a block; the spare ones are kept
+            start = await self.reserve(self.block_size)
+            self._blocks.append((start, start + self.block_size))
+            value = self._take()
+        return value
+
+    async def reserve(self, count: int) -> int:
+        """Atomically claim ``count`` consecutive values and return the first
+
+        Runs on a worker thread with the sync engine: a reservation may wait
+        on the database write lock, and that wait must not block the event loop.
+        """
+        return await asyncio.to_thread(self.reserve_sync, count)
+
+    def reserve_sync(self, count: int) -> int:
+        next_value = self._advance(count)
+        if next_value is None:
+            self._create_counter()
+            next_value = self._advance(count)
+        return next_value - count
+
+    def _advance(self, count: int) -> Optional[int]:
+        statement = (
+            update(id_sequences)
+            .where(id_sequences.c.name == self.name)
+            .values(next_value=id_sequences.c.next_value + count)
+        )
+        with _counter_transaction() as connection:
+            if connection.dialect.update_returning:
+                return connection.execute(statement.returning(id_sequences.c.next_value)).scalar()
+            # The UPDATE holds the row lock until commit, so the read is ours
+            connection.execute(statement)
+            return connection.execute(
+                select(id_sequences.c.next_value).where(id_sequences.c.name == self.name)
+            ).scalar()
+
+    def _create_counter(self) -> None:
+        try:
+            with _counter_transaction() as connection:
+                first_value = self.seed(connection) + 1
+                connection.execute(id_sequences.insert().values(name=self.name, next_value=first_value))
+        except IntegrityError:
+            # Another worker created the counter first
+            return
+        logger.info("Created id sequence %s starting at %d", self.name, first_value)
+
+
+def _max_number(connection: Connection, column, prefix: str) -> int:
+    """Highest numeric suffix among existing identifiers starting with ``prefix``"""
+    highest = 0
+    result = connection.execute(select(column).where(column.like(f"{prefix}%")))
+    for identifier in result.scalars():
+        digits = "".join(filter(str.isdigit, identifier[len(prefix):]))
+        if digits:
+            highest = max(highest, int(digits))
+    return highest
+
+
+def _seed_patient_ids(connection: Connection) -> int:
+    return _max_number(connection, Patient.__table__.c.patient_id, "P")
+
+
+def _seed_encounter_ids(connection: Connection) -> int:
+    return _max_number(connection, Encounter.__table__.c.encounter_id, "E")
+
+
+patient_ids = IdAllocator("patient_id", _seed_patient_ids)
+encounter_ids = IdAllocator("encounter_id", _seed_encounter_ids)
+_prescription_numbers: Dict[str, IdAllocator] = {}
+
+
+def _prescription_allocator(day: str) -> IdAllocator:
+    """Prescription numbers restart every day, so each day has its own counter"""
+    allocator = _prescription_numbers.get(day)
+    if allocator is None:
+        def seed(connection: Connection) -> int:
+            return _max_number(connection, Prescription.__table__.c.prescription_number, f"{day}-")
+
+        # Earlier days' allocators are no longer needed
+        _prescription_numbers.clear()
+        allocator = _prescription_numbers[day] = IdAllocator(f"prescription_number:{day}", seed)
+    return allocator
+
+
+async def next_patient_id() -> str:
+    return f"P{await patient_ids.next_value():06d}"
+
+
+async def reserve_patient_ids(count: int) -> List[str]:
+    """``count`` patient IDs from one dedicated reservation (bulk import)"""
+    start = await patient_ids.reserve(count)
+    return [f"P{number:06d}" for number in range(start, start + count)]
+
+
+async def next_encounter_id() -> str:
+    return f"E{await encounter_ids.next_value():06d}"
+
+
+async def next_prescription_number(now: Optional[datetime] = None) -> str:
+    day = (now or datetime.now()).strftime("%Y%m%d")
+    return f"{day}-{await _prescription_allocator(day).next_value():04d}"
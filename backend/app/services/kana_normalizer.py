@@ -0,0 +1,146 @@
+"""
+Kana search key normalization
+
+Builds the prefix-searchable keys stored alongside a patient's kana name:
+
+- kana key: NFKC (half-width to full-width), katakana to hiragana, small kana
+  to full size, spaces and middle dots removed
+- romaji key: Hepburn, with long vowels ("ou", "oo", "uu", "ー") collapsed
+  and syllabic "m" written as "n"
+
+Search terms go through the same functions, so hiragana/katakana, full/half
+width, small kana and spellings such as "Satou"/"Sato" all meet on one key.
+"""
+import re
+import unicodedata
+from typing import Dict, Optional
+
+_KATAKANA_START = 0x30A1  # ァ
+_KATAKANA_END = 0x30F6    # ヶ
+_KATAKANA_TO_HIRAGANA_OFFSET = 0x60
+
+_SMALL_KANA = str.maketrans("ぁぃぅぇぉっゃゅょゎゕゖ", "あいうえおつやゆよわかけ")
+
+_SEPARATORS = re.compile(r"[\s・･\-‐－]+")
+
+_ROMAJI_DIGRAPHS = {
+    "きゃ": "kya", "きゅ": "kyu", "きょ": "kyo",
+    "ぎゃ": "gya", "ぎゅ": "gyu", "ぎょ": "gyo",
+    "しゃ": "sha", "しゅ": "shu", "しょ": "sho", "しぇ": "she",
+    "じゃ": "ja", "じゅ": "ju", "じょ": "jo", "じぇ": "je",
+    "ちゃ": "cha", "ちゅ": "chu", "ちょ": "cho", "ちぇ": "che",
+    "ぢゃ": "ja", "ぢゅ": "ju", "ぢょ": "jo",
+    "にゃ": "nya", "にゅ": "nyu", "にょ": "nyo",
+    "ひゃ": "hya", "ひゅ": "hyu", "ひょ": "hyo",
+    "びゃ": "bya", "びゅ": "byu", "びょ": "byo",
+    "ぴゃ": "pya", "ぴゅ": "pyu", "ぴょ": "pyo",
+    "みゃ": "mya", "みゅ": "myu", "みょ": "myo",
+    "りゃ": "rya", "りゅ": "ryu", "りょ": "ryo",
+    "ふぁ": "fa", "ふぃ": "fi", "ふぇ": "fe", "ふぉ": "fo",
+    "てぃ": "ti", "でぃ": "di", "うぃ": "wi", "うぇ": "we", "うぉ": "wo",
+    "ゔぁ": "va", "ゔぃ": "vi", "ゔぇ": "ve", "ゔぉ": "vo",
+}
+
+_ROMAJI_MONOGRAPHS = {
+    "あ": "a", "い": "i", "う": "u", "え": "e", "お": "o",
+    "か": "ka", "き": "ki", "く": "ku", "け": "ke", "こ": "ko",
+    "が": "ga", "ぎ": "gi", "ぐ": "gu", "げ": "ge", "ご": "go",
+    "さ": "sa", "し": "shi", "す": "su", "せ": "se", "そ": "so",
+    "ざ": "za", "じ": "ji", "ず": "zu", "ぜ": "ze", "ぞ": "zo",
+    "た": "ta", "ち": "chi", "つ": "tsu", "て": "te", "と": "to",
+    "だ": "da", "ぢ": "ji", "づ": "zu", "で": "de", "ど": "do",
+    "な": "na", "に": "ni", "ぬ": "nu", "ね": "ne", "の": "no",
+    "は": "ha", "ひ": "hi", "ふ": "fu", "へ": "he", "ほ": "ho",
+    "ば": "ba", "び": "bi", "ぶ": "bu", "べ": "be", "ぼ": "bo",
+    "ぱ": "pa", "ぴ": "pi", "ぷ": "pu", "ぺ": "pe", "ぽ": "po",
+    "ま": "ma", "み": "mi", "む": "mu", "め": "me", "も": "mo",
+    "や": "ya", "ゆ": "yu", "よ": "yo",
+    "ら": "ra", "り": "ri", "る": "ru", "れ": "re", "ろ": "ro",
+    "わ": "wa", "ゐ": "i", "ゑ": "e", "を": "o", "ん": "n", "ゔ": "vu",
+    "ぁ": "a", "ぃ": "i", "ぅ": "u", "ぇ": "e", "ぉ": "o",
+    "ゃ": "ya", "ゅ": "yu", "ょ": "yo", "ゎ": "wa", "ゕ": "ka", "ゖ": "ke",
+}
+
+# Long-vowel spellings (ou/oo/uu, trailing "oh" as in Satoh) collapse to one vowel
+_LONG_VOWELS = [(re.compile(r"ou|oo|oh(?![aiueoy])"), "o"), (re.compile(r"uu"), "u")]
+# Passport-style "m" before b/p/m (Homma, Sampei) is keyed as "n"
+_SYLLABIC_M = re.compile(r"m(?=[bpm])")
+
+_ROMAJI_QUERY = re.compile(r"^[a-z]+$")
+
+
+def _to_hiragana(text: str) -> str:
+    chars = []
+    for char in text:
+        code = ord(char)
+        if _KATAKANA_START <= code <= _KATAKANA_END:
+            char = chr(code - _KATAKANA_TO_HIRAGANA_OFFSET)
+        chars.append(char)
+    return "".join(chars)
+
+
+def _prepare(text: str) -> str:
+    """NFKC, lower-case, hiragana, separators removed; small kana kept"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _SEPARATORS.sub("", _to_hiragana(text))
+
+
+def fold_kana(text: Optional[str]) -> Optional[str]:
+    """Return the folded kana key for ``text``"""
+    if not text:
+        return None
+    return _prepare(text).translate(_SMALL_KANA) or None
+
+
+def _collapse_romaji(romaji: str) -> str:
+    for pattern, replacement in _LONG_VOWELS:
+        romaji = pattern.sub(replacement, romaji)
+    return _SYLLABIC_M.sub("n", romaji)
+
+
+def to_romaji(text: Optional[str]) -> Optional[str]:
+    """Return the Hepburn romaji key for ``text``"""
+    if not text:
+        return None
+    hiragana = _prepare(text)
+    romaji = []
+    index = 0
+    geminate = False
+    while index < len(hiragana):
+        pair = hiragana[index:index + 2]
+        if pair in _ROMAJI_DIGRAPHS:
+            syllable = _ROMAJI_DIGRAPHS[pair]
+            index += 2
+        else:
+            char = hiragana[index]
+            index += 1
+            if char == "っ":
+                geminate = True
+                continue
+            if char == "ー":
+                continue
+            syllable = _ROMAJI_MONOGRAPHS.get(char, char)
+        if geminate:
+            syllable = ("t" if syllable.startswith("ch") else syllable[0]) + syllable
+            geminate = False
+        romaji.append(syllable)
+    return _collapse_romaji("".join(romaji)) or None
+
+
+def normalize_kana_query(query: str) -> Dict[str, Optional[str]]:
+    """Normalize a search term; exactly one of ``kana``/``romaji`` is set"""
+    prepared = _prepare(query)
+    if _ROMAJI_QUERY.match(prepared):
+        return {"kana": None, "romaji": _collapse_romaji(prepared)}
+    return {"kana": fold_kana(query), "romaji": None}
+
+
+def patient_search_keys(last_name_kana: Optional[str], first_name_kana: Optional[str]) -> Dict[str, Optional[str]]:
+    """Column values for the patient search keys"""
+    full_name_kana = (last_name_kana or "") + (first_name_kana or "")
+    return {
+        "name_kana_key": fold_kana(full_name_kana),
+        "first_name_kana_key": fold_kana(first_name_kana),
+        "name_romaji_key": to_romaji(full_name_kana),
+        "first_name_romaji_key": to_romaji(first_name_kana),
+    }
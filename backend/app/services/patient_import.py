@@ -0,0 +1,212 @@
+"""
+Bulk patient import from CSV or NDJSON
+
+Rows are read one at a time from a file-like stream, validated with
+``PatientCreate`` and written in batches of ``patient_import_batch_size``:
+one patient ID reservation and one ``executemany`` INSERT per batch, or a
+COPY on PostgreSQL (asyncpg). Memory use depends on the batch size, not on
+the file size.
+
+Streams are decoded with ``errors="replace"``; rows containing undecodable
+bytes are rejected rather than stored with replacement characters. A row
+that fails validation is reported with its line number and skipped.
+A batch the database rejects is retried row by row in savepoints, so only
+the offending rows are lost.
+"""
+import csv
+import json
+import logging
+import tempfile
+from enum import Enum
+from typing import IO, Any, AsyncIterator, Dict, Iterator, List, NamedTuple, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..models.patient import Patient
+from ..schemas.patient import PatientCreate, PatientImportResult, PatientImportRowError
+from .id_allocator import reserve_patient_ids
+from .kana_normalizer import patient_search_keys
+
+logger = logging.getLogger(__name__)
+
+# Replacement character left by decoding with errors="replace"
+UNDECODABLE = "\ufffd"
+
+# Request bodies above this size are spooled to a temporary file
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+REQUIRED_COLUMNS = {name for name, field in PatientCreate.model_fields.items() if field.is_required()}
+
+
+class ImportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class ImportRow(NamedTuple):
+    line: int
+    data: Optional[Dict[str, Any]]
+    error: Optional[str] = None
+
+
+class ImportFileError(ValueError):
+    """The file as a whole cannot be imported (e.g. missing CSV columns)"""
+
+
+def read_csv(stream: IO[str]) -> Iterator[ImportRow]:
+    """Rows of a CSV file whose header names ``PatientCreate`` fields
+
+    Empty cells become ``None``; unknown columns are ignored.
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [column.strip() for column in header]
+    missing = REQUIRED_COLUMNS - set(header)
+    if missing:
+        raise ImportFileError(f"Missing required columns: {', '.join(sorted(missing))}")
+
+    line = reader.line_num + 1
+    for values in reader:
+        if any(value.strip() for value in values):
+            if len(values) > len(header):
+                yield ImportRow(line, None, f"Expected {len(header)} columns, got {len(values)}")
+            else:
+                yield ImportRow(line, {column: value.strip() or None for column, value in zip(header, values)})
+        # Quoted cells may span lines; report the line the row starts on
+        line = reader.line_num + 1
+
+
+def read_ndjson(stream: IO[str]) -> Iterator[ImportRow]:
+    """Rows of a newline-delimited JSON file, one object per line"""
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+        except ValueError as exc:
+            yield ImportRow(line, None, f"Invalid JSON: {exc}")
+            continue
+        if isinstance(data, dict):
+            yield ImportRow(line, data)
+        else:
+            yield ImportRow(line, None, "Expected a JSON object")
+
+
+READERS = {ImportFormat.CSV: read_csv, ImportFormat.NDJSON: read_ndjson}
+
+
+async def spool_stream(chunks: AsyncIterator[bytes]) -> IO[bytes]:
+    """Copy a request body to a temporary file (in memory while it is small)"""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    async for chunk in chunks:
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def _validation_messages(exc: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()]
+
+
+class PatientImporter:
+    def __init__(self, db: AsyncSession, batch_size: Optional[int] = None, max_errors: Optional[int] = None):
+        self.db = db
+        self.batch_size = batch_size or settings.patient_import_batch_size
+        self.max_errors = settings.patient_import_max_errors if max_errors is None else max_errors
+        self.use_copy = db.bind.dialect.driver == "asyncpg"
+        self.result = PatientImportResult()
+
+    def _fail(self, line: int, errors: List[str]) -> None:
+        self.result.failed += 1
+        if len(self.result.errors) < self.max_errors:
+            self.result.errors.append(PatientImportRowError(line=line, errors=errors))
+        else:
+            self.result.errors_truncated = True
+
+    async def run(self, rows: Iterator[ImportRow]) -> PatientImportResult:
+        """Validate and insert every row, returning the import report"""
+        batch: List[tuple] = []
+        for row in rows:
+            self.result.processed += 1
+            if row.error is not None:
+                self._fail(row.line, [row.error])
+                continue
+            if any(isinstance(value, str) and UNDECODABLE in value for value in row.data.values()):
+                self._fail(row.line, ["Undecodable characters (check the file encoding)"])
+                continue
+            try:
+                patient = PatientCreate.model_validate(row.data)
+            except ValidationError as exc:
+                self._fail(row.line, _validation_messages(exc))
+                continue
+            batch.append((row.line, patient))
+            if len(batch) >= self.batch_size:
+                await self._write_batch(batch)
+                batch = []
+        if batch:
+            await self._write_batch(batch)
+
+        logger.info(
+            "Patient import: %d processed, %d imported, %d failed",
+            self.result.processed, self.result.imported, self.result.failed,
+        )
+        return self.result
+
+    async def import_file(self, stream: IO[str], file_format: ImportFormat) -> PatientImportResult:
+        return await self.run(READERS[file_format](stream))
+
+    @staticmethod
+    def _values(patient_id: str, patient: PatientCreate) -> Dict[str, Any]:
+        return {
+            **patient.model_dump(),
+            "patient_id": patient_id,
+            "is_active": "1",
+            **patient_search_keys(patient.last_name_kana, patient.first_name_kana),
+        }
+
+    async def _write_batch(self, batch: List[tuple]) -> None:
+        patient_ids = await reserve_patient_ids(len(batch))
+        values = [self._values(patient_id, patient) for patient_id, (_, patient) in zip(patient_ids, batch)]
+        try:
+            if self.use_copy:
+                await self._copy(values)
+            else:
+                await self.db.execute(insert(Patient), values)
+            await self.db.commit()
+        except Exception:  # DBAPIError, or the driver's own error for COPY
+            await self.db.rollback()
+            await self._write_rows(batch, values)
+            return
+        self.result.imported += len(values)
+
+    async def _write_rows(self, batch: List[tuple], values: List[Dict[str, Any]]) -> None:
+        """Insert a rejected batch row by row to find the rows at fault"""
+        for (line, _), row in zip(batch, values):
+            try:
+                async with self.db.begin_nested():
+                    await self.db.execute(insert(Patient), [row])
+            except DBAPIError as exc:
+                self._fail(line, [f"Database error: {exc.orig}"])
+            else:
+                self.result.imported += 1
+        await self.db.commit()
+
+    async def _copy(self, values: List[Dict[str, Any]]) -> None:
+        """COPY the batch through the asyncpg connection of the session"""
+        columns = list(values[0])
+        # COPY bypasses SQLAlchemy's type processing; enums are stored by name
+        records = [
+            tuple(value.name if isinstance(value, Enum) else value for value in (row[column] for column in columns))
+            for row in values
+        ]
+        connection = await self.db.connection()
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            Patient.__tablename__, records=records, columns=columns
+        )
@@ -0,0 +1,97 @@
+"""
+Patient partial-match search backends
+
+Each backend turns a search term into a WHERE clause on ``Patient`` that the
+database can answer from an index:
+
+- PostgreSQL: ILIKE '%term%' backed by the pg_trgm GIN indexes
+- SQLite: MATCH against the FTS5 trigram table ``patients_fts``
+- anything else: plain ILIKE (sequential scan)
+
+Trigram indexes need at least three characters, so shorter terms fall back
+to ILIKE on every backend.
+
+Kana searches are dialect-independent: the term is normalized like the
+stored kana/romaji keys and matched as a prefix range on their B-tree indexes.
+"""
+from typing import Dict, Sequence
+
+from sqlalchemy import and_, bindparam, literal_column, or_, select, table, column
+from sqlalchemy.sql.elements import ColumnElement
+
+from ..models.patient import Patient
+from .kana_normalizer import normalize_kana_query
+
+TRIGRAM_MIN_LENGTH = 3
+
+NAME_COLUMNS = ("first_name", "last_name")
+KANA_COLUMNS = ("first_name_kana", "last_name_kana")
+PHONE_COLUMNS = ("phone",)
+
+patients_fts = table("patients_fts", column("rowid"))
+
+# Sorts after every character a normalized key can contain
+_PREFIX_UPPER_BOUND = "\uffff"
+
+
+def prefix_match(key_column, prefix: str) -> ColumnElement:
+    """``key_column LIKE 'prefix%'`` as a range, which any B-tree index can serve"""
+    return and_(key_column >= prefix, key_column < prefix + _PREFIX_UPPER_BOUND)
+
+
+class PatientSearchBackend:
+    """ILIKE substring matching; the portable fallback"""
+
+    def match(self, columns: Sequence[str], term: str) -> ColumnElement:
+        return or_(*(getattr(Patient, name).ilike(f"%{term}%") for name in columns))
+
+    def name_filter(self, term: str) -> ColumnElement:
+        return self.match(NAME_COLUMNS, term)
+
+    def kana_filter(self, term: str) -> ColumnElement:
+        """Prefix match on the full-name or first-name kana/romaji key"""
+        keys = normalize_kana_query(term)
+        if keys["romaji"]:
+            columns, prefix = (Patient.name_romaji_key, Patient.first_name_romaji_key), keys["romaji"]
+        elif keys["kana"]:
+            columns, prefix = (Patient.name_kana_key, Patient.first_name_kana_key), keys["kana"]
+        else:
+            return self.match(KANA_COLUMNS, term)
+        return or_(*(prefix_match(key_column, prefix) for key_column in columns))
+
+    def phone_filter(self, term: str) -> ColumnElement:
+        return self.match(PHONE_COLUMNS, term)
+
+
+class TrigramSearchBackend(PatientSearchBackend):
+    """PostgreSQL: the pg_trgm GIN indexes serve ILIKE '%term%' directly"""
+
+
+class Fts5SearchBackend(PatientSearchBackend):
+    """SQLite: substring MATCH on the FTS5 trigram shadow table"""
+
+    @staticmethod
+    def _fts_query(columns: Sequence[str], term: str) -> str:
+        quoted = '"' + term.replace('"', '""') + '"'
+        return "{" + " ".join(columns) + "} : " + quoted
+
+    def match(self, columns: Sequence[str], term: str) -> ColumnElement:
+        if len(term) < TRIGRAM_MIN_LENGTH:
+            return super().match(columns, term)
+        matching_ids = (
+            select(patients_fts.c.rowid)
+            .where(literal_column("patients_fts").op("MATCH")(bindparam(None, self._fts_query(columns, term))))
+        )
+        return Patient.id.in_(matching_ids)
+
+
+_backends: Dict[str, PatientSearchBackend] = {
+    "postgresql": TrigramSearchBackend(),
+    "sqlite": Fts5SearchBackend(),
+}
+_default_backend = PatientSearchBackend()
+
+
+def get_patient_search_backend(dialect_name: str) -> PatientSearchBackend:
+    """Return the search backend for a database dialect"""
+    return _backends.get(dialect_name, _default_backend)
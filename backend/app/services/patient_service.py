@@ -1,41 +1,33 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select, func
+from sqlalchemy.sql import Select
 from fastapi import HTTPException, status
 from datetime import datetime
+from ..core.pagination import CursorPage, Keyset, decode_cursor, fetch_page
 from ..models.patient import Patient
 from ..schemas.patient import PatientCreate, PatientUpdate, PatientSearchParams
+from .patient_search import get_patient_search_backend
+from .kana_normalizer import patient_search_keys
+from .id_allocator import next_patient_id
+
+# Patient lists page in registration order
+PATIENT_KEYSET = Keyset(Patient.id)
 
 
 class PatientService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
+        self.search_backend = get_patient_search_backend(db.bind.dialect.name)
 
-    def generate_patient_id(self) -> str:
-        """Generate unique patient ID"""
-        # Get the latest patient ID and increment
-        last_patient = (
-            self.db.query(Patient)
-            .order_by(Patient.id.desc())
-            .first()
-        )
-        
-        if last_patient and last_patient.patient_id:
-            try:
-                # Extract number from patient ID (assuming format P000001)
-                last_number = int(last_patient.patient_id[1:])
-                new_number = last_number + 1
-            except (ValueError, IndexError):
-                new_number = 1
-        else:
-            new_number = 1
-        
-        return f"P{new_number:06d}"
+    async def generate_patient_id(self) -> str:
+        """Generate unique patient ID from the shared allocator (no query per call)"""
+        return await next_patient_id()
 
-    def create_patient(self, patient_create: PatientCreate) -> Patient:
+    async def create_patient(self, patient_create: PatientCreate) -> Patient:
         """Create a new patient"""
         # Generate unique patient ID
-        patient_id = self.generate_patient_id()
+        patient_id = await self.generate_patient_id()
         
         # Create patient record
         db_patient = Patient(
@@ -61,33 +53,34 @@ class PatientService:
             allergies=patient_create.allergies,
             medical_history=patient_create.medical_history,
             notes=patient_create.notes,
-            is_active="1"
+            is_active="1",
+            **patient_search_keys(patient_create.last_name_kana, patient_create.first_name_kana),
         )
         
         self.db.add(db_patient)
-        self.db.commit()
-        self.db.refresh(db_patient)
+        await self.db.commit()
+        await self.db.refresh(db_patient)
         return db_patient
 
-    def get_patient(self, patient_id: int) -> Optional[Patient]:
+    async def get_patient(self, patient_id: int) -> Optional[Patient]:
         """Get patient by ID"""
-        return (
-            self.db.query(Patient)
-            .filter(Patient.id == patient_id, Patient.is_active == "1")
-            .first()
+        result = await self.db.execute(
+            select(Patient)
+            .where(Patient.id == patient_id, Patient.is_active == "1")
         )
+        return result.scalars().first()
 
-    def get_patient_by_patient_id(self, patient_id: str) -> Optional[Patient]:
+    async def get_patient_by_patient_id(self, patient_id: str) -> Optional[Patient]:
         """Get patient by patient ID (medical record number)"""
-        return (
-            self.db.query(Patient)
-            .filter(Patient.patient_id == patient_id, Patient.is_active == "1")
-            .first()
+        result = await self.db.execute(
+            select(Patient)
+            .where(Patient.patient_id == patient_id, Patient.is_active == "1")
         )
+        return result.scalars().first()
 
-    def update_patient(self, patient_id: int, patient_update: PatientUpdate) -> Optional[Patient]:
+    async def update_patient(self, patient_id: int, patient_update: PatientUpdate) -> Optional[Patient]:
         """Update patient information"""
-        db_patient = self.get_patient(patient_id)
+        db_patient = await self.get_patient(patient_id)
         if not db_patient:
             return None
         
@@ -95,82 +88,66 @@ class PatientService:
         update_data = patient_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_patient, field, value)
+
+        if "first_name_kana" in update_data or "last_name_kana" in update_data:
+            keys = patient_search_keys(db_patient.last_name_kana, db_patient.first_name_kana)
+            for field, value in keys.items():
+                setattr(db_patient, field, value)
         
-        self.db.commit()
-        self.db.refresh(db_patient)
+        await self.db.commit()
+        await self.db.refresh(db_patient)
         return db_patient
 
-    def delete_patient(self, patient_id: int) -> bool:
+    async def delete_patient(self, patient_id: int) -> bool:
         """Soft delete patient (set is_active to '0')"""
-        db_patient = self.get_patient(patient_id)
+        db_patient = await self.get_patient(patient_id)
         if not db_patient:
             return False
         
         db_patient.is_active = "0"
-        self.db.commit()
+        await self.db.commit()
         return True
 
-    def search_patients(self, search_params: PatientSearchParams) -> List[Patient]:
-        """Search patients with various criteria"""
-        query = self.db.query(Patient).filter(Patient.is_active == "1")
-        
-        # Apply filters
+    def _apply_filters(self, query: Select, search_params: PatientSearchParams) -> Select:
+        """Apply the search criteria shared by the list and count queries"""
+        query = query.where(Patient.is_active == "1")
+
         if search_params.patient_id:
-            query = query.filter(Patient.patient_id.ilike(f"%{search_params.patient_id}%"))
+            query = query.where(Patient.patient_id.ilike(f"%{search_params.patient_id}%"))
         
         if search_params.name:
-            name_filter = or_(
-                Patient.first_name.ilike(f"%{search_params.name}%"),
-                Patient.last_name.ilike(f"%{search_params.name}%")
-            )
-            query = query.filter(name_filter)
+            query = query.where(self.search_backend.name_filter(search_params.name))
         
         if search_params.kana:
-            kana_filter = or_(
-                Patient.first_name_kana.ilike(f"%{search_params.kana}%"),
-                Patient.last_name_kana.ilike(f"%{search_params.kana}%")
-            )
-            query = query.filter(kana_filter)
+            query = query.where(self.search_backend.kana_filter(search_params.kana))
         
         if search_params.phone:
-            query = query.filter(Patient.phone.ilike(f"%{search_params.phone}%"))
+            query = query.where(self.search_backend.phone_filter(search_params.phone))
         
         if search_params.date_of_birth:
-            query = query.filter(Patient.date_of_birth == search_params.date_of_birth)
+            query = query.where(Patient.date_of_birth == search_params.date_of_birth)
+
+        return query
+
+    async def search_patients(self, search_params: PatientSearchParams) -> List[Patient]:
+        """Search patients with various criteria"""
+        query = PATIENT_KEYSET.order(self._apply_filters(select(Patient), search_params))
         
         # Apply pagination
-        return (
+        result = await self.db.execute(
             query.offset(search_params.skip)
             .limit(search_params.limit)
-            .all()
         )
+        return result.scalars().all()
+
+    async def search_patients_page(self, search_params: PatientSearchParams) -> Tuple[CursorPage, Optional[int]]:
+        """Search patients by cursor (or deprecated skip); the total is counted in the same query"""
+        query = self._apply_filters(select(Patient), search_params)
+        cursor = decode_cursor(PATIENT_KEYSET, search_params.cursor)
+        return await fetch_page(self.db, query, PATIENT_KEYSET, cursor, search_params.skip, search_params.limit)
 
-    def get_patients_count(self, search_params: PatientSearchParams) -> int:
+    async def get_patients_count(self, search_params: PatientSearchParams) -> int:
         """Get total count of patients matching search criteria"""
-        query = self.db.query(Patient).filter(Patient.is_active == "1")
-        
-        # Apply same filters as search_patients
-        if search_params.patient_id:
-            query = query.filter(Patient.patient_id.ilike(f"%{search_params.patient_id}%"))
-        
-        if search_params.name:
-            name_filter = or_(
-                Patient.first_name.ilike(f"%{search_params.name}%"),
-                Patient.last_name.ilike(f"%{search_params.name}%")
-            )
-            query = query.filter(name_filter)
-        
-        if search_params.kana:
-            kana_filter = or_(
-                Patient.first_name_kana.ilike(f"%{search_params.kana}%"),
-                Patient.last_name_kana.ilike(f"%{search_params.kana}%")
-            )
-            query = query.filter(kana_filter)
-        
-        if search_params.phone:
-            query = query.filter(Patient.phone.ilike(f"%{search_params.phone}%"))
-        
-        if search_params.date_of_birth:
-            query = query.filter(Patient.date_of_birth == search_params.date_of_birth)
-        
-        return query.count()
\ No newline at end of file
+        query = self._apply_filters(select(func.count(Patient.id)), search_params)
+        result = await self.db.execute(query)
+        return result.scalar()
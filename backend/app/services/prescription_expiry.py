@@ -0,0 +1,52 @@
+"""
+処方箋の期限切れ処理（定期タスク）
+
+有効期限を過ぎた調剤前（下書き・処方済み）の処方箋を EXPIRED にする。これにより
+一覧のステータス絞り込みと調剤の可否が、読み込み時の計算なしで有効期限に従う。
+反映は最大で prescription_expiry_sweep_interval 秒遅れる。
+
+更新は PrescriptionService.expire_overdue の一括 UPDATE を、更新件数が
+prescription_expiry_batch_size に満たなくなるまで繰り返す。全ワーカーで動くが、
+対象は SKIP LOCKED で選ぶため、同時に動くワーカーはそれぞれ別の行を更新し、
+ロック待ちで件数が減って早く打ち切ることもない。満たないバッチは残りがないか、
+残りを他のワーカーが処理中であることを意味する。
+
+一部調剤済みの処方箋は調剤の記録を残すため対象外とする。
+"""
+import logging
+import time
+
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..core.metrics import Counter, Histogram, registry
+from .prescription_service import PrescriptionService
+
+logger = logging.getLogger(__name__)
+
+expired_total = registry.register(Counter(
+    "prescriptions_expired_total",
+    "Prescriptions moved to expired by the expiry sweep",
+))
+sweep_seconds = registry.register(Histogram(
+    "prescription_expiry_sweep_seconds",
+    "Duration of one expiry sweep (all batches)",
+))
+
+
+async def sweep_expired_prescriptions() -> int:
+    """有効期限を過ぎた処方箋をバッチに分けて期限切れにする（更新した件数を返す）"""
+    started = time.perf_counter()
+    batch_size = settings.prescription_expiry_batch_size
+    swept = 0
+    async with AsyncSessionLocal() as db:
+        service = PrescriptionService(db)
+        while True:
+            count = await service.expire_overdue(batch_size)
+            swept += count
+            expired_total.inc(count)
+            if count < batch_size:
+                break
+    sweep_seconds.observe(time.perf_counter() - started)
+    if swept:
+        logger.info("Expired %d prescriptions", swept)
+    return swept
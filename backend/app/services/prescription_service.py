@@ -0,0 +1,325 @@
+"""
+処方箋の作成と調剤
+
+作成は明細数に関係なく問い合わせ回数が一定になるように行う。
+
+- 薬剤は 1 回の IN 検索で読み込み、ID をキーにした辞書で明細に対応付ける
+- 明細ごとの費用と総費用は 1 回の走査で計算し、処方箋は最初から費用付きで INSERT する
+- 明細は 1 回の複数行 INSERT ... RETURNING で登録する
+- レスポンス用のオブジェクトグラフ（患者・明細・薬剤）は読み込み済みのオブジェクトから
+  組み立て、コミット後に再読み込みしない
+
+調剤は処方箋と全明細を 1 回の SELECT ... FOR UPDATE で読み込んで行ロックを取り、
+数量の検証・明細の一括 UPDATE・ステータスの再計算を同じ走査で行う。同じ処方箋を
+複数の窓口が同時に調剤しても、後の処理は先の処理のコミット後の状態を読む。
+SQLite は FOR UPDATE を持たないため、最初に BEGIN IMMEDIATE で書き込みロックを取る。
+同じプロセス内の調剤は asyncio のロックで順番待ちさせ、SQLite のビジー待ち
+（ポーリング）で待ち時間が伸びたりタイムアウトしたりしないようにする。
+
+処方箋グラフの読み込みは prescription_load_options で共通化する（一覧・詳細・FHIR）。
+
+有効期限を過ぎた調剤前の処方箋は expire_overdue で期限切れにする（prescription_expiry の
+定期タスクから呼ぶ）。1 回の UPDATE で期限の古い順に最大 batch_size 件を更新し、
+バッチごとにコミットして調剤の書き込みロックを長く止めない。
+
+作成時は drug_interactions で処方薬・服用中の薬剤・患者のアレルギーを、dose_validation で
+1 日用量を確認し、警告を interaction_warnings・dose_warnings としてレスポンスに含める
+（処方は止めない）。
+"""
+import asyncio
+import weakref
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.interfaces import LoaderOption
+
+from ..models.encounter import Encounter
+from ..models.medication import Medication
+from ..models.patient import Patient
+from ..models.prescription import OPEN_STATUSES, Prescription, PrescriptionItem, PrescriptionStatus
+from ..schemas.prescription import DispensingUpdate, PrescriptionCreate
+from .dose_validation import dose_items, validate_doses
+from .drug_interactions import (
+    InteractionAlert, active_medication_ids, ensure_interaction_index, interaction_index
+)
+from .id_allocator import next_prescription_number
+
+# 有効期限の既定値（処方日から 4 日後）
+PRESCRIPTION_VALID_DAYS = 4
+
+# 仮の負担割合（患者 3 割、保険 7 割）
+PATIENT_PAYMENT_RATE = 0.3
+
+# 調剤できない処方箋ステータス
+NOT_DISPENSABLE = (PrescriptionStatus.CANCELLED, PrescriptionStatus.EXPIRED)
+
+
+def prescription_load_options(patient: bool = True, prescriber: bool = False) -> Tuple[LoaderOption, ...]:
+    """処方箋グラフ（明細→薬剤、患者、処方医）の読み込みオプション
+
+    明細は selectinload で、ページの処方箋 ID をまとめた 1 回の追加 SELECT（薬剤は
+    その中で JOIN）で読み込む。joinedload と違って処方箋の行が明細数だけ増えず、
+    LIMIT/OFFSET もそのまま処方箋単位で効く。患者・処方医は多対一なので JOIN する。
+    指定していないリレーションは raiseload にし、遅延ロード（N+1）を例外として検出する。
+    """
+    options: List[LoaderOption] = [
+        selectinload(Prescription.prescription_items).options(
+            joinedload(PrescriptionItem.medication),
+            raiseload("*"),
+        ),
+    ]
+    if patient:
+        options.append(joinedload(Prescription.patient))
+    if prescriber:
+        options.append(joinedload(Prescription.prescriber))
+    options.append(raiseload("*"))
+    return tuple(options)
+
+
+# SQLite の書き込み順番待ち（イベントループごと）
+_sqlite_writers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _sqlite_writer_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _sqlite_writers.get(loop)
+    if lock is None:
+        lock = _sqlite_writers[loop] = asyncio.Lock()
+    return lock
+
+
+class PrescriptionService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _load_medications(self, medication_ids: List[int]) -> Dict[int, Medication]:
+        """明細の薬剤を ID をキーにした辞書で取得（存在しない ID があれば 404）"""
+        wanted = set(medication_ids)
+        result = await self.db.execute(select(Medication).where(Medication.id.in_(wanted)))
+        medications = {medication.id: medication for medication in result.scalars()}
+        if len(medications) != len(wanted):
+            raise HTTPException(status_code=404, detail="指定された薬剤が見つかりません")
+        return medications
+
+    async def check_interactions(
+        self,
+        patient: Patient,
+        medication_ids: List[int],
+        as_of: datetime,
+        exclude_prescription_id: Optional[int] = None,
+    ) -> List[InteractionAlert]:
+        """処方する薬剤の相互作用・禁忌と患者のアレルギーを確認する（索引にない薬剤があれば 404）"""
+        await ensure_interaction_index(self.db, medication_ids)
+        if interaction_index.missing(medication_ids):
+            raise HTTPException(status_code=404, detail="指定された薬剤が見つかりません")
+        active = await active_medication_ids(self.db, patient.id, as_of, exclude_prescription_id)
+        return interaction_index.check(medication_ids, active, patient.allergies)
+
+    async def create_prescription(self, prescription: PrescriptionCreate, prescriber_id: int) -> Prescription:
+        """処方箋と明細を 1 トランザクションで作成し、患者・明細・薬剤を読み込み済みの状態で返す
+
+        相互作用・用量の警告は interaction_warnings・dose_warnings 属性に設定する。
+        """
+        # 患者存在確認（レスポンスに含めるため行ごと取得）
+        patient = await self.db.get(Patient, prescription.patient_id)
+        if not patient:
+            raise HTTPException(status_code=404, detail="患者が見つかりません")
+
+        # 診療記録存在確認
+        encounter_exists = await self.db.scalar(select(Encounter.id).where(Encounter.id == prescription.encounter_id))
+        if not encounter_exists:
+            raise HTTPException(status_code=404, detail="診療記録が見つかりません")
+
+        medication_ids = [item.medication_id for item in prescription.prescription_items]
+        medications = await self._load_medications(medication_ids)
+        warnings = await self.check_interactions(patient, medication_ids, prescription.prescription_date)
+
+        # 明細の費用と総費用を 1 回の走査で計算
+        item_rows = []
+        total_cost = 0
+        for item in prescription.prescription_items:
+            unit_cost = medications[item.medication_id].unit_price or 0
+            item_total_cost = unit_cost * item.quantity
+            total_cost += item_total_cost
+            item_rows.append({**item.dict(), "unit_cost": unit_cost, "total_cost": item_total_cost})
+
+        prescription_data = prescription.dict(exclude={"prescription_items"})
+        # instructions は調剤指示として保存
+        prescription_data["dispensing_instructions"] = prescription_data.pop("instructions", None)
+        if not prescription_data.get("expiry_date"):
+            prescription_data["expiry_date"] = prescription.prescription_date + timedelta(days=PRESCRIPTION_VALID_DAYS)
+
+        db_prescription = Prescription(
+            **prescription_data,
+            prescriber_id=prescriber_id,
+            prescription_number=await next_prescription_number(),
+            total_cost=total_cost,
+            patient_payment=total_cost * PATIENT_PAYMENT_RATE,
+            insurance_coverage=total_cost * (1 - PATIENT_PAYMENT_RATE),
+        )
+        self.db.add(db_prescription)
+        await self.db.flush()  # IDを取得するためフラッシュ
+
+        # 明細を一括登録（RETURNING で既定値を含む行をそのまま受け取る）
+        # sort_by_parameter_order=True は SQLite では 1 行ずつの INSERT に戻るため使わず、
+        # 1 文で採番された ID の昇順（= 指定順）に並べ直す
+        for row in item_rows:
+            row["prescription_id"] = db_prescription.id
+        result = await self.db.scalars(insert(PrescriptionItem).returning(PrescriptionItem), item_rows)
+        items = sorted(result.all(), key=lambda item: item.id)
+        dose_warnings, _ = validate_doses(dose_items(items, medications))
+
+        # レスポンス用のリレーションを読み込み済みとして設定（追加の SELECT なし）
+        for item in items:
+            set_committed_value(item, "medication", medications[item.medication_id])
+            set_committed_value(item, "prescription", db_prescription)
+        set_committed_value(db_prescription, "prescription_items", items)
+        set_committed_value(db_prescription, "patient", patient)
+
+        await self.db.commit()
+        db_prescription.interaction_warnings = warnings
+        db_prescription.dose_warnings = dose_warnings
+        return db_prescription
+
+    @asynccontextmanager
+    async def _write_transaction(self) -> AsyncIterator[None]:
+        """行ロックを伴う書き込みトランザクション（本体でコミットし、コミットせずに抜けたらロールバック）
+
+        SQLite では FOR UPDATE が出力されないため、書き込みロックを先に取る。
+        遅延 BEGIN のままだと、同時に読み込んだ 2 つの調剤が同じ古い状態から
+        ステータスを計算してしまう。
+        """
+        connection = await self.db.connection()
+        is_sqlite = connection.dialect.name == "sqlite"
+        async with _sqlite_writer_lock() if is_sqlite else nullcontext():
+            if is_sqlite:
+                # ドライバは明示的な BEGIN を検知し、自前の遅延 BEGIN を発行しない
+                await connection.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                yield
+            finally:
+                # 次の待ち手に渡す前にロックを解放する
+                if self.db.in_transaction():
+                    await self.db.rollback()
+
+    async def _drug_name(self, medication_id: int) -> str:
+        return await self.db.scalar(select(Medication.drug_name).where(Medication.id == medication_id))
+
+    async def dispense(
+        self, prescription_id: int, dispensing_updates: List[DispensingUpdate], pharmacist_name: str
+    ) -> Optional[Prescription]:
+        """明細の調剤量を記録し、処方箋のステータスを更新する（処方箋がなければ None）
+
+        調剤量は明細ごとの累計。調剤済みの明細の再調剤と、記録済みより少ない調剤量は
+        409（他の窓口が先に調剤した）。
+        """
+        async with self._write_transaction():
+            rows = (await self.db.execute(
+                select(Prescription, PrescriptionItem)
+                .join(PrescriptionItem, PrescriptionItem.prescription_id == Prescription.id)
+                .where(Prescription.id == prescription_id)
+                .order_by(PrescriptionItem.id)
+                .with_for_update()
+                .execution_options(populate_existing=True)
+            )).all()
+            if not rows:
+                prescription = await self.db.get(Prescription, prescription_id)
+                if prescription is None:
+                    return None
+                raise HTTPException(status_code=404, detail="処方明細が見つかりません")
+
+            prescription = rows[0].Prescription
+            if prescription.status in NOT_DISPENSABLE:
+                raise HTTPException(status_code=409, detail="中止または期限切れの処方箋は調剤できません")
+            items = {row.PrescriptionItem.id: row.PrescriptionItem for row in rows}
+
+            # 数量をメモリ上で適用（明細ごとの最終値）
+            now = datetime.now()
+            changes: Dict[int, Dict] = {}
+            for dispensing in dispensing_updates:
+                item = items.get(dispensing.prescription_item_id)
+                if item is None:
+                    raise HTTPException(status_code=404, detail="処方明細が見つかりません")
+                if dispensing.dispensed_quantity > item.quantity:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"調剤量が処方量を超えています: {await self._drug_name(item.medication_id)}"
+                    )
+                if item.is_dispensed or dispensing.dispensed_quantity < (item.dispensed_quantity or 0):
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"他の調剤で既に記録されています: {await self._drug_name(item.medication_id)}"
+                    )
+                changes[item.id] = {
+                    "id": item.id,
+                    "dispensed_quantity": dispensing.dispensed_quantity,
+                    "dispensed_date": dispensing.dispensed_date or now,
+                    "is_dispensed": dispensing.dispensed_quantity >= item.quantity,
+                }
+
+            # 明細を一括更新し、同じ走査でステータスを再計算
+            if changes:
+                await self.db.execute(update(PrescriptionItem), list(changes.values()))
+            all_dispensed = True
+            partially_dispensed = False
+            for item in items.values():
+                change = changes.get(item.id)
+                dispensed_quantity = change["dispensed_quantity"] if change else (item.dispensed_quantity or 0)
+                all_dispensed = all_dispensed and (change["is_dispensed"] if change else bool(item.is_dispensed))
+                partially_dispensed = partially_dispensed or dispensed_quantity > 0
+
+            if all_dispensed:
+                prescription.status = PrescriptionStatus.DISPENSED
+            elif partially_dispensed:
+                prescription.status = PrescriptionStatus.PARTIALLY_DISPENSED
+            prescription.dispensing_date = now
+            prescription.pharmacist_name = pharmacist_name
+
+            await self.db.commit()
+            return prescription
+
+    async def expire_overdue(self, batch_size: int) -> int:
+        """有効期限がデータベースの現在時刻より前の調剤前の処方箋を最大 batch_size 件期限切れにする（更新した件数を返す）
+
+        現在時刻はデータベースの時刻を使う。PostgreSQL では now() と timestamptz の
+        expiry_date を比べる。SQLite はタイムゾーンを保存せず、expiry_date はローカル時刻の
+        文字列（days_until_expiry と同じ）なので、UTC を返す CURRENT_TIMESTAMP ではなく
+        datetime('now', 'localtime') と比べる。UTC 以外で動くサーバーで時差の分だけずれないようにする。
+
+        ステータスの条件はリテラルで出力する。バインド変数のままだと部分インデックス
+        ix_prescriptions_open_expiry_date の条件に一致すると判定されず、全件走査になる。
+        対象の行は FOR UPDATE SKIP LOCKED で選ぶ。複数のワーカーが同時に掃き出しても
+        同じバッチを取り合わず、他のワーカーや調剤が行ロック中の処方箋は飛ばして次の行を取る
+        （SQLite では出力されず、書き込みロックで直列になる）。外側の条件でステータスを
+        もう一度確認するため、調剤済みになったものは更新しない。
+        """
+        is_open = Prescription.status.in_(
+            bindparam("open_statuses", list(OPEN_STATUSES), expanding=True, literal_execute=True)
+        )
+        connection = await self.db.connection()
+        if connection.dialect.name == "sqlite":
+            now = func.datetime("now", "localtime")
+        else:
+            now = func.now()
+        overdue = (
+            select(Prescription.id)
+            .where(Prescription.expiry_date < now, is_open)
+            .order_by(Prescription.expiry_date)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with self._write_transaction():
+            result = await self.db.execute(
+                update(Prescription)
+                .where(Prescription.id.in_(overdue), is_open)
+                .values(status=PrescriptionStatus.EXPIRED)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+        return result.rowcount
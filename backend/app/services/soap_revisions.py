@@ -0,0 +1,143 @@
+"""
+SOAP note revision history
+
+Each write of an encounter's SOAP notes bumps ``Encounter.note_revision``
+and appends an ``EncounterNoteRevision``. Full-text saves (create, PUT and
+the SOAP/combined PATCH routes) store a snapshot; autosave stores one
+splice per changed field, except that revision 1 and every
+``soap_snapshot_interval``-th revision store a snapshot. Rebuilding any
+revision therefore reads one snapshot and fewer than that many deltas.
+
+Splice offsets are UTF-16 code units, which is what a browser's textarea
+and ``String.prototype.length`` count, so a client can send offsets
+without converting them. A client splice may cut through a surrogate pair
+as long as the result is whole again; the stored splice is recomputed from
+the old and new text, so it always covers whole characters.
+"""
+import json
+import os
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..models.encounter_note_revision import EncounterNoteRevision
+
+SOAP_FIELDS = ("subjective", "objective", "assessment", "plan")
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+Splice = Tuple[int, int, str]
+
+
+def apply_splices(text: Optional[str], splices: Sequence[Splice]) -> str:
+    """``text`` with each ``(start, end, insert)`` applied in order
+
+    Raises ValueError when a splice is out of range or the result has an
+    unpaired surrogate.
+    """
+    data = (text or "").encode("utf-16-le")
+    for start, end, inserted in splices:
+        if not 0 <= start <= end <= len(data) // 2:
+            raise ValueError(f"Splice [{start}, {end}) is outside a text of length {len(data) // 2}")
+        data = data[:2 * start] + inserted.encode("utf-16-le", "surrogatepass") + data[2 * end:]
+    return data.decode("utf-16-le")
+
+
+def diff_splice(before: Optional[str], after: str) -> Splice:
+    """The single splice turning ``before`` into ``after``: all but their common prefix and suffix"""
+    before = before or ""
+    start = len(os.path.commonprefix([before, after]))
+    limit = min(len(before), len(after)) - start
+    tail = len(os.path.commonprefix([before[::-1][:limit], after[::-1][:limit]]))
+    return (
+        utf16_length(before[:start]),
+        utf16_length(before[:len(before) - tail]),
+        after[start:len(after) - tail],
+    )
+
+
+def utf16_length(text: Optional[str]) -> int:
+    return len((text or "").encode("utf-16-le")) // 2
+
+
+def is_snapshot_revision(revision: int) -> bool:
+    """Whether an autosaved ``revision`` is stored in full"""
+    return revision == 1 or revision % settings.soap_snapshot_interval == 0
+
+
+def revision_conflict(current_revision: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"SOAP notes were modified by another user (current revision {current_revision})",
+        headers={"X-Note-Revision": str(current_revision)},
+    )
+
+
+async def record_revision(
+    db: AsyncSession,
+    encounter_id: int,
+    revision: int,
+    kind: str,
+    content: Mapping,
+    author_id: Optional[int],
+) -> None:
+    """Append one revision in the caller's transaction
+
+    ``content`` is ``{field: text}`` for a snapshot and ``{field: [splice, ...]}``
+    for a delta.
+    """
+    await db.execute(
+        insert(EncounterNoteRevision).values(
+            encounter_id=encounter_id,
+            revision=revision,
+            kind=kind,
+            content=json.dumps(content, ensure_ascii=False, separators=(",", ":")),
+            author_id=author_id,
+        )
+    )
+
+
+async def get_note_revision(
+    db: AsyncSession, encounter_id: int, revision: int
+) -> Optional[Tuple[EncounterNoteRevision, Dict[str, Optional[str]]]]:
+    """The stored revision and the SOAP texts at that point, or None
+
+    One query reads the nearest snapshot at or below ``revision`` and the
+    deltas after it.
+    """
+    R = EncounterNoteRevision
+    snapshot = (
+        select(func.max(R.revision))
+        .where(R.encounter_id == encounter_id, R.revision <= revision, R.kind == SNAPSHOT)
+        .scalar_subquery()
+    )
+    rows = (await db.execute(
+        select(R)
+        .where(R.encounter_id == encounter_id, R.revision <= revision, R.revision >= snapshot)
+        .order_by(R.revision)
+    )).scalars().all()
+    if not rows or rows[-1].revision != revision:
+        return None
+
+    texts = dict.fromkeys(SOAP_FIELDS)
+    texts.update(json.loads(rows[0].content))
+    for row in rows[1:]:
+        for field, splices in json.loads(row.content).items():
+            texts[field] = apply_splices(texts[field], splices)
+    return rows[-1], texts
+
+
+async def list_note_revisions(db: AsyncSession, encounter_id: int, limit: int = 100) -> List:
+    """Newest first, without content"""
+    R = EncounterNoteRevision
+    result = await db.execute(
+        select(R.revision, R.kind, func.length(R.content).label("size"), R.author_id, R.created_at)
+        .where(R.encounter_id == encounter_id)
+        .order_by(R.revision.desc())
+        .limit(limit)
+    )
+    return result.all()
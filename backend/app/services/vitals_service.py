@@ -0,0 +1,163 @@
+"""
+Vital-sign observations and downsampled trends
+
+Every vital value written to an encounter (at creation, through the
+vital-signs endpoint or an encounter update) is also appended to
+``vital_observations``. Trends are read from there: one indexed range scan
+per patient, turned into NumPy arrays and reduced to at most ``points``
+points per metric so that a chart gets a small response however long the
+history is.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.encounter import Encounter
+from ..models.vital_observation import VITAL_METRICS, VitalObservation
+from ..schemas.vitals import TrendMethod, VitalTrendSeries
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Aware datetimes in UTC; naive ones are taken to be UTC already"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _epoch_seconds(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+async def record_vitals(db: AsyncSession, encounter: Encounter, values: Mapping[str, Any], observed_at: datetime) -> int:
+    """Append the vital values among ``values`` for a flushed ``encounter``
+
+    One multi-row INSERT in the caller's transaction; returns the number of
+    observations written.
+    """
+    rows = [
+        {
+            "patient_id": encounter.patient_id,
+            "encounter_id": encounter.id,
+            "metric": metric,
+            "value": float(values[metric]),
+            "observed_at": _as_utc(observed_at),
+        }
+        for metric in VITAL_METRICS
+        if values.get(metric) is not None
+    ]
+    if rows:
+        await db.execute(insert(VitalObservation), rows)
+    return len(rows)
+
+
+def lttb(t: np.ndarray, v: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets
+
+    ``t`` must be ascending. The first and last points are always kept; of
+    each bucket in between, the point forming the largest triangle with the
+    previous kept point and the mean of the next bucket.
+    """
+    n = len(t)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Buckets 0..threshold-3 over points 1..n-2 (integer bounds: no float rounding at the ends)
+    bounds = np.arange(threshold - 1, dtype=np.int64) * (n - 2) // (threshold - 2) + 1
+    sizes = np.diff(bounds)
+    t_sum = np.add.reduceat(t[:-1], bounds[:-1])
+    v_sum = np.add.reduceat(v[:-1], bounds[:-1])
+    # Mean of the following bucket; the last bucket looks at the last point
+    t_next = np.append((t_sum / sizes)[1:], t[-1])
+    v_next = np.append((v_sum / sizes)[1:], v[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        lo, hi = bounds[bucket], bounds[bucket + 1]
+        ta, va = t[a], v[a]
+        area = np.abs((ta - t_next[bucket]) * (v[lo:hi] - va) - (ta - t[lo:hi]) * (v_next[bucket] - va))
+        a = lo + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def bucket_stats(t: np.ndarray, v: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """``(mean time, mean, min, max)`` per non-empty equal-width time bucket; ``t`` ascending"""
+    span = t[-1] - t[0]
+    if span <= 0 or buckets <= 1:
+        ids = np.zeros(len(t), dtype=np.int64)
+    else:
+        ids = np.minimum(((t - t[0]) * (buckets / span)).astype(np.int64), buckets - 1)
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    counts = np.diff(np.r_[starts, len(t)])
+    return (
+        np.add.reduceat(t, starts) / counts,
+        np.add.reduceat(v, starts) / counts,
+        np.minimum.reduceat(v, starts),
+        np.maximum.reduceat(v, starts),
+    )
+
+
+def downsample(metric: str, t: np.ndarray, v: np.ndarray, points: int, method: TrendMethod) -> VitalTrendSeries:
+    """Reduce one metric's ascending ``(t, v)`` epoch-second series to at most ``points`` points"""
+    count = len(t)
+    if method == TrendMethod.BUCKET and count > points:
+        t_mean, mean, low, high = bucket_stats(t, v, points)
+        return VitalTrendSeries(
+            metric=metric,
+            unit=VITAL_METRICS[metric],
+            count=count,
+            t=np.rint(t_mean * 1000).astype(np.int64).tolist(),
+            value=mean.tolist(),
+            min=low.tolist(),
+            max=high.tolist(),
+        )
+    keep = lttb(t, v, points)
+    return VitalTrendSeries(
+        metric=metric,
+        unit=VITAL_METRICS[metric],
+        count=count,
+        t=np.rint(t[keep] * 1000).astype(np.int64).tolist(),
+        value=v[keep].tolist(),
+    )
+
+
+async def get_vitals_trend(
+    db: AsyncSession,
+    patient_id: int,
+    metrics: Sequence[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    points: int,
+    method: TrendMethod,
+) -> List[VitalTrendSeries]:
+    """Downsampled series for each of ``metrics`` (in that order) within ``[start, end]``"""
+    query = (
+        select(VitalObservation.metric, VitalObservation.observed_at, VitalObservation.value)
+        .where(VitalObservation.patient_id == patient_id, VitalObservation.metric.in_(metrics))
+        .order_by(VitalObservation.metric, VitalObservation.observed_at, VitalObservation.id)
+    )
+    if start is not None:
+        query = query.where(VitalObservation.observed_at >= _as_utc(start))
+    if end is not None:
+        query = query.where(VitalObservation.observed_at <= _as_utc(end))
+    rows = (await db.execute(query)).all()
+
+    # Rows come grouped by metric: split into contiguous slices
+    observed: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    if rows:
+        names = [row.metric for row in rows]
+        t = np.fromiter((_epoch_seconds(row.observed_at) for row in rows), dtype=np.float64, count=len(rows))
+        v = np.fromiter((row.value for row in rows), dtype=np.float64, count=len(rows))
+        starts = [0] + [i for i in range(1, len(names)) if names[i] != names[i - 1]] + [len(names)]
+        for lo, hi in zip(starts, starts[1:]):
+            observed[names[lo]] = (t[lo:hi], v[lo:hi])
+
+    empty = np.empty(0, dtype=np.float64)
+    return [downsample(metric, *observed.get(metric, (empty, empty)), points, method) for metric in metrics]
@@ -0,0 +1 @@
+# Benchmarks package init
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+1 日分の処方の用量監査ベンチマーク
+
+1 日分の処方箋（明細の用法は典型的な記載からランダムに選ぶ）を投入し、
+services.dose_validation.audit_doses（1 回の SELECT と 1 回の走査での合算・比較）の時間を測る。
+比較のため、同じ明細を 1 件ずつ合算・比較して同じ警告を作る素朴な実装の時間も表示し、
+警告が一致しなければ終了コード 1 を返す。
+
+    python -m benchmarks.bench_dose_audit --prescriptions 5000 --items 5
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from benchmarks import common
+
+from sqlalchemy import insert, select
+
+from app.core.database import AsyncSessionLocal, engine
+from app.models.encounter import Encounter, EncounterStatus
+from app.models.medication import Medication, MedicationForm
+from app.models.prescription import Prescription, PrescriptionItem, PrescriptionStatus
+from app.schemas.prescription import DoseIssue, DoseWarning
+from app.services.dosage_parser import parse_dosage
+from app.services.dose_validation import TOLERANCE, DoseItem, audit_doses, daily_dose, validate_doses
+
+DAY = datetime(2026, 1, 1)
+
+# (用量, 服薬頻度, 服薬タイミング)
+DOSAGES = [
+    ("1回1錠", "1日3回毎食後", None),
+    ("1回2錠", "1日2回朝夕食後", None),
+    ("1回1錠", "1日1回", "朝食後"),
+    ("1日3錠 分3", "毎食後", None),
+    ("1回0.5錠", "就寝前", None),
+    ("１回１錠", "一日二回", "朝夕食後"),
+    ("1回1錠", "疼痛時 頓服", None),
+    ("1回1錠", "頓用 1日3回まで", None),
+    ("1回1錠", "隔日", None),
+    ("2錠", "毎食後・就寝前", None),
+    (None, None, None),
+]
+
+
+def seed(prescriptions: int, items: int, medications: int, prescriber_id: int, patients: int) -> None:
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(Medication), [
+            {
+                "drug_code": f"D{n:06d}",
+                "drug_name": f"ベンチ薬剤{n}",
+                "form": MedicationForm.TABLET,
+                "min_daily_dose": rng.choice([None, 0.5, 1]),
+                "max_daily_dose": rng.choice([None, 2, 3, 4, 6]),
+            }
+            for n in range(1, medications + 1)
+        ])
+        encounter_id = conn.execute(insert(Encounter).returning(Encounter.id), [{
+            "encounter_id": "E00000001",
+            "patient_id": 1,
+            "practitioner_id": prescriber_id,
+            "status": EncounterStatus.IN_PROGRESS,
+            "start_time": DAY,
+        }]).scalar_one()
+        prescription_ids = conn.execute(insert(Prescription).returning(Prescription.id), [
+            {
+                "prescription_number": f"20260101-{n:05d}",
+                "encounter_id": encounter_id,
+                "patient_id": n % patients + 1,
+                "prescriber_id": prescriber_id,
+                "prescription_date": DAY + timedelta(seconds=n * 86399 // prescriptions),
+                "status": PrescriptionStatus.PRESCRIBED,
+            }
+            for n in range(prescriptions)
+        ]).scalars().all()
+        rows = []
+        for prescription_id in prescription_ids:
+            for _ in range(items):
+                dosage, frequency, timing = rng.choice(DOSAGES)
+                duration_days = rng.choice([None, 7, 14, 28])
+                rows.append({
+                    "prescription_id": prescription_id,
+                    # 同じ処方箋で同じ薬剤を複数の明細に分けることもある
+                    "medication_id": rng.randint(1, medications),
+                    "dosage": dosage,
+                    "frequency": frequency,
+                    "timing": timing,
+                    "quantity": rng.choice([7, 14, 21, 28, 42, 56]),
+                    "duration_days": duration_days,
+                })
+        conn.execute(insert(PrescriptionItem), rows)
+
+
+def reference(items: List[DoseItem]) -> List[DoseWarning]:
+    """1 件ずつ合算・比較して validate_doses と同じ警告を作る"""
+    totals: Dict[Tuple[int, int], float] = defaultdict(float)
+    groups: Dict[Tuple[int, int], List[DoseItem]] = defaultdict(list)
+    for item in items:
+        key = (item.prescription_id, item.medication_id)
+        groups[key].append(item)
+        dose = daily_dose(item)
+        if dose is not None:
+            totals[key] += dose
+    warnings = []
+    for key, total in totals.items():
+        item = groups[key][0]
+        if item.max_daily_dose is not None and total > item.max_daily_dose + TOLERANCE:
+            issue = DoseIssue.ABOVE_MAX
+        elif item.min_daily_dose is not None and total < item.min_daily_dose - TOLERANCE:
+            issue = DoseIssue.BELOW_MIN
+        else:
+            continue
+        warnings.append(DoseWarning.model_construct(
+            issue=issue,
+            prescription_id=item.prescription_id,
+            prescription_item_ids=[member.item_id for member in groups[key] if member.item_id is not None],
+            medication_id=item.medication_id,
+            medication_name=item.medication_name,
+            daily_dose=round(total, 6),
+            min_daily_dose=item.min_daily_dose,
+            max_daily_dose=item.max_daily_dose,
+        ))
+    warnings.sort(key=lambda warning: (warning.prescription_id or 0, min(warning.prescription_item_ids, default=0)))
+    return warnings
+
+
+def best_of(func, repeat: int = 5) -> float:
+    """func の最短実行時間（秒）"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def run() -> Tuple[object, float, List[DoseItem]]:
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        report = await audit_doses(db, DAY, DAY + timedelta(days=1))
+        elapsed = time.perf_counter() - started
+        # 比較用に同じ明細を読む
+        rows = await db.execute(
+            select(
+                PrescriptionItem.prescription_id, PrescriptionItem.id.label("item_id"), PrescriptionItem.medication_id,
+                Medication.drug_name.label("medication_name"), PrescriptionItem.dosage, PrescriptionItem.frequency,
+                PrescriptionItem.timing, PrescriptionItem.quantity, PrescriptionItem.duration_days,
+                Medication.min_daily_dose, Medication.max_daily_dose,
+            ).join(Medication, Medication.id == PrescriptionItem.medication_id)
+        )
+        items = list(map(DoseItem._make, rows.tuples()))
+    return report, elapsed, items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prescriptions", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--medications", type=int, default=300)
+    args = parser.parse_args()
+
+    common.reset_database()
+    user = common.create_user("rx_doctor", "DOCTOR")
+    common.seed_patients(100)
+    seed(args.prescriptions, args.items, args.medications, user["id"], 100)
+
+    parse_dosage.cache_clear()
+    report, elapsed, items = asyncio.run(run())
+    cache = parse_dosage.cache_info()
+
+    validate_seconds = best_of(lambda: validate_doses(items))
+    reference_seconds = best_of(lambda: reference(items))
+    expected = reference(items)
+
+    print(f"prescriptions {report.prescriptions}  items {report.items}  unchecked {report.unchecked_items}  "
+          f"warnings {len(report.warnings)}")
+    print(f"audit_doses (SELECT + validate)       {elapsed * 1000:>8.1f} ms  "
+          f"{report.items / elapsed:>10.0f} items/s")
+    print(f"validate_doses only (best of 5)       {validate_seconds * 1000:>8.1f} ms")
+    print(f"naive per-item loop (best of 5)       {reference_seconds * 1000:>8.1f} ms")
+    print(f"parse cache: {cache.misses} distinct texts parsed, {cache.hits} hits")
+
+    actual = [warning.model_dump() for warning in report.warnings]
+    if actual != [warning.model_dump() for warning in expected]:
+        print(f"mismatch: audit_doses {len(actual)} warnings, reference {len(expected)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+病棟一括の早期警告スコア（NEWS2）計算のベンチマーク
+
+1. 行ごと：Encounter を ORM で読み込み、1 件ずつ Python でスコア計算（従来のやり方）
+2. 一括：services.early_warning で必要列だけを NumPy 配列に読み込み、ベクトル演算で計算
+   （読み込みと計算の時間を分けて表示）
+3. GET /api/v1/encounters/early-warning を実際に呼び出した時間
+
+両方式の合計点が全件一致することも確認し、不一致があれば終了コード 1 を返す。
+
+    python -m benchmarks.bench_early_warning --encounters 100000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from benchmarks import common
+
+import httpx
+from sqlalchemy import insert, select
+
+from app.main import app
+from app.core.database import AsyncSessionLocal, engine
+from app.models.encounter import Encounter, EncounterClass, EncounterStatus
+from app.services import early_warning
+
+
+def seed_encounters(count: int, patients: int, practitioner_id: int, batch_size: int = 10000) -> None:
+    """入院中の診療記録を投入する（バイタルは一部欠損あり）"""
+    rng = random.Random(42)
+
+    def vital(low: float, high: float, digits: int = 0) -> Optional[float]:
+        if rng.random() < 0.05:
+            return None
+        return round(rng.uniform(low, high), digits) if digits else rng.randint(int(low), int(high))
+
+    started = datetime(2026, 1, 1, 9, 0)
+    with engine.begin() as conn:
+        for start in range(0, count, batch_size):
+            conn.execute(insert(Encounter), [
+                {
+                    "encounter_id": f"E{n:08d}",
+                    "patient_id": 1 + n % patients,
+                    "practitioner_id": practitioner_id,
+                    "status": EncounterStatus.IN_PROGRESS,
+                    "encounter_class": EncounterClass.INPATIENT,
+                    "start_time": started + timedelta(minutes=n),
+                    "respiratory_rate": vital(6, 30),
+                    "oxygen_saturation": vital(85, 100, 1),
+                    "blood_pressure_systolic": vital(80, 230),
+                    "heart_rate": vital(35, 140),
+                    "temperature": vital(34.5, 40.0, 1),
+                }
+                for n in range(start, min(start + batch_size, count))
+            ])
+
+
+def _band(value: Optional[float], edges, scores) -> int:
+    if value is None:
+        return 0
+    for edge, score in zip(edges, scores):
+        if value <= edge:
+            return score
+    return scores[-1]
+
+
+def score_encounter(encounter: Encounter) -> int:
+    """1 件分の NEWS2 合計点（行ごと方式）"""
+    return sum(
+        _band(getattr(encounter, parameter), bands.edges, bands.scores)
+        for parameter, bands in early_warning.NEWS2_BANDS.items()
+    )
+
+
+async def per_row() -> Dict[int, int]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Encounter)
+            .where(Encounter.status == EncounterStatus.IN_PROGRESS, Encounter.encounter_class == EncounterClass.INPATIENT)
+        )
+        return {encounter.id: score_encounter(encounter) for encounter in result.scalars()}
+
+
+async def vectorized():
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        batch = await early_warning.load_vitals(db, EncounterStatus.IN_PROGRESS, EncounterClass.INPATIENT)
+        loaded = time.perf_counter()
+        scores = early_warning.score_vitals(batch)
+        scored = time.perf_counter()
+    return batch, scores, loaded - started, scored - loaded
+
+
+async def endpoint(token: str, repeats: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            response = await client.get(
+                "/api/v1/encounters/early-warning",
+                params={"encounter_class": EncounterClass.INPATIENT.value, "min_score": 5},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            response.raise_for_status()
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encounters", type=int, default=100000)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    common.reset_database()
+    user = common.create_user("ews_nurse", "NURSE")
+    common.seed_patients(args.patients)
+    seed_encounters(args.encounters, args.patients, user["id"])
+
+    started = time.perf_counter()
+    expected = asyncio.run(per_row())
+    row_seconds = time.perf_counter() - started
+
+    best = None
+    for _ in range(args.repeats):
+        batch, scores, load_seconds, score_seconds = asyncio.run(vectorized())
+        if best is None or load_seconds + score_seconds < sum(best[2:]):
+            best = (batch, scores, load_seconds, score_seconds)
+    batch, scores, load_seconds, score_seconds = best
+
+    print(f"encounters {len(batch)}")
+    print(f"per-row (ORM + Python)   {row_seconds * 1000:>9.1f} ms")
+    print(f"vectorized load          {load_seconds * 1000:>9.1f} ms")
+    print(f"vectorized score         {score_seconds * 1000:>9.1f} ms")
+    print(f"speed-up                 {row_seconds / (load_seconds + score_seconds):>9.1f} x")
+    print(f"GET /encounters/early-warning (best of {args.repeats}) {asyncio.run(endpoint(user['token'], args.repeats)) * 1000:.1f} ms")
+    print("risk", early_warning.risk_counts(scores))
+
+    actual = dict(zip(batch.encounter_ids.tolist(), scores.total.tolist()))
+    mismatches = [encounter_id for encounter_id, total in expected.items() if actual.get(encounter_id) != total]
+    if mismatches or len(actual) != len(expected):
+        print(f"{len(mismatches)} score mismatch(es), e.g. encounter {mismatches[:5]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
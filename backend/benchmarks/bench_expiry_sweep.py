@@ -0,0 +1,159 @@
+"""
+処方箋の期限切れ一括更新ベンチマーク
+
+ステータスと有効期限をばらした処方箋を投入し、services.prescription_expiry の
+sweep_expired_prescriptions（バッチごとの一括 UPDATE）の時間と、更新対象がないときの
+時間を測る。同じデータで部分インデックス ix_prescriptions_open_expiry_date を外した場合も
+測り、UPDATE の実行計画を表示する。期限切れにした件数が期待値と一致しない場合、
+またはインデックスがあるのに全件走査になっていれば終了コード 1 を返す。
+
+    python -m benchmarks.bench_expiry_sweep --prescriptions 100000 --batch-size 500
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+from benchmarks import common
+
+from sqlalchemy import event, insert, text, update
+
+from app.core.config import settings
+from app.core.database import async_engine, engine
+from app.models.encounter import Encounter, EncounterStatus
+from app.models.prescription import OPEN_STATUSES, Prescription, PrescriptionStatus
+from app.services.prescription_expiry import sweep_expired_prescriptions
+from benchmarks.check_query_plans import full_scans
+
+INDEX = "ix_prescriptions_open_expiry_date"
+
+
+def seed(prescriptions: int, prescriber_id: int, patients: int) -> List[int]:
+    """処方箋を投入し、期限切れになるはずの処方箋の ID を返す"""
+    # 一括更新はデータベースの現在時刻と比べる。SQLite はローカル時刻（naive）で比べるので合わせる
+    if engine.dialect.name == "sqlite":
+        now = datetime.now()
+    else:
+        now = datetime.now(timezone.utc)
+    statuses = list(PrescriptionStatus)
+    rows = []
+    expected = []
+    for n in range(prescriptions):
+        status = statuses[n % len(statuses)]
+        # 有効期限は 60 日前から 30 日後まで（期限なしも混ぜる）
+        minutes = (n * 7919) % (90 * 1440) - 60 * 1440
+        # ちょうど現在の期限は計測までに過ぎてしまうため、期待値がぶれないよう 1 分ずらす
+        expiry_date = None if n % 11 == 0 else now + timedelta(minutes=minutes or 1)
+        if status in OPEN_STATUSES and expiry_date is not None and expiry_date < now:
+            # 空のテーブルに投入するので ID は 1 から順に振られる
+            expected.append(n + 1)
+        rows.append({
+            "prescription_number": f"RX{n:010d}",
+            "encounter_id": 1,
+            "patient_id": n % patients + 1,
+            "prescriber_id": prescriber_id,
+            "prescription_date": now - timedelta(days=60),
+            "expiry_date": expiry_date,
+            "status": status,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(Encounter), [{
+            "encounter_id": "E00000001",
+            "patient_id": 1,
+            "practitioner_id": prescriber_id,
+            "status": EncounterStatus.FINISHED,
+            "start_time": now - timedelta(days=60),
+        }])
+        conn.execute(insert(Prescription), rows)
+        conn.execute(text("ANALYZE"))
+    return expected
+
+
+class UpdatePlans:
+    """発行された UPDATE を同じ接続で EXPLAIN して記録する"""
+
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+        self.plans: List[List[str]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if executemany or not statement.lstrip().upper().startswith("UPDATE PRESCRIPTIONS"):
+            return
+        explain = conn.connection.cursor()
+        try:
+            if self.dialect == "postgresql":
+                explain.execute("EXPLAIN " + statement, parameters)
+                self.plans.append([row[0] for row in explain.fetchall()])
+            else:
+                explain.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+                self.plans.append([row[3] for row in explain.fetchall()])
+        finally:
+            explain.close()
+
+
+def timed_sweep() -> Tuple[int, float]:
+    started = time.perf_counter()
+    swept = asyncio.run(sweep_expired_prescriptions())
+    return swept, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prescriptions", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=settings.prescription_expiry_batch_size)
+    args = parser.parse_args()
+    settings.prescription_expiry_batch_size = args.batch_size
+
+    common.reset_database()
+    user = common.create_user("rx_doctor", "DOCTOR")
+    common.seed_patients(100)
+    expected_ids = seed(args.prescriptions, user["id"], 100)
+    expected = len(expected_ids)
+
+    dialect = async_engine.dialect.name
+    recorder = UpdatePlans(dialect)
+    event.listen(async_engine.sync_engine, "after_cursor_execute", recorder)
+
+    swept, elapsed = timed_sweep()
+    plan = recorder.plans[0] if recorder.plans else []
+    idle, idle_elapsed = timed_sweep()
+
+    # 同じ処方箋を戻し、部分インデックスなしで測り直す
+    with engine.begin() as conn:
+        conn.execute(
+            update(Prescription).where(Prescription.id.in_(expected_ids)).values(status=PrescriptionStatus.PRESCRIBED)
+        )
+        conn.execute(text(f"DROP INDEX {INDEX}"))
+    # プール済みの接続が古いスキーマで計画を立てないように作り直す
+    asyncio.run(async_engine.dispose())
+    recorder.plans = []
+    unindexed, unindexed_elapsed = timed_sweep()
+    unindexed_plan = recorder.plans[0] if recorder.plans else []
+    _, unindexed_idle_elapsed = timed_sweep()
+
+    print(f"dialect {dialect}  prescriptions {args.prescriptions}  batch size {args.batch_size}  "
+          f"expected {expected}")
+    print(f"sweep (partial index)         {swept:>7} expired  {elapsed * 1000:>8.1f} ms")
+    print(f"idle sweep (partial index)    {idle:>7} expired  {idle_elapsed * 1000:>8.1f} ms")
+    print(f"sweep (no index)              {unindexed:>7} expired  {unindexed_elapsed * 1000:>8.1f} ms")
+    print(f"idle sweep (no index)         {0:>7} expired  {unindexed_idle_elapsed * 1000:>8.1f} ms")
+    for label, lines in (("plan (partial index)", plan), ("plan (no index)", unindexed_plan)):
+        print(label)
+        for line in lines:
+            print(f"    {line.strip()}")
+
+    failures = 0
+    if swept != expected or idle != 0:
+        print(f"count mismatch: swept {swept}, idle {idle}, expected {expected}")
+        failures += 1
+    if not plan or full_scans(plan, ("prescriptions",), dialect):
+        print("the sweep did not use the partial index")
+        failures += 1
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
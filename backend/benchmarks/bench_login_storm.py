@@ -0,0 +1,138 @@
+"""
+ログイン集中時（交代時刻など）の認証スループットと他エンドポイントへの影響
+
+1. ベースライン：ログインなしで GET /patients/ のレイテンシを測る
+2. ログイン集中：多数の POST /auth/login を同時に投げながら、同じ GET /patients/ を測る
+
+ログイン数/秒・ログイン p99 と、非認証系エンドポイントの p50/p99 を比較表示する。
+--workers 0 でプロセスプールを使わない（スレッドでハッシュ計算）場合と比較できる。
+bcrypt コストは環境変数 PASSWORD_BCRYPT_ROUNDS で指定する。
+
+    python -m benchmarks.bench_login_storm --users 200 --logins 400 --login-concurrency 200 --workers 2
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from benchmarks import common
+
+import httpx
+
+from app.main import app
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.password_hashing import shutdown_password_pool
+from app.core.security import get_password_hash
+from app.models.user import User, UserRole
+
+PASSWORD = "storm-password"
+
+
+def seed_users(count: int) -> None:
+    """ハッシュは 1 回だけ計算して全ユーザーで共有する（シード時間短縮のため）"""
+    hashed = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        db.add_all(
+            User(
+                username=f"staff{n}",
+                email=f"staff{n}@example.com",
+                hashed_password=hashed,
+                full_name=f"Staff {n}",
+                role=UserRole.NURSE,
+                is_active=True,
+            )
+            for n in range(count)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _summary(latencies: List[float], seconds: float) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "seconds": seconds,
+        "rps": len(latencies) / seconds if seconds else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": common.percentile(latencies, 99) * 1000,
+    }
+
+
+async def probe(client: httpx.AsyncClient, headers: Dict[str, str], stop: asyncio.Event, concurrency: int) -> Dict[str, float]:
+    """stop がセットされるまで GET /patients/ を叩き続ける"""
+    latencies: List[float] = []
+
+    async def worker():
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = await client.get("/api/v1/patients/?limit=20", headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summary(latencies, time.perf_counter() - started)
+
+
+async def run(args) -> None:
+    token = common.create_user("storm_admin", "ADMIN")["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    failures: List[int] = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # プールの起動コストを計測に含めない
+        await client.post("/api/v1/auth/login", json={"username": "staff0", "password": PASSWORD})
+
+        stop = asyncio.Event()
+        probing = asyncio.create_task(probe(client, headers, stop, args.probe_concurrency))
+        await asyncio.sleep(args.baseline_seconds)
+        stop.set()
+        common.print_result("GET /patients/ (baseline)", await probing)
+
+        async def login():
+            n = int(time.perf_counter() * 1e6) % args.users
+            response = await client.post("/api/v1/auth/login", json={"username": f"staff{n}", "password": PASSWORD})
+            if response.status_code != 200:
+                failures.append(response.status_code)
+
+        stop = asyncio.Event()
+        probing = asyncio.create_task(probe(client, headers, stop, args.probe_concurrency))
+        storm = await common.run_load(login, args.logins, args.login_concurrency)
+        stop.set()
+        during = await probing
+
+    common.print_result("POST /auth/login (storm)", storm)
+    common.print_result("GET /patients/ (during storm)", during)
+    print(f"logins/sec {storm['rps']:.1f}  failures {len(failures)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--login-concurrency", type=int, default=200)
+    parser.add_argument("--probe-concurrency", type=int, default=4)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    parser.add_argument("--workers", type=int, default=None, help="ハッシュ用プロセス数（0 でスレッド）")
+    args = parser.parse_args()
+
+    if args.workers is not None:
+        settings.password_hash_workers = args.workers
+
+    common.reset_database()
+    common.seed_patients(args.patients)
+    seed_users(args.users)
+    print(f"bcrypt rounds {settings.password_bcrypt_rounds}  hash workers {settings.password_hash_workers}")
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutdown_password_pool()
+
+
+if __name__ == "__main__":
+    main()
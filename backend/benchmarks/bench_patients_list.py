@@ -0,0 +1,85 @@
+"""
+GET /patients/ のスループット比較（同期セッション vs 非同期セッション）
+
+同期版は移行前と同じ実装（同期 def ルート + 同期 Session + 同期認証）を
+ベンチマーク内で再現し、非同期版は実際の /api/v1/patients/ を叩く。
+
+    python -m benchmarks.bench_patients_list --patients 20000 --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+
+from benchmarks import common
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+import httpx
+from sqlalchemy.orm import Session
+
+from app.main import app
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.deps import security
+from app.models.patient import Patient
+from app.models.user import User
+
+
+def _sync_current_user(
+    db: Session = Depends(get_db),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> User:
+    payload = jwt.decode(credentials.credentials, settings.secret_key, algorithms=[settings.algorithm])
+    user = db.query(User).filter(User.username == payload.get("sub")).first()
+    if user is None or not user.is_active:
+        raise HTTPException(status_code=401)
+    return user
+
+
+@app.get("/bench/sync/patients/")
+def sync_search_patients(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(_sync_current_user),
+):
+    patients = (
+        db.query(Patient)
+        .filter(Patient.is_active == "1")
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return [{"id": p.id, "patient_id": p.patient_id, "full_name": p.full_name} for p in patients]
+
+
+async def main(args):
+    common.reset_database()
+    common.seed_patients(args.patients)
+    token = common.create_user()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        paths = {
+            "sync  GET /patients/": "/bench/sync/patients/",
+            "async GET /patients/": f"{settings.api_v1_str}/patients/",
+        }
+        for label, path in paths.items():
+            async def request(path=path):
+                response = await client.get(path, params={"limit": args.limit}, headers=headers)
+                response.raise_for_status()
+
+            # ウォームアップ（接続プール・ステートメントキャッシュ）
+            await common.run_load(request, args.concurrency, args.concurrency)
+            result = await common.run_load(request, args.requests, args.concurrency)
+            common.print_result(label, result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,218 @@
+"""
+明細数の多い処方箋作成のベンチマーク
+
+1. 従来：薬剤を next() で線形探索し、明細を 1 件ずつ追加してコミット後に再読み込み
+2. services.prescription_service：薬剤は辞書で対応付け、明細は 1 文で一括 INSERT、
+   レスポンス用のグラフは読み込み済みオブジェクトから組み立てる
+3. POST /api/v1/prescriptions/ を実際に呼び出した時間
+
+処方箋 1 件あたりの時間と SQL 文の数を表示する。両方式で明細の費用と総費用が
+一致することも確認し、不一致があれば終了コード 1 を返す。
+
+2・3 は作成時に相互作用チェック（服用中の薬剤の読み込みを含む）を行う。処方箋は
+--patients 人の患者に順に割り当てる（1 人にすると服用中の薬剤が処方のたびに増える）。
+
+    python -m benchmarks.bench_prescription_create --prescriptions 200 --items 30
+    python -m benchmarks.bench_prescription_create --patients 1   # 1 人に集中させた場合
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from benchmarks import common
+
+import httpx
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import joinedload
+
+from app.main import app
+from app.core.database import AsyncSessionLocal, async_engine, engine
+from app.models.encounter import Encounter, EncounterStatus
+from app.models.medication import Medication, MedicationForm
+from app.models.patient import Patient
+from app.models.prescription import Prescription, PrescriptionItem
+from app.schemas.prescription import PrescriptionCreate
+from app.services.id_allocator import next_prescription_number
+from app.services.prescription_service import PrescriptionService
+
+
+class StatementCounter:
+    """非同期エンジンで実行された SQL 文の数"""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args) -> None:
+        self.count += 1
+
+
+def seed(medications: int, practitioner_id: int) -> int:
+    """薬剤マスタと診療記録 1 件を投入し、診療記録の ID を返す"""
+    forms = list(MedicationForm)
+    with engine.begin() as conn:
+        conn.execute(insert(Medication), [
+            {
+                "drug_code": f"D{n:06d}",
+                "drug_name": f"ベンチ薬剤{n}",
+                "form": forms[n % len(forms)],
+                "unit_price": round(5 + (n % 400) * 0.25, 2),
+            }
+            for n in range(1, medications + 1)
+        ])
+        result = conn.execute(insert(Encounter).returning(Encounter.id), [{
+            "encounter_id": "E00000001",
+            "patient_id": 1,
+            "practitioner_id": practitioner_id,
+            "status": EncounterStatus.IN_PROGRESS,
+            "start_time": datetime(2026, 1, 1, 9, 0),
+        }])
+        return result.scalar_one()
+
+
+def make_requests(count: int, items: int, medications: int, encounter_id: int, patients: int) -> List[PrescriptionCreate]:
+    rng = random.Random(42)
+    return [
+        PrescriptionCreate(
+            encounter_id=encounter_id,
+            patient_id=n % patients + 1,
+            prescription_date=datetime(2026, 1, 1, 10, 0),
+            prescription_items=[
+                {
+                    "medication_id": medication_id,
+                    "quantity": rng.choice([7, 14, 21, 28, 30]),
+                    "duration_days": 7,
+                    "dosage": "1回1錠",
+                    "frequency": "1日3回",
+                }
+                for medication_id in rng.sample(range(1, medications + 1), items)
+            ],
+        )
+        for n in range(count)
+    ]
+
+
+async def create_legacy(prescription: PrescriptionCreate, prescriber_id: int) -> Prescription:
+    """従来の作成処理（API に実装されていた手順をそのまま再現）"""
+    async with AsyncSessionLocal() as db:
+        patient = await db.get(Patient, prescription.patient_id)
+        encounter = await db.get(Encounter, prescription.encounter_id)
+        assert patient and encounter
+        medication_ids = [item.medication_id for item in prescription.prescription_items]
+        medications = (await db.execute(select(Medication).where(Medication.id.in_(medication_ids)))).scalars().all()
+
+        prescription_data = prescription.dict(exclude={"prescription_items"})
+        prescription_data["prescriber_id"] = prescriber_id
+        prescription_data["prescription_number"] = await next_prescription_number()
+        prescription_data["dispensing_instructions"] = prescription_data.pop("instructions")
+        prescription_data["expiry_date"] = prescription.prescription_date + timedelta(days=4)
+        db_prescription = Prescription(**prescription_data)
+        db.add(db_prescription)
+        await db.flush()
+
+        total_cost = 0
+        for item_data in prescription.prescription_items:
+            medication = next(m for m in medications if m.id == item_data.medication_id)
+            unit_cost = medication.unit_price or 0
+            item_total_cost = unit_cost * item_data.quantity
+            total_cost += item_total_cost
+            db.add(PrescriptionItem(
+                prescription_id=db_prescription.id,
+                unit_cost=unit_cost,
+                total_cost=item_total_cost,
+                **item_data.dict()
+            ))
+        db_prescription.total_cost = total_cost
+        db_prescription.patient_payment = total_cost * 0.3
+        db_prescription.insurance_coverage = total_cost * 0.7
+        await db.commit()
+
+        result = await db.execute(
+            select(Prescription)
+            .options(
+                joinedload(Prescription.patient),
+                joinedload(Prescription.prescription_items).joinedload(PrescriptionItem.medication),
+            )
+            .where(Prescription.id == db_prescription.id)
+            .execution_options(populate_existing=True)
+        )
+        return result.unique().scalars().first()
+
+
+async def create_service(prescription: PrescriptionCreate, prescriber_id: int) -> Prescription:
+    async with AsyncSessionLocal() as db:
+        return await PrescriptionService(db).create_prescription(prescription, prescriber_id)
+
+
+def costs(prescription: Prescription) -> Tuple[float, List[Tuple[int, float]]]:
+    items = sorted((item.medication_id, item.total_cost) for item in prescription.prescription_items)
+    return prescription.total_cost, items
+
+
+async def run_direct(create, requests: List[PrescriptionCreate], prescriber_id: int, counter: StatementCounter):
+    counter.count = 0
+    results = []
+    started = time.perf_counter()
+    for prescription in requests:
+        results.append(costs(await create(prescription, prescriber_id)))
+    return results, time.perf_counter() - started, counter.count
+
+
+async def run_endpoint(requests: List[PrescriptionCreate], token: str, counter: StatementCounter):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        counter.count = 0
+        started = time.perf_counter()
+        for prescription in requests:
+            response = await client.post(
+                "/api/v1/prescriptions/",
+                content=prescription.json(),
+                headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            )
+            response.raise_for_status()
+        return time.perf_counter() - started, counter.count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prescriptions", type=int, default=200)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--medications", type=int, default=2000)
+    parser.add_argument("--patients", type=int, default=100)
+    args = parser.parse_args()
+
+    common.reset_database()
+    user = common.create_user("rx_doctor", "DOCTOR")
+    common.seed_patients(args.patients)
+    encounter_id = seed(args.medications, user["id"])
+    requests = make_requests(args.prescriptions, args.items, args.medications, encounter_id, args.patients)
+    counter = StatementCounter()
+
+    async def run():
+        legacy = await run_direct(create_legacy, requests, user["id"], counter)
+        service = await run_direct(create_service, requests, user["id"], counter)
+        endpoint = await run_endpoint(requests, user["token"], counter)
+        return legacy, service, endpoint
+
+    (expected, legacy_seconds, legacy_statements), (actual, service_seconds, service_statements), \
+        (endpoint_seconds, endpoint_statements) = asyncio.run(run())
+
+    n = args.prescriptions
+    print(f"prescriptions {n} x {args.items} items")
+    print(f"legacy (per-item add + reload)  {legacy_seconds / n * 1000:>8.2f} ms/rx  {legacy_statements / n:>6.1f} statements/rx")
+    print(f"PrescriptionService             {service_seconds / n * 1000:>8.2f} ms/rx  {service_statements / n:>6.1f} statements/rx")
+    print(f"speed-up                        {legacy_seconds / service_seconds:>8.1f} x")
+    print(f"POST /prescriptions/            {endpoint_seconds / n * 1000:>8.2f} ms/rx  {endpoint_statements / n:>6.1f} statements/rx")
+
+    mismatches = [index for index, (a, b) in enumerate(zip(expected, actual)) if a != b]
+    if mismatches:
+        print(f"{len(mismatches)} cost mismatch(es), e.g. request {mismatches[:5]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+処方箋の一覧・詳細エンドポイントの SQL 文数チェック（N+1 の検出）
+
+明細数の多い処方箋を投入し、各エンドポイントを件数の少ない条件と多い条件で
+呼び出して、発行された SQL 文（非同期・同期エンジンの両方）を数える。
+処方箋グラフは prescription_load_options で読み込むため、文の数はページの件数や
+明細数に依存しない。両条件で文の数が違う、または上限を超えていれば終了コード 1 を返す。
+
+    python -m benchmarks.check_query_counts --prescriptions 120 --items 8
+    python -m benchmarks.check_query_counts --verbose   # 発行された SQL をすべて表示
+"""
+import argparse
+import asyncio
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from benchmarks import common
+
+import httpx
+from sqlalchemy import event, insert, select
+
+from app.main import app
+from app.core.database import async_engine, engine
+from app.models.encounter import Encounter, EncounterStatus
+from app.models.medication import Medication, MedicationForm
+from app.models.prescription import Prescription, PrescriptionItem, PrescriptionStatus
+
+BASE = "/api/v1"
+
+
+@dataclass
+class CountCheck:
+    """同じエンドポイントを 2 条件で呼び出し、文の数が同じで budget 以下であることを確認する"""
+    label: str
+    small: str
+    large: str
+    budget: int
+
+
+class StatementLog:
+    """両エンジンで実行された SQL 文"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+
+def seed(prescriptions: int, items: int, prescriber_id: int) -> int:
+    """患者 1 に prescriptions 件、患者 2 に 1 件の処方箋（各 items 明細）を投入し、先頭の処方箋 ID を返す"""
+    with engine.begin() as conn:
+        conn.execute(insert(Medication), [
+            {"drug_code": f"D{n:06d}", "drug_name": f"ベンチ薬剤{n}", "form": MedicationForm.TABLET, "unit_price": 10.0}
+            for n in range(1, items + 1)
+        ])
+        encounter_ids = conn.execute(insert(Encounter).returning(Encounter.id), [
+            {
+                "encounter_id": f"E{patient_id:08d}",
+                "patient_id": patient_id,
+                "practitioner_id": prescriber_id,
+                "status": EncounterStatus.IN_PROGRESS,
+                "start_time": datetime(2026, 1, 1, 9, 0),
+            }
+            for patient_id in (1, 2)
+        ]).scalars().all()
+        owners = [(1, encounter_ids[0])] * prescriptions + [(2, encounter_ids[1])]
+        prescription_ids = conn.execute(insert(Prescription).returning(Prescription.id), [
+            {
+                "prescription_number": f"20260101-{n:04d}",
+                "encounter_id": encounter_id,
+                "patient_id": patient_id,
+                "prescriber_id": prescriber_id,
+                "prescription_date": datetime(2026, 1, 1, 10, 0) + timedelta(minutes=n),
+                "status": PrescriptionStatus.PRESCRIBED,
+            }
+            for n, (patient_id, encounter_id) in enumerate(owners, start=1)
+        ]).scalars().all()
+        conn.execute(insert(PrescriptionItem), [
+            {"prescription_id": prescription_id, "medication_id": medication_id, "quantity": 14}
+            for prescription_id in prescription_ids
+            for medication_id in range(1, items + 1)
+        ])
+        return conn.execute(select(Prescription.id).order_by(Prescription.id)).scalars().first()
+
+
+def checks(first_id: int) -> List[CountCheck]:
+    return [
+        CountCheck("prescriptions list", f"{BASE}/prescriptions/?limit=1", f"{BASE}/prescriptions/?limit=100", 2),
+        CountCheck("prescriptions list (offset)", f"{BASE}/prescriptions/?limit=1&offset=3",
+                   f"{BASE}/prescriptions/?limit=100&offset=3", 2),
+        CountCheck("prescription detail", f"{BASE}/prescriptions/{first_id + 1}", f"{BASE}/prescriptions/{first_id}", 2),
+        CountCheck("patient history", f"{BASE}/prescriptions/patient/2/history",
+                   f"{BASE}/prescriptions/patient/1/history?limit=100", 3),
+        CountCheck("FHIR MedicationRequest", f"{BASE}/fhir/MedicationRequest?limit=1",
+                   f"{BASE}/fhir/MedicationRequest?limit=100", 2),
+    ]
+
+
+async def run(check_list: List[CountCheck], token: str, log: StatementLog) -> Dict[str, Tuple[List[str], List[str]]]:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        # カーソルページは 1 ページ目の next_cursor から
+        page = (await client.get(f"{BASE}/prescriptions/?limit=1")).json()
+        cursor = page["next_cursor"]
+        check_list.insert(1, CountCheck(
+            "prescriptions list (cursor)", f"{BASE}/prescriptions/?limit=1&cursor={cursor}",
+            f"{BASE}/prescriptions/?limit=100&cursor={cursor}", 2,
+        ))
+        for check in check_list:
+            statements = []
+            for path in (check.small, check.large):
+                log.statements.clear()
+                response = await client.get(path)
+                response.raise_for_status()
+                statements.append(list(log.statements))
+            results[check.label] = tuple(statements)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prescriptions", type=int, default=120)
+    parser.add_argument("--items", type=int, default=8)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    common.reset_database()
+    admin = common.create_user("rx_admin", "ADMIN")
+    common.seed_patients(2)
+    first_id = seed(args.prescriptions, args.items, admin["id"])
+
+    check_list = checks(first_id)
+    log = StatementLog()
+    results = asyncio.run(run(check_list, admin["token"], log))
+
+    failures = []
+    print(f"{'endpoint':<32} {'small':>6} {'large':>6} {'budget':>7}")
+    for check in check_list:
+        small, large = results[check.label]
+        print(f"{check.label:<32} {len(small):>6} {len(large):>6} {check.budget:>7}")
+        if args.verbose:
+            for statement in large:
+                print("   ", " ".join(statement.split())[:160])
+        if len(small) != len(large):
+            failures.append(f"{check.label}: {len(small)} statements for the small request, {len(large)} for the large one")
+        if len(large) > check.budget:
+            failures.append(f"{check.label}: {len(large)} statements (budget {check.budget})")
+
+    if failures:
+        print(f"{len(failures)} violation(s):")
+        for failure in failures:
+            print(" ", failure)
+        sys.exit(1)
+    print("statement counts are fixed and within budget")
+
+
+if __name__ == "__main__":
+    main()
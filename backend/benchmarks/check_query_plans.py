@@ -0,0 +1,217 @@
+"""
+診療記録・処方箋の一覧クエリの実行計画チェック（インデックス退行の検出）
+
+シードしたデータに対して各一覧エンドポイントを実際に呼び出し、そのとき発行された
+SELECT を同じ接続で EXPLAIN する。対象テーブルが全件走査（SQLite: "SCAN <table>"、
+PostgreSQL: "Seq Scan on <table>"）になっていれば退行として終了コード 1 を返す。
+PostgreSQL ではデータ量が少なくても索引が使えるかを見るため enable_seqscan を切って EXPLAIN する。
+並べ替え（SQLite: TEMP B-TREE、PostgreSQL: Sort）は参考として表示する。
+
+    python -m benchmarks.check_query_plans --patients 500 --encounters 5000 --prescriptions 5000
+    python -m benchmarks.check_query_plans --verbose   # 実行計画をすべて表示
+"""
+import argparse
+import asyncio
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks import common
+
+import httpx
+from sqlalchemy import event, insert, text
+
+from app.main import app
+from app.core.database import async_engine, engine
+from app.models.encounter import Encounter, EncounterClass, EncounterStatus
+from app.models.prescription import Prescription, PrescriptionStatus
+
+BASE = "/api/v1"
+
+
+@dataclass
+class PlanCheck:
+    """1 エンドポイント呼び出しと、その SELECT で全件走査してはならないテーブル"""
+    label: str
+    path: str
+    tables: Tuple[str, ...]
+    params: Dict[str, object] = field(default_factory=dict)
+    as_doctor: bool = False
+    follow_cursor: bool = False
+
+
+@dataclass
+class CapturedPlan:
+    statement: str
+    plan: List[str]
+
+
+def seed(patients: int, encounters: int, prescriptions: int, practitioner_ids: List[int]) -> None:
+    """患者・診療記録・処方箋を一括投入し、統計情報を更新する"""
+    common.seed_patients(patients)
+    started = datetime(2024, 1, 1, 9, 0)
+    statuses = list(EncounterStatus)
+    with engine.begin() as conn:
+        conn.execute(insert(Encounter), [
+            {
+                "encounter_id": f"E{n:08d}",
+                "patient_id": 1 + n % patients,
+                "practitioner_id": practitioner_ids[n % len(practitioner_ids)],
+                "status": statuses[n % len(statuses)],
+                "encounter_class": EncounterClass.AMBULATORY,
+                "start_time": started + timedelta(minutes=17 * n),
+                "chief_complaint": "定期受診",
+            }
+            for n in range(encounters)
+        ])
+        conn.execute(insert(Prescription), [
+            {
+                "prescription_number": f"RX{n:010d}",
+                "encounter_id": 1 + n % encounters,
+                "patient_id": 1 + (n % encounters) % patients,
+                "prescriber_id": practitioner_ids[(n % encounters) % len(practitioner_ids)],
+                "prescription_date": started + timedelta(minutes=17 * (n % encounters)),
+                "status": PrescriptionStatus.PRESCRIBED,
+            }
+            for n in range(prescriptions)
+        ])
+        conn.execute(text("ANALYZE"))
+
+
+class PlanRecorder:
+    """発行された SELECT を同じ接続で EXPLAIN して記録する"""
+
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+        self.plans: List[CapturedPlan] = []
+        self.enabled = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if not self.enabled or executemany or not statement.lstrip().upper().startswith("SELECT"):
+            return
+        explain = conn.connection.cursor()
+        try:
+            if self.dialect == "postgresql":
+                explain.execute("SET LOCAL enable_seqscan = off")
+                explain.execute("EXPLAIN " + statement, parameters)
+                plan = [row[0] for row in explain.fetchall()]
+            else:
+                explain.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+                plan = [row[3] for row in explain.fetchall()]
+        finally:
+            explain.close()
+        self.plans.append(CapturedPlan(statement, plan))
+
+
+def full_scans(plan: List[str], tables: Tuple[str, ...], dialect: str) -> List[str]:
+    names = "|".join(tables)
+    if dialect == "postgresql":
+        pattern = re.compile(rf"Seq Scan on ({names})\b")
+    else:
+        # "SCAN t USING INDEX ..." は索引順の走査なので除外。結合先は別名（t_1）で現れる
+        pattern = re.compile(rf"^SCAN ({names})(_\d+)?\b(?!.*USING (COVERING )?INDEX)")
+    return [line.strip() for line in plan if pattern.search(line.strip())]
+
+
+def sorts(plan: List[str], dialect: str) -> List[str]:
+    marker = "Sort" if dialect == "postgresql" else "TEMP B-TREE"
+    return [line.strip() for line in plan if marker in line]
+
+
+ENCOUNTERS = ("encounters",)
+# 処方箋一覧は明細を結合して返す
+PRESCRIPTIONS = ("prescriptions", "prescription_items")
+
+
+def build_checks(patient_id: int, practitioner_id: int) -> List[PlanCheck]:
+    return [
+        PlanCheck("encounters by patient", "/encounters/", ENCOUNTERS, {"patient_id": patient_id, "limit": 20}, follow_cursor=True),
+        PlanCheck("encounters by practitioner", "/encounters/", ENCOUNTERS, {"practitioner_id": practitioner_id, "limit": 20}, follow_cursor=True),
+        PlanCheck("encounters by status", "/encounters/", ENCOUNTERS, {"status": EncounterStatus.IN_PROGRESS.value, "limit": 20}, follow_cursor=True),
+        PlanCheck("patient encounters", f"/encounters/patient/{patient_id}", ENCOUNTERS),
+        PlanCheck("practitioner encounters", f"/encounters/practitioner/{practitioner_id}", ENCOUNTERS),
+        PlanCheck("prescriptions by patient", "/prescriptions/", PRESCRIPTIONS, {"patient_id": patient_id, "limit": 20}, follow_cursor=True),
+        PlanCheck("prescriptions by prescriber", "/prescriptions/", PRESCRIPTIONS, {"limit": 20}, as_doctor=True, follow_cursor=True),
+        PlanCheck("patient prescription history", f"/prescriptions/patient/{patient_id}/history", PRESCRIPTIONS),
+    ]
+
+
+async def run_checks(checks: List[PlanCheck], recorder: PlanRecorder, tokens: Dict[str, str]) -> Dict[str, List[CapturedPlan]]:
+    results: Dict[str, List[CapturedPlan]] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://plans") as client:
+        for check in checks:
+            headers = {"Authorization": f"Bearer {tokens['doctor' if check.as_doctor else 'admin']}"}
+            recorder.plans = []
+            recorder.enabled = True
+            response = await client.get(BASE + check.path, params=check.params, headers=headers)
+            response.raise_for_status()
+            next_cursor: Optional[str] = response.json().get("next_cursor") if check.follow_cursor else None
+            if next_cursor:
+                # 2 ページ目（キーセットのシーク条件付き）も確認する
+                response = await client.get(BASE + check.path, params={**check.params, "cursor": next_cursor}, headers=headers)
+                response.raise_for_status()
+            recorder.enabled = False
+            results[check.label] = [captured for captured in recorder.plans if check.tables[0] in captured.statement]
+    return results
+
+
+def report(checks: List[PlanCheck], results: Dict[str, List[CapturedPlan]], dialect: str, verbose: bool) -> int:
+    failures = 0
+    for check in checks:
+        captured = results[check.label]
+        scans = [line for plan in captured for line in full_scans(plan.plan, check.tables, dialect)]
+        sorted_lines = [line for plan in captured for line in sorts(plan.plan, dialect)]
+        if not captured:
+            status = "NO QUERY"
+            failures += 1
+        elif scans:
+            status = "SEQ SCAN"
+            failures += 1
+        else:
+            status = "ok"
+        note = "  (sort)" if sorted_lines else ""
+        print(f"{check.label:<32} {len(captured):>2} queries  {status}{note}")
+        for line in scans:
+            print(f"    {line}")
+        if verbose:
+            for plan in captured:
+                print("    " + " ".join(plan.statement.split())[:160])
+                for line in plan.plan:
+                    print(f"      {line}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--practitioners", type=int, default=20)
+    parser.add_argument("--encounters", type=int, default=5000)
+    parser.add_argument("--prescriptions", type=int, default=5000)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    common.reset_database()
+    admin = common.create_user("plan_admin", "ADMIN")
+    doctors = [common.create_user(f"plan_doctor{n}", "DOCTOR") for n in range(args.practitioners)]
+    seed(args.patients, args.encounters, args.prescriptions, [doctor["id"] for doctor in doctors])
+
+    dialect = async_engine.dialect.name
+    recorder = PlanRecorder(dialect)
+    event.listen(async_engine.sync_engine, "after_cursor_execute", recorder)
+
+    checks = build_checks(patient_id=1, practitioner_id=doctors[0]["id"])
+    tokens = {"admin": admin["token"], "doctor": doctors[0]["token"]}
+    results = asyncio.run(run_checks(checks, recorder, tokens))
+
+    print(f"dialect {dialect}  encounters {args.encounters}  prescriptions {args.prescriptions}")
+    failures = report(checks, results, dialect, args.verbose)
+    if failures:
+        print(f"{failures} query plan regression(s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
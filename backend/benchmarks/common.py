@@ -0,0 +1,129 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks run against DATABASE_URL when it is set, otherwise against a
+throwaway SQLite file. Import this module before anything from ``app`` so the
+settings pick up the benchmark database.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.environ.get("DATABASE_URL"):
+    _db_dir = tempfile.mkdtemp(prefix="ehr_bench_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+os.environ.setdefault("ENVIRONMENT", "benchmark")
+os.environ.setdefault("DEBUG", "False")
+
+
+def reset_database() -> None:
+    """Drop and recreate every table"""
+    from app.core.database import create_tables, drop_tables
+    import app.models  # noqa: F401  (register all models)
+
+    drop_tables()
+    create_tables()
+
+
+def create_user(username: str = "bench_admin", role: str = "ADMIN") -> Dict:
+    """Insert a user directly and return an access token for it"""
+    from app.core.database import SessionLocal
+    from app.core.deps import principal_claims
+    from app.core.security import create_access_token
+    from app.models.user import User, UserRole
+
+    db = SessionLocal()
+    try:
+        user = User(
+            username=username,
+            email=f"{username}@example.com",
+            # 認証ベンチマーク以外ではハッシュ検証しないためダミー値
+            hashed_password="not-a-real-hash",
+            full_name=username,
+            role=UserRole[role],
+            is_active=True,
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        token = create_access_token(subject=user.username, claims=principal_claims(user))
+        return {"id": user.id, "token": token}
+    finally:
+        db.close()
+
+
+def seed_patients(count: int, batch_size: int = 5000) -> None:
+    """Insert ``count`` synthetic patients"""
+    from sqlalchemy import insert
+    from app.core.database import engine
+    from app.models.patient import Patient, Gender
+
+    genders = [Gender.MALE, Gender.FEMALE]
+    with engine.begin() as conn:
+        for start in range(0, count, batch_size):
+            rows = [
+                {
+                    "patient_id": f"P{n:06d}",
+                    "first_name": f"太郎{n}",
+                    "last_name": f"山田{n % 500}",
+                    "first_name_kana": "タロウ",
+                    "last_name_kana": "ヤマダ",
+                    "date_of_birth": date(1950 + n % 60, 1 + n % 12, 1 + n % 28),
+                    "gender": genders[n % 2],
+                    "phone": f"090{n:08d}",
+                    "is_active": "1",
+                }
+                for n in range(start + 1, min(start + batch_size, count) + 1)
+            ]
+            conn.execute(insert(Patient), rows)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Return the given percentile (0-100) of the samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_load(
+    request: Callable[[], Awaitable[object]],
+    total_requests: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    """Fire ``total_requests`` calls with ``concurrency`` workers and time them"""
+    latencies: List[float] = []
+    remaining = iter(range(total_requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def print_result(label: str, result: Dict[str, float]) -> None:
+    print(
+        f"{label:<28} {result['requests']:>7.0f} req  {result['rps']:>9.1f} req/s  "
+        f"p50 {result['p50_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms"
+    )
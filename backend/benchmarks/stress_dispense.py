@@ -0,0 +1,159 @@
+"""
+複数の調剤窓口からの同時調剤ストレステスト
+
+処方箋ごとに全明細を別々のリクエストで調剤し、さらに同じ明細を複数の窓口から
+同時に調剤する（二重調剤）。全リクエストを混ぜて高並行で
+POST /api/v1/prescriptions/{id}/dispense に送り、次を確認する。
+
+- 明細ごとに成功はちょうど 1 件で、残りは 409（二重調剤の防止）
+- 5xx がない
+- 全処方箋が dispensed、全明細の調剤量が処方量と一致（ステータスの取りこぼしがない）
+
+スループット（req/s、p50/p99）も表示する。違反があれば終了コード 1 を返す。
+
+    python -m benchmarks.stress_dispense --prescriptions 200 --items 5 --duplicates 2 --concurrency 20
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from benchmarks import common
+
+import httpx
+from sqlalchemy import insert, select
+
+from app.main import app
+from app.core.database import engine
+from app.models.encounter import Encounter, EncounterStatus
+from app.models.medication import Medication, MedicationForm
+from app.models.prescription import Prescription, PrescriptionItem, PrescriptionStatus
+
+
+def seed(prescriptions: int, items: int, prescriber_id: int) -> List[Tuple[int, int, float]]:
+    """処方済みの処方箋を投入し、(処方箋 ID, 明細 ID, 処方量) の一覧を返す"""
+    with engine.begin() as conn:
+        conn.execute(insert(Medication), [
+            {"drug_code": f"D{n:06d}", "drug_name": f"ベンチ薬剤{n}", "form": MedicationForm.TABLET, "unit_price": 10.0}
+            for n in range(1, items + 1)
+        ])
+        encounter_id = conn.execute(insert(Encounter).returning(Encounter.id), [{
+            "encounter_id": "E00000001",
+            "patient_id": 1,
+            "practitioner_id": prescriber_id,
+            "status": EncounterStatus.IN_PROGRESS,
+            "start_time": datetime(2026, 1, 1, 9, 0),
+        }]).scalar_one()
+        prescription_ids = conn.execute(insert(Prescription).returning(Prescription.id), [
+            {
+                "prescription_number": f"20260101-{n:04d}",
+                "encounter_id": encounter_id,
+                "patient_id": 1,
+                "prescriber_id": prescriber_id,
+                "prescription_date": datetime(2026, 1, 1, 10, 0),
+                "status": PrescriptionStatus.PRESCRIBED,
+            }
+            for n in range(1, prescriptions + 1)
+        ]).scalars().all()
+        conn.execute(insert(PrescriptionItem), [
+            {"prescription_id": prescription_id, "medication_id": medication_id, "quantity": 7 * medication_id}
+            for prescription_id in prescription_ids
+            for medication_id in range(1, items + 1)
+        ])
+        rows = conn.execute(
+            select(PrescriptionItem.prescription_id, PrescriptionItem.id, PrescriptionItem.quantity)
+        ).all()
+    return [tuple(row) for row in rows]
+
+
+async def run(
+    requests: List[Tuple[int, int, float, str]], concurrency: int
+) -> Tuple[Dict[int, Counter], Counter, List[float], float]:
+    """全リクエストを concurrency 並行で送信し、明細ごとの応答コードを集計する"""
+    transport = httpx.ASGITransport(app=app)
+    outcomes: Dict[int, Counter] = defaultdict(Counter)
+    statuses: Counter = Counter()
+    latencies: List[float] = []
+    remaining = iter(requests)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def worker():
+            for prescription_id, item_id, quantity, token in remaining:
+                started = time.perf_counter()
+                response = await client.post(
+                    f"/api/v1/prescriptions/{prescription_id}/dispense",
+                    json=[{"prescription_item_id": item_id, "dispensed_quantity": quantity}],
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+                latencies.append(time.perf_counter() - started)
+                outcomes[item_id][response.status_code] += 1
+                statuses[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return outcomes, statuses, latencies, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prescriptions", type=int, default=200)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--duplicates", type=int, default=2, help="同じ明細を調剤する窓口の数")
+    parser.add_argument("--pharmacists", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    common.reset_database()
+    doctor = common.create_user("rx_doctor", "DOCTOR")
+    # UserRole に薬剤師がないため、調剤できる管理者ユーザーを窓口担当とする
+    pharmacists = [common.create_user(f"pharmacist{n}", "ADMIN")["token"] for n in range(args.pharmacists)]
+    common.seed_patients(1)
+    items = seed(args.prescriptions, args.items, doctor["id"])
+
+    rng = random.Random(42)
+    requests = [
+        (prescription_id, item_id, quantity, rng.choice(pharmacists))
+        for prescription_id, item_id, quantity in items
+        for _ in range(args.duplicates)
+    ]
+    rng.shuffle(requests)
+
+    outcomes, statuses, latencies, elapsed = asyncio.run(run(requests, args.concurrency))
+
+    print(f"requests {len(requests)} ({args.prescriptions} prescriptions x {args.items} items x {args.duplicates}), concurrency {args.concurrency}")
+    print(f"throughput {len(requests) / elapsed:.1f} req/s  p50 {statistics.median(latencies) * 1000:.2f} ms  "
+          f"p99 {common.percentile(latencies, 99) * 1000:.2f} ms")
+    print("responses", dict(sorted(statuses.items())))
+
+    failures = []
+    for prescription_id, item_id, _ in items:
+        if outcomes[item_id][200] != 1 or outcomes[item_id][409] != args.duplicates - 1:
+            failures.append(f"item {item_id}: {dict(outcomes[item_id])}")
+    with engine.connect() as conn:
+        not_dispensed = conn.execute(
+            select(Prescription.id, Prescription.status).where(Prescription.status != PrescriptionStatus.DISPENSED)
+        ).all()
+        short = conn.execute(
+            select(PrescriptionItem.id).where(
+                (PrescriptionItem.dispensed_quantity != PrescriptionItem.quantity) | (PrescriptionItem.is_dispensed.is_(False))
+            )
+        ).scalars().all()
+    failures += [f"prescription {row.id}: {row.status.value}" for row in not_dispensed]
+    failures += [f"item {item_id}: dispensed quantity differs" for item_id in short]
+
+    if failures:
+        print(f"{len(failures)} violation(s):")
+        for failure in failures[:10]:
+            print(" ", failure)
+        sys.exit(1)
+    print("all prescriptions dispensed once per item")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+識別子採番（services.id_allocator）の並行ストレステスト
+
+1. 複数プロセス × 多数コルーチンで患者ID・診療ID・処方箋番号を直接払い出し、
+   全プロセスを通して重複がないことを確認する（ワーカーごとのブロック予約）
+2. POST /api/v1/patients/ を高並行で叩き、全件成功かつ patient_id が一意であることを確認する
+
+重複や失敗があれば終了コード 1 を返す。
+
+    python -m benchmarks.stress_id_allocator --processes 4 --per-process 2000 --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+from collections import Counter
+from typing import Dict, List
+
+from benchmarks import common
+
+
+def _allocate_in_worker(args) -> Dict[str, List[str]]:
+    """別プロセスで実行：独立したアロケータ状態で払い出す"""
+    count, concurrency = args
+    from app.services import id_allocator
+
+    async def run() -> Dict[str, List[str]]:
+        issued: Dict[str, List[str]] = {"patient": [], "encounter": [], "prescription": []}
+        remaining = iter(range(count))
+
+        async def worker():
+            for _ in remaining:
+                issued["patient"].append(await id_allocator.next_patient_id())
+                issued["encounter"].append(await id_allocator.next_encounter_id())
+                issued["prescription"].append(await id_allocator.next_prescription_number())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return issued
+
+    return asyncio.run(run())
+
+
+def _duplicates(values: List[str]) -> List[str]:
+    return [value for value, seen in Counter(values).items() if seen > 1]
+
+
+def stress_allocator(processes: int, per_process: int, concurrency: int) -> bool:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes) as pool:
+        results = pool.map(_allocate_in_worker, [(per_process, concurrency)] * processes)
+
+    ok = True
+    for kind in ("patient", "encounter", "prescription"):
+        values = [value for result in results for value in result[kind]]
+        duplicates = _duplicates(values)
+        print(f"{kind:<13} issued {len(values):>7}  unique {len(set(values)):>7}  duplicates {len(duplicates)}")
+        ok = ok and not duplicates and len(values) == processes * per_process
+    return ok
+
+
+async def stress_patient_create(total: int, concurrency: int) -> bool:
+    import httpx
+    from sqlalchemy import select
+    from app.main import app
+    from app.core.database import AsyncSessionLocal
+    from app.models.patient import Patient
+
+    token = common.create_user("stress_admin", "ADMIN")["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    failures: List[int] = []
+    payload = {
+        "first_name": "太郎",
+        "last_name": "採番",
+        "date_of_birth": "1980-01-01",
+        "gender": "male",
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def create():
+            response = await client.post("/api/v1/patients/", json=payload, headers=headers)
+            if response.status_code != 200:
+                failures.append(response.status_code)
+
+        result = await common.run_load(create, total, concurrency)
+    common.print_result("POST /patients/", result)
+
+    async with AsyncSessionLocal() as db:
+        patient_ids = (await db.execute(select(Patient.patient_id))).scalars().all()
+    duplicates = _duplicates(patient_ids)
+    print(f"created {len(patient_ids)}  failures {len(failures)}  duplicate patient_id {len(duplicates)}")
+    return not failures and not duplicates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--per-process", type=int, default=2000)
+    parser.add_argument("--coroutines", type=int, default=20, help="プロセスあたりの並行コルーチン数")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    common.reset_database()
+    ok = stress_allocator(args.processes, args.per_process, args.coroutines)
+    ok = asyncio.run(stress_patient_create(args.requests, args.concurrency)) and ok
+
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Add id_sequences table for identifier allocation
+
+Counters are created on first use and seeded from the existing
+patient/encounter/prescription numbers, so no data migration is needed.
+
+Revision ID: 3a9c0e5f7b12
+Revises: b51e7d40c2a8
+Create Date: 2026-10-17 13:41:09.274415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a9c0e5f7b12'
+down_revision = 'b51e7d40c2a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("id_sequences"):
+        # Already created by create_all at app startup
+        return
+    op.create_table(
+        "id_sequences",
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("next_value", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("id_sequences")
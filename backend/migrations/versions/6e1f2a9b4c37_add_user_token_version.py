@@ -0,0 +1,41 @@
+"""Add token_version to users
+
+Access tokens carry the version they were issued for; bumping it on a
+role, active-flag or password change revokes the user's older tokens.
+
+Revision ID: 6e1f2a9b4c37
+Revises: 3a9c0e5f7b12
+Create Date: 2026-10-17 15:12:48.903116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1f2a9b4c37'
+down_revision = '3a9c0e5f7b12'
+branch_labels = None
+depends_on = None
+
+
+def _needs_column() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    # Fresh databases get the table and column from create_all at app startup
+    if not inspector.has_table("users"):
+        return False
+    return all(column["name"] != "token_version" for column in inspector.get_columns("users"))
+
+
+def upgrade() -> None:
+    if not _needs_column():
+        return
+    op.add_column(
+        "users",
+        sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("users"):
+        op.drop_column("users", "token_version")
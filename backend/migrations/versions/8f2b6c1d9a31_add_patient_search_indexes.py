@@ -0,0 +1,82 @@
+"""Add patient partial-match search indexes
+
+PostgreSQL: pg_trgm GIN indexes on the name, kana and phone columns.
+SQLite: FTS5 trigram shadow table patients_fts kept in sync by triggers.
+
+Revision ID: 8f2b6c1d9a31
+Revises: 4cc11c2b2f1a
+Create Date: 2026-10-17 09:12:40.118274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2b6c1d9a31'
+down_revision = '4cc11c2b2f1a'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = ("first_name", "last_name", "first_name_kana", "last_name_kana", "phone")
+
+_fts_columns = ", ".join(SEARCH_COLUMNS)
+_fts_new_values = ", ".join(f"new.{column}" for column in SEARCH_COLUMNS)
+_fts_old_values = ", ".join(f"old.{column}" for column in SEARCH_COLUMNS)
+
+
+def _has_patients_table() -> bool:
+    # Fresh databases get these objects from create_all at app startup
+    return sa.inspect(op.get_bind()).has_table("patients")
+
+
+def upgrade() -> None:
+    if not _has_patients_table():
+        return
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in SEARCH_COLUMNS:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_patients_{column}_trgm "
+                f"ON patients USING gin ({column} gin_trgm_ops)"
+            )
+
+    elif dialect == "sqlite":
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5("
+            f"{_fts_columns}, content='patients', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN "
+            f"INSERT INTO patients_fts(rowid, {_fts_columns}) VALUES (new.id, {_fts_new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN "
+            f"INSERT INTO patients_fts(patients_fts, rowid, {_fts_columns}) "
+            f"VALUES ('delete', old.id, {_fts_old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE ON patients BEGIN "
+            f"INSERT INTO patients_fts(patients_fts, rowid, {_fts_columns}) "
+            f"VALUES ('delete', old.id, {_fts_old_values}); "
+            f"INSERT INTO patients_fts(rowid, {_fts_columns}) VALUES (new.id, {_fts_new_values}); END"
+        )
+        # Index rows that existed before the shadow table
+        op.execute("INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if not _has_patients_table():
+        return
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        for column in SEARCH_COLUMNS:
+            op.execute(f"DROP INDEX IF EXISTS ix_patients_{column}_trgm")
+
+    elif dialect == "sqlite":
+        for trigger in ("patients_fts_ai", "patients_fts_ad", "patients_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS patients_fts")
@@ -0,0 +1,52 @@
+"""Add composite indexes for encounter and prescription lists
+
+Filter column followed by the list order (start_time / prescription_date
+DESC, id DESC), for the per-patient, per-practitioner and per-status
+encounter lists and the per-patient and per-prescriber prescription lists,
+plus the prescription_items foreign key the lists join through.
+
+Revision ID: 9d7e3b1f5a20
+Revises: 6e1f2a9b4c37
+Create Date: 2026-10-17 15:20:11.604388
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d7e3b1f5a20'
+down_revision = '6e1f2a9b4c37'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("encounters", "ix_encounters_patient_id_start_time", ("patient_id", "start_time DESC", "id DESC")),
+    ("encounters", "ix_encounters_practitioner_id_start_time", ("practitioner_id", "start_time DESC", "id DESC")),
+    ("encounters", "ix_encounters_status_start_time", ("status", "start_time", "id")),
+    ("prescriptions", "ix_prescriptions_patient_id_prescription_date", ("patient_id", "prescription_date DESC", "id DESC")),
+    ("prescriptions", "ix_prescriptions_prescriber_id_prescription_date", ("prescriber_id", "prescription_date DESC", "id DESC")),
+    ("prescription_items", "ix_prescription_items_prescription_id", ("prescription_id",)),
+)
+
+
+def _existing_indexes(table: str):
+    # Fresh databases get these tables and indexes from create_all at app startup
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return None
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    for table, name, columns in INDEXES:
+        existing = _existing_indexes(table)
+        if existing is not None and name not in existing:
+            op.create_index(name, table, [sa.text(column) for column in columns])
+
+
+def downgrade() -> None:
+    for table, name, _ in INDEXES:
+        existing = _existing_indexes(table)
+        if existing is not None and name in existing:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,41 @@
+"""Add an index on prescriptions.prescription_date
+
+(prescription_date DESC, id DESC) for the unfiltered prescription list and
+for the nightly dose audit, which reads one day of prescriptions by date.
+
+Revision ID: a4c6e8f0b2d5
+Revises: f3b8d2e6a714
+Create Date: 2026-10-17 21:04:37.218554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c6e8f0b2d5'
+down_revision = 'f3b8d2e6a714'
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_prescriptions_prescription_date"
+
+
+def _existing_indexes():
+    # Fresh databases get the table and index from create_all at app startup
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("prescriptions"):
+        return None
+    return {index["name"] for index in inspector.get_indexes("prescriptions")}
+
+
+def upgrade() -> None:
+    existing = _existing_indexes()
+    if existing is not None and INDEX not in existing:
+        op.create_index(INDEX, "prescriptions", [sa.text("prescription_date DESC"), sa.text("id DESC")])
+
+
+def downgrade() -> None:
+    existing = _existing_indexes()
+    if existing is not None and INDEX in existing:
+        op.drop_index(INDEX, table_name="prescriptions")
@@ -0,0 +1,90 @@
+"""Add normalized kana search keys to patients
+
+Adds folded-kana and romaji key columns with B-tree indexes and backfills
+them from the existing kana names.
+
+Revision ID: b51e7d40c2a8
+Revises: 8f2b6c1d9a31
+Create Date: 2026-10-17 11:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.kana_normalizer import patient_search_keys
+
+
+# revision identifiers, used by Alembic.
+revision = 'b51e7d40c2a8'
+down_revision = '8f2b6c1d9a31'
+branch_labels = None
+depends_on = None
+
+KEY_COLUMNS = ("name_kana_key", "first_name_kana_key", "name_romaji_key", "first_name_romaji_key")
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _has_patients_table() -> bool:
+    # Fresh databases get these columns from create_all at app startup
+    return sa.inspect(op.get_bind()).has_table("patients")
+
+
+def _key_type() -> sa.types.TypeEngine:
+    return sa.String(200).with_variant(sa.String(200, collation="C"), "postgresql")
+
+
+def _backfill() -> None:
+    bind = op.get_bind()
+    patients = sa.table(
+        "patients",
+        sa.column("id", sa.Integer),
+        sa.column("first_name_kana", sa.String),
+        sa.column("last_name_kana", sa.String),
+        *(sa.column(name, sa.String) for name in KEY_COLUMNS),
+    )
+    update = (
+        patients.update()
+        .where(patients.c.id == sa.bindparam("patient_pk"))
+        .values({name: sa.bindparam(name) for name in KEY_COLUMNS})
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(patients.c.id, patients.c.last_name_kana, patients.c.first_name_kana)
+            .where(patients.c.id > last_id)
+            .order_by(patients.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(update, [
+            {"patient_pk": row.id, **patient_search_keys(row.last_name_kana, row.first_name_kana)}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    if not _has_patients_table():
+        return
+
+    # Tables created by create_all after this revision already have the keys
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("patients")}
+    for name in KEY_COLUMNS:
+        if name not in existing:
+            op.add_column("patients", sa.Column(name, _key_type(), nullable=True))
+            op.create_index(f"ix_patients_{name}", "patients", [name])
+
+    _backfill()
+
+
+def downgrade() -> None:
+    if not _has_patients_table():
+        return
+
+    for name in KEY_COLUMNS:
+        op.drop_index(f"ix_patients_{name}", table_name="patients")
+    # Plain ALTER TABLE (SQLite >= 3.35) keeps the patients_fts triggers intact
+    for name in KEY_COLUMNS:
+        op.drop_column("patients", name)
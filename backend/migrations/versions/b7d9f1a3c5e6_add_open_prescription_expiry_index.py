@@ -0,0 +1,47 @@
+"""Add a partial index on prescriptions.expiry_date for open prescriptions
+
+Covers the expiry sweep, which expires draft and prescribed prescriptions
+whose expiry_date has passed. Other statuses never leave the sweep's
+WHERE clause, so they are kept out of the index.
+
+Revision ID: b7d9f1a3c5e6
+Revises: a4c6e8f0b2d5
+Create Date: 2026-10-17 23:18:52.604117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d9f1a3c5e6'
+down_revision = 'a4c6e8f0b2d5'
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_prescriptions_open_expiry_date"
+# Enum columns store member names
+OPEN_STATUSES = sa.text("status IN ('DRAFT', 'PRESCRIBED')")
+
+
+def _existing_indexes():
+    # Fresh databases get the table and index from create_all at app startup
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("prescriptions"):
+        return None
+    return {index["name"] for index in inspector.get_indexes("prescriptions")}
+
+
+def upgrade() -> None:
+    existing = _existing_indexes()
+    if existing is not None and INDEX not in existing:
+        op.create_index(
+            INDEX, "prescriptions", ["expiry_date"],
+            sqlite_where=OPEN_STATUSES, postgresql_where=OPEN_STATUSES,
+        )
+
+
+def downgrade() -> None:
+    existing = _existing_indexes()
+    if existing is not None and INDEX in existing:
+        op.drop_index(INDEX, table_name="prescriptions")
@@ -0,0 +1,72 @@
+"""Add vital_observations table
+
+Append-only history of vital-sign values, backfilled from the vitals
+columns of existing encounters (observed at the encounter start time).
+
+Revision ID: c82f4a6d1e93
+Revises: 9d7e3b1f5a20
+Create Date: 2026-10-17 16:48:52.913027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c82f4a6d1e93'
+down_revision = '9d7e3b1f5a20'
+branch_labels = None
+depends_on = None
+
+VITAL_COLUMNS = (
+    "temperature",
+    "blood_pressure_systolic",
+    "blood_pressure_diastolic",
+    "heart_rate",
+    "respiratory_rate",
+    "oxygen_saturation",
+    "height",
+    "weight",
+)
+
+
+def _backfill() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("encounters"):
+        return
+    # create_all may have created the table already; only fill it once
+    if bind.execute(sa.text("SELECT 1 FROM vital_observations LIMIT 1")).first():
+        return
+    for column in VITAL_COLUMNS:
+        op.execute(
+            "INSERT INTO vital_observations (patient_id, encounter_id, metric, value, observed_at) "
+            f"SELECT patient_id, id, '{column}', {column}, start_time FROM encounters "
+            f"WHERE {column} IS NOT NULL"
+        )
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("vital_observations"):
+        op.create_table(
+            "vital_observations",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("patient_id", sa.Integer(), nullable=False),
+            sa.Column("encounter_id", sa.Integer(), nullable=True),
+            sa.Column("metric", sa.String(length=32), nullable=False),
+            sa.Column("value", sa.Float(), nullable=False),
+            sa.Column("observed_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+            sa.ForeignKeyConstraint(["encounter_id"], ["encounters.id"]),
+            sa.ForeignKeyConstraint(["patient_id"], ["patients.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_vital_observations_patient_metric_time", "vital_observations", ["patient_id", "metric", "observed_at"])
+        op.create_index("ix_vital_observations_encounter_id", "vital_observations", ["encounter_id"])
+    _backfill()
+
+
+def downgrade() -> None:
+    op.drop_index("ix_vital_observations_encounter_id", table_name="vital_observations")
+    op.drop_index("ix_vital_observations_patient_metric_time", table_name="vital_observations")
+    op.drop_table("vital_observations")
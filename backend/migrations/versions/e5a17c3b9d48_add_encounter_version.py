@@ -0,0 +1,38 @@
+"""Add encounters.version for optimistic concurrency
+
+Revision ID: e5a17c3b9d48
+Revises: c82f4a6d1e93
+Create Date: 2026-10-17 18:05:37.204716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a17c3b9d48'
+down_revision = 'c82f4a6d1e93'
+branch_labels = None
+depends_on = None
+
+
+def _needs_column() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    # Fresh databases get the table and column from create_all at app startup
+    if not inspector.has_table("encounters"):
+        return False
+    return all(column["name"] != "version" for column in inspector.get_columns("encounters"))
+
+
+def upgrade() -> None:
+    if not _needs_column():
+        return
+    op.add_column(
+        "encounters",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("encounters"):
+        op.drop_column("encounters", "version")
@@ -0,0 +1,84 @@
+"""Add SOAP note revision history
+
+encounters.note_revision and the encounter_note_revisions table. Encounters
+that already have SOAP notes get revision 1: a snapshot of the current text.
+
+Revision ID: f3b8d2e6a714
+Revises: e5a17c3b9d48
+Create Date: 2026-10-17 19:12:08.551390
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2e6a714'
+down_revision = 'e5a17c3b9d48'
+branch_labels = None
+depends_on = None
+
+SOAP_FIELDS = ("subjective", "objective", "assessment", "plan")
+
+
+def _backfill(batch_size: int = 1000) -> None:
+    bind = op.get_bind()
+    # create_all may have created the table already; only fill it once
+    if bind.execute(sa.text("SELECT 1 FROM encounter_note_revisions LIMIT 1")).first():
+        return
+    has_notes = " OR ".join(f"{field} IS NOT NULL" for field in SOAP_FIELDS)
+    rows = bind.execute(sa.text(
+        f"SELECT id, {', '.join(SOAP_FIELDS)} FROM encounters WHERE {has_notes} ORDER BY id"
+    )).all()
+    insert = sa.text(
+        "INSERT INTO encounter_note_revisions (encounter_id, revision, kind, content) "
+        "VALUES (:encounter_id, 1, 'snapshot', :content)"
+    )
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        bind.execute(insert, [
+            {
+                "encounter_id": row.id,
+                "content": json.dumps(dict(zip(SOAP_FIELDS, row[1:])), ensure_ascii=False, separators=(",", ":")),
+            }
+            for row in batch
+        ])
+    op.execute(f"UPDATE encounters SET note_revision = 1 WHERE {has_notes}")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    # Fresh databases get the table and column from create_all at app startup
+    if not inspector.has_table("encounters"):
+        return
+    if all(column["name"] != "note_revision" for column in inspector.get_columns("encounters")):
+        op.add_column(
+            "encounters",
+            sa.Column("note_revision", sa.Integer(), nullable=False, server_default="0"),
+        )
+    if not inspector.has_table("encounter_note_revisions"):
+        op.create_table(
+            "encounter_note_revisions",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("encounter_id", sa.Integer(), nullable=False),
+            sa.Column("revision", sa.Integer(), nullable=False),
+            sa.Column("kind", sa.String(length=8), nullable=False),
+            sa.Column("content", sa.Text(), nullable=False),
+            sa.Column("author_id", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=True),
+            sa.ForeignKeyConstraint(["author_id"], ["users.id"]),
+            sa.ForeignKeyConstraint(["encounter_id"], ["encounters.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("encounter_id", "revision", name="uq_encounter_note_revisions_revision"),
+        )
+    _backfill()
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table("encounter_note_revisions"):
+        op.drop_table("encounter_note_revisions")
+    if inspector.has_table("encounters"):
+        op.drop_column("encounters", "note_revision")
@@ -85,7 +85,7 @@ const EncounterCreate = () => {
       console.log('Fetching patients...');
       const response = await patientsAPI.getPatients({ limit: 1000 });
       console.log('Patients response:', response.data);
-      setPatients(response.data);
+      setPatients(response.data.items);
     } catch (err) {
       console.error('Failed to fetch patients:', err);
       console.log('Using fallback sample patients...');
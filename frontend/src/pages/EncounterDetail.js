@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import {
   Box,
@@ -51,6 +51,26 @@ const TabPanel = ({ children, value, index, ...other }) => {
   );
 };
 
+const AUTOSAVE_DELAY_MS = 2000;
+
+// 保存済みの本文 before を after にする置換 1 つ（共通の先頭と末尾を除いた部分）
+// 位置は JavaScript の文字列と同じ UTF-16 単位で、サーバー側もこの単位で適用する
+const textSplice = (before, after) => {
+  let start = 0;
+  while (start < before.length && start < after.length && before[start] === after[start]) {
+    start += 1;
+  }
+  let tail = 0;
+  while (
+    tail < before.length - start &&
+    tail < after.length - start &&
+    before[before.length - 1 - tail] === after[after.length - 1 - tail]
+  ) {
+    tail += 1;
+  }
+  return { start, end: before.length - tail, text: after.slice(start, after.length - tail) };
+};
+
 const EncounterDetail = () => {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -61,6 +81,10 @@ const EncounterDetail = () => {
   const [error, setError] = useState(null);
   const [tabValue, setTabValue] = useState(0);
   const [editMode, setEditMode] = useState(false);
+  const [autosavedAt, setAutosavedAt] = useState(null);
+  // 自動保存の完了を待たずに最新の版を参照するため、表示用の state とは別に保持する
+  const encounterRef = useRef(null);
+  const autosaveRef = useRef(Promise.resolve());
   const [soapNotes, setSoapNotes] = useState({
     subjective: '',
     objective: '',
@@ -82,6 +106,22 @@ const EncounterDetail = () => {
     fetchEncounter();
   }, [id]);
 
+  // 編集中は入力が止まってから SOAP の変更分だけを自動保存する（前回の自動保存の完了後に順番に送る）
+  useEffect(() => {
+    if (!editMode) {
+      return undefined;
+    }
+    const timer = setTimeout(() => {
+      autosaveRef.current = autosaveRef.current.then(() => autosaveNotes(soapNotes));
+    }, AUTOSAVE_DELAY_MS);
+    return () => clearTimeout(timer);
+  }, [soapNotes, editMode]);
+
+  const updateEncounter = (next) => {
+    encounterRef.current = next;
+    setEncounter(next);
+  };
+
   const fetchEncounter = async () => {
     try {
       setLoading(true);
@@ -99,7 +139,7 @@ const EncounterDetail = () => {
       const encData = response.data;
       console.log('Encounter data received:', encData);
       
-      setEncounter(encData);
+      updateEncounter(encData);
       
       // Fetch patient data
       console.log('Fetching patient with ID:', encData.patient_id);
@@ -151,22 +191,91 @@ const EncounterDetail = () => {
     }
   };
 
+  const autosaveNotes = async (notes) => {
+    const saved = encounterRef.current;
+    const changes = {};
+    Object.entries(notes).forEach(([field, value]) => {
+      const before = saved[field] || '';
+      if (value !== before) {
+        changes[field] = [textSplice(before, value)];
+      }
+    });
+    if (Object.keys(changes).length === 0) {
+      return;
+    }
+
+    try {
+      const response = await encountersAPI.autosaveSoapNotes(id, saved.note_revision, changes);
+      const result = response.data;
+      const written = {};
+      Object.keys(changes).forEach((field) => {
+        written[field] = notes[field];
+      });
+      updateEncounter({
+        ...encounterRef.current,
+        ...written,
+        note_revision: result.note_revision,
+        version: result.version,
+        updated_at: result.updated_at,
+      });
+      setAutosavedAt(new Date());
+    } catch (err) {
+      const errorData = handleAPIError(err);
+      if (errorData.status === 409) {
+        setError('他のユーザーが SOAP を更新したため自動保存できませんでした。再読み込みしてください。');
+      } else {
+        setError(`自動保存に失敗しました: ${errorData.message}`);
+      }
+    }
+  };
+
+  // 読み込み時（または自動保存時）から変更された項目だけを送る（空欄は null）
+  const collectChanges = (encounter) => {
+    const changes = {};
+    Object.entries(soapNotes).forEach(([field, value]) => {
+      if (value !== (encounter[field] || '')) {
+        changes[field] = value === '' ? null : value;
+      }
+    });
+    Object.entries(vitalSigns).forEach(([field, value]) => {
+      if (String(value) !== String(encounter[field] ?? '')) {
+        changes[field] = value === '' ? null : Number(value);
+      }
+    });
+    return changes;
+  };
+
   const handleSave = async () => {
+    // 送信中の自動保存が済んでから、その版を基準に残りの変更を保存する
+    await autosaveRef.current;
+    const encounter = encounterRef.current;
+    const changes = collectChanges(encounter);
+    if (Object.keys(changes).length === 0) {
+      setEditMode(false);
+      return;
+    }
+
     try {
       setSaving(true);
       
-      // Update SOAP notes
-      await encountersAPI.updateSOAPNotes(id, soapNotes);
-      
-      // Update vital signs
-      await encountersAPI.updateVitalSigns(id, vitalSigns);
-      
-      // Refresh encounter data
-      await fetchEncounter();
+      // SOAP とバイタルを 1 回の保存で更新し、返ってきた変更分だけを反映する
+      const response = await encountersAPI.saveEncounter(id, changes, encounter.version);
+      const saved = response.data;
+      updateEncounter({
+        ...encounter,
+        ...saved.changes,
+        version: saved.version,
+        note_revision: saved.note_revision,
+        updated_at: saved.updated_at,
+      });
       setEditMode(false);
     } catch (err) {
       const errorData = handleAPIError(err);
-      setError(errorData.message);
+      if (errorData.status === 409) {
+        setError('他のユーザーがこの診療記録を更新しました。再読み込みしてから保存してください。');
+      } else {
+        setError(errorData.message);
+      }
     } finally {
       setSaving(false);
     }
@@ -356,6 +465,14 @@ const EncounterDetail = () => {
               </Alert>
             </Grid>
 
+            {editMode && autosavedAt && (
+              <Grid item xs={12}>
+                <Typography variant="caption" color="text.secondary">
+                  自動保存済み {autosavedAt.toLocaleTimeString('ja-JP')}
+                </Typography>
+              </Grid>
+            )}
+
             <Grid item xs={12} md={6}>
               <Typography variant="h6" gutterBottom color="primary">
                 S - Subjective (主観的情報)
@@ -115,7 +115,7 @@ const Encounters = () => {
       // Try API first, fallback to sample data + local storage
       try {
         const response = await encountersAPI.getEncounters();
-        const apiEncounters = response.data || [];
+        const apiEncounters = response.data?.items || [];
         
         // Get mock encounters from localStorage
         const mockEncounters = JSON.parse(localStorage.getItem('mockEncounters') || '[]');
@@ -193,7 +193,7 @@ const Encounters = () => {
       encounter.patient_name.toLowerCase().includes(searchLower) ||
       encounter.patient_number.toLowerCase().includes(searchLower) ||
       encounter.chief_complaint.toLowerCase().includes(searchLower) ||
-      encounter.assessment.toLowerCase().includes(searchLower)
+      (encounter.assessment || '').toLowerCase().includes(searchLower)
     );
     
     const matchesStatus = !statusFilter || encounter.status === statusFilter;
@@ -91,7 +91,7 @@ const Patients = () => {
       setError('');
       const response = await patientsAPI.getPatients();
       console.log('Patients API response:', response.data);
-      setPatients(response.data || []);
+      setPatients(response.data?.items || []);
     } catch (err) {
       console.error('Error fetching patients:', err);
       const errorData = handleAPIError(err);
@@ -44,6 +44,8 @@ const PrescriptionCreate = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(false);
+  const [interactionWarnings, setInteractionWarnings] = useState([]);
+  const [doseWarnings, setDoseWarnings] = useState([]);
   const [patients, setPatients] = useState([]);
   const [encounters, setEncounters] = useState([]);
   const [medications, setMedications] = useState([]);
@@ -69,7 +71,7 @@ const PrescriptionCreate = () => {
   const fetchPatients = async () => {
     try {
       const response = await patientsAPI.getPatients({ limit: 1000 });
-      setPatients(response.data || []);
+      setPatients(response.data?.items || []);
     } catch (err) {
       console.error('Failed to fetch patients:', err);
       setPatients([]);
@@ -213,12 +215,17 @@ const PrescriptionCreate = () => {
       
       const response = await prescriptionsAPI.createPrescription(cleanedData);
       console.log('Prescription created successfully:', response.data);
+      const warnings = response.data.interaction_warnings || [];
+      const doses = response.data.dose_warnings || [];
+      setInteractionWarnings(warnings);
+      setDoseWarnings(doses);
       setSuccess(true);
       playNewPrescription();
       
+      // 相互作用・用量の警告がある場合は確認できるよう長めに表示
       setTimeout(() => {
         navigate('/prescriptions');
-      }, 2000);
+      }, warnings.length || doses.length ? 8000 : 2000);
       
     } catch (err) {
       console.error('Submit error:', err);
@@ -235,9 +242,33 @@ const PrescriptionCreate = () => {
 
   if (success) {
     return (
-      <Alert severity="success" sx={{ mb: 2 }}>
-        処方箋が正常に作成されました。処方箋一覧ページに移動します...
-      </Alert>
+      <Box>
+        <Alert severity="success" sx={{ mb: 2 }}>
+          処方箋が正常に作成されました。処方箋一覧ページに移動します...
+        </Alert>
+        {interactionWarnings.map((warning, index) => (
+          <Alert
+            key={index}
+            severity={warning.severity === 'caution' ? 'warning' : 'error'}
+            sx={{ mb: 1 }}
+          >
+            {{ contraindicated: '併用禁忌', allergy: 'アレルギー', caution: '併用注意' }[warning.severity]}：
+            {warning.medication_name}
+            {warning.other_medication_name &&
+              ` × ${warning.other_medication_name}${warning.other_is_active ? '（服用中）' : ''}`}
+            {`（${warning.matched}${warning.note ? `：${warning.note}` : ''}）`}
+          </Alert>
+        ))}
+        {doseWarnings.map((warning, index) => (
+          <Alert key={`dose-${index}`} severity="warning" sx={{ mb: 1 }}>
+            {warning.issue === 'above_max' ? '1日最大用量超過' : '1日最小用量未満'}：
+            {warning.medication_name}
+            {`（1日量 ${warning.daily_dose}、${
+              warning.issue === 'above_max' ? `最大 ${warning.max_daily_dose}` : `最小 ${warning.min_daily_dose}`
+            }）`}
+          </Alert>
+        ))}
+      </Box>
     );
   }
 
@@ -67,6 +67,14 @@ export const encountersAPI = {
   updateEncounter: (id, encounterData) => api.put(`/encounters/${id}`, encounterData),
   updateVitalSigns: (id, vitalSigns) => api.patch(`/encounters/${id}/vital-signs`, vitalSigns),
   updateSOAPNotes: (id, soapNotes) => api.patch(`/encounters/${id}/soap-notes`, soapNotes),
+  // SOAP・バイタル・ステータスを 1 リクエストで保存（version があれば If-Match で競合検出）
+  saveEncounter: (id, changes, version) => api.patch(`/encounters/${id}`, changes, {
+    headers: version != null ? { 'If-Match': `"${version}"` } : {},
+  }),
+  autosaveSoapNotes: (id, baseRevision, changes) => api.post(`/encounters/${id}/soap-notes/autosave`, {
+    base_revision: baseRevision,
+    changes,
+  }),
   getPatientEncounters: (patientId, params) => api.get(`/encounters/patient/${patientId}`, { params }),
   getPractitionerEncounters: (practitionerId, params) => api.get(`/encounters/practitioner/${practitionerId}`, { params }),
   getEncountersCount: (params) => api.get('/encounters/search/count', { params }),
@@ -90,6 +98,7 @@ export const prescriptionsAPI = {
   getPrescriptions: (params) => api.get('/prescriptions/', { params }),
   getPrescription: (id) => api.get(`/prescriptions/${id}`),
   createPrescription: (prescriptionData) => api.post('/prescriptions/', prescriptionData),
+  checkInteractions: (checkData) => api.post('/prescriptions/interaction-check', checkData),
   updatePrescription: (id, prescriptionData) => api.put(`/prescriptions/${id}`, prescriptionData),
   dispensePrescription: (id, dispensingData) => api.post(`/prescriptions/${id}/dispense`, dispensingData),
   getPatientPrescriptionHistory: (patientId, params) => api.get(`/prescriptions/patient/${patientId}/history`, { params }),